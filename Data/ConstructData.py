@@ -11,6 +11,7 @@ Adapted by Ruben and Steffen
 import os
 import sys
 import pickle
+import copy
 
 standalone_testing = False
 if standalone_testing:
@@ -26,6 +27,7 @@ from openpyxl import load_workbook
 from openpyxl.utils import column_index_from_string, get_column_letter
 import itertools
 import numpy as np
+from scipy import sparse
 import matplotlib.pyplot as plt
 
 from math import cos, asin, sqrt, pi
@@ -35,7 +37,10 @@ pd.set_option("display.max_rows", None, "display.max_columns", None)
 import numpy as np
 from Data.BassDiffusion import BassDiffusion 
 from Data.sigmoid import sigmoid
-from path_generation import path_generation
+from Data.IndexedParameter import IndexedParameter, FactoredParameter
+from path_generation import path_generation, path_generation_key, load_previous_paths
+from Data.path_store import save_path_store, path_store_exists, PathStore
+from Data.input_cache import read_excel, read_csv, read_sheet_values, close_workbooks
 
 # from FreightTransportModel.Utils import plot_all_graphs  #FreightTransportModel.
 
@@ -53,6 +58,41 @@ def timeit(func):
         return result
     return timeit_wrapper
 
+def round_array(x, digits):
+    # python rounding (exactly as round(value, digits) on the single values), elementwise
+    return np.array([round(v, digits) for v in x.ravel().tolist()]).reshape(x.shape)
+
+class index_set():
+    # decorator for a lazily built index set of TransportSets. The set is computed on first access and memoized in 
+    # obj._set_cache per obj.set_key(); the active value is stored in the instance dict so that later lookups are plain attribute lookups.
+    def __init__(self, key_dependent=True):
+        self.key_dependent = key_dependent
+
+    def __call__(self, func):
+        self.func = func
+        return self
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        key = obj.set_key() if self.key_dependent else None
+        cache = obj.__dict__.setdefault("_set_cache", {}).setdefault(key, {})
+        if self.name not in cache:
+            cache[self.name] = self.func(obj)
+        obj.__dict__[self.name] = cache[self.name]
+        return cache[self.name]
+
+def scenario_set(base_set):
+    # index set combining each element of base_set (name of another set, or function) with all scenarios
+    def combinations(self):
+        list_of_tuples = getattr(self, base_set) if isinstance(base_set, str) else base_set(self)
+        return [tpl + (s,) for tpl in list_of_tuples for s in self.S_SCENARIOS]
+    return index_set()(combinations)
+
+
 # Translate scenario_tree to the name of the corresponding excel sheet
 def get_scen_sheet_name(scenario_tree):
     sheet_name_scenarios = ""
@@ -76,8 +116,8 @@ class ScenarioInformation():
         #TODO: REVAMP HOW WE DO SCENARIOS. PROBABLY DELETE A BUNCH OF CODE BELOW
               
         # first, read modes and fuel groups
-        mode_sets = pd.read_excel(r'Data/sets.xlsx', sheet_name = "modes")
-        fuel_sets = pd.read_excel(r'Data/sets.xlsx', sheet_name = "fuels")
+        mode_sets = read_excel(r'Data/sets.xlsx', sheet_name = "modes")
+        fuel_sets = read_excel(r'Data/sets.xlsx', sheet_name = "fuels")
 
         M_MODES = []       # all modes
         F_FUEL = []            # all fuels
@@ -124,13 +164,13 @@ class ScenarioInformation():
 
     
         # read and process scenario data
-        scenario_data = pd.read_excel(r'Data/'+"scenarios.xlsx", sheet_name=sh_name) 
+        scenario_data = read_excel(r'Data/'+"scenarios.xlsx", sheet_name=sh_name) 
         self.num_scenarios = len(scenario_data)
         self.scenario_names = ["scen_" + str(i).zfill(len(str(self.num_scenarios))) for i in range(self.num_scenarios)] #initialize as scen_00, scen_01, scen_02, etc.
         self.probabilities = [1.0/self.num_scenarios] * self.num_scenarios #initialize as equal probabilities
         
-        variability_data = pd.read_excel(r'Data/'+"scenarios.xlsx", sheet_name="variability")
-        cost_factor_data = pd.read_excel(r'Data/'+"scenarios.xlsx", sheet_name="cost_factor")
+        variability_data = read_excel(r'Data/'+"scenarios.xlsx", sheet_name="variability")
+        cost_factor_data = read_excel(r'Data/'+"scenarios.xlsx", sheet_name="cost_factor")
 
 
         self.variability = None
@@ -209,20 +249,25 @@ class ScenarioInformation():
 #Activating a scenario means that all relevant parameters are changed to their scenario values
 class TransportSets():
 
-    def __init__(self,sheet_name_scenarios='fuel_scenarios',co2_fee="base", TIMES_data=None):# or (self) 
+    def __init__(self,sheet_name_scenarios='fuel_scenarios',co2_fee="base", TIMES_data=None, generate_paths=True):# or (self) 
         
         self.single_time_period = None #only solve last time period -> remove all operational constraints for the other periods
+        self.times_sets = False
+        self.generate_paths = generate_paths   #the node-arc formulation does not need paths (see TranspModel.formulation)
 
-        #read/construct scenario information
         self.active_scenario_name = "benchmark" #no scenario has been activated; all data is from benchmark setting
-        self.scenario_information = ScenarioInformation(sheet_name_scenarios)
-        self.scenario_information_EV = ScenarioInformation('EV_scenario') 
-
         self.risk_information = None
 
-        #read/construct data                
-        self.construct_pyomo_data(co2_fee, TIMES_data)
-        self.combined_sets(TIMES_data)
+        try:
+            #read/construct scenario information
+            self.scenario_information = ScenarioInformation(sheet_name_scenarios)
+            self.scenario_information_EV = ScenarioInformation('EV_scenario') 
+
+            #read/construct data                
+            self.construct_pyomo_data(co2_fee, TIMES_data)
+            self.combined_sets(TIMES_data)
+        finally:
+            close_workbooks()   #release the shared workbook handles (see Data/input_cache.py), also when the construction fails
         
         
 
@@ -240,7 +285,7 @@ class TransportSets():
         self.S_SCENARIOS_ALL = self.scenario_information.scenario_names
         self.S_SCENARIOS = self.S_SCENARIOS_ALL
         
-        self.construct_sets(*[pd.read_excel(r'Data/sets.xlsx',
+        self.construct_sets(*[read_excel(r'Data/sets.xlsx',
                                             sheet_name=s_name) 
                               for s_name in ("modes",
                                              "fuels",
@@ -249,62 +294,88 @@ class TransportSets():
         
         
         
-        self.construct_network(*[pd.read_excel(r'Data/SPATIAL/spatial_data.xlsx',
+        self.construct_network(*[read_excel(r'Data/SPATIAL/spatial_data.xlsx',
                                                sheet_name=s_name) 
                               for s_name in ("zones_STRAM",
                                              "distances_STRAM")])
         
-        self.construct_ODD(pd.read_csv(r'Data/SPATIAL/demand.csv'), TIMES_data)
+        self.construct_ODD(read_csv(r'Data/SPATIAL/demand.csv'), TIMES_data)
         
-        cost_input = load_workbook(r'Data/cost_calculator.xlsx',
-                                   data_only=True)["Parameter Input"]
+        cost_input = read_sheet_values(r'Data/cost_calculator.xlsx', "Parameter Input")
         
         self.construct_vehicles(cost_input)
 
-        self.construct_emission_transfer(pd.read_excel(r'Data/cost_calculator.xlsx',
+        self.construct_emission_transfer(read_excel(r'Data/cost_calculator.xlsx',
                                                 sheet_name="Transfer costs"),
                                          cost_input,
                                          co2_fee)
         
         if TIMES_data is not None:
-            conv_file = pd.read_excel(r'linking/Spatial/spatial_conversion_STRAM_TIMES2.xlsx',
+            conv_file = read_excel(r'linking/Spatial/spatial_conversion_STRAM_TIMES2.xlsx',
                                       sheet_name='edges').fillna(0)
         else:
             conv_file = None
         
-        self.construct_costs(pd.read_excel(r'Data/cost_calculator.xlsx',
+        self.construct_costs(read_excel(r'Data/cost_calculator.xlsx',
                               sheet_name="Parameter Input"), conv_file, TIMES_data) #TODO : changer feuille si usage link
         
-        self.construct_time_value(*[pd.read_excel(r'Data/time_value.xlsx',
+        self.construct_time_value(*[read_excel(r'Data/time_value.xlsx',
                                                 sheet_name=s_name) 
                                   for s_name in ("Output",
                                                  "Speeds")])
         
-        self.construct_investments(*[pd.read_excel(r'Data/capacities_and_investments.xlsx',
+        self.construct_investments(*[read_excel(r'Data/capacities_and_investments.xlsx',
                                                    sheet_name=s_name) 
                               for s_name in ("node_capacities",
                                              "edge_capacities")])
         
-        self.construct_charging_edges(pd.read_excel(r'Data/capacities_and_investments.xlsx',
+        self.construct_charging_edges(read_excel(r'Data/capacities_and_investments.xlsx',
                                                     sheet_name='charging_data'))
         
-        inp1 = [pd.read_excel(r'Data/technological_maturity_readiness.xlsx',
+        inp1 = [read_excel(r'Data/technological_maturity_readiness.xlsx',
                               sheet_name=s_name) 
                               for s_name in ("technological_readiness_bass",
                                              "phase_out_fuels")]
-        inp2 = [pd.read_excel(r'Data/init_mode_fuel_mix.xlsx',
+        inp2 = [read_excel(r'Data/init_mode_fuel_mix.xlsx',
                               sheet_name=s_name) 
                               for s_name in ("init_fuel_mix",
                                              "init_mode_mix")]
         self.construct_tech_readiness(*inp1, *inp2)
+
+        #vehicle types per mode and product (the sets are built from it when needed, see VEHICLE_TYPE_MP)
+        self.prod_to_vehicle_type = read_excel(r'Data/transport_costs_emissions_raw.xlsx', sheet_name='prod_to_vehicle')
         
 
-        self.construct_path_generation(r'Data/SPATIAL/generated_paths_'\
-                                       +str(NUM_MODE_PATHS)+'_modes.pkl')
+        if self.generate_paths:
+            self.construct_path_generation(PATH_CACHE_DIR)
+        else:
+            self.construct_fuel_combinations()
+            self.set_paths([])
         
         self.construct_param2()
-        
-        
+
+        self.compact_parameters()
+
+        if self.generate_paths and PATH_PRUNING:
+            self.prune_dominated_paths(PATH_PRUNING_TOLERANCE)
+
+
+    def parameter_axes(self, *dimensions):
+        # integer-coded index sets of the compact (IndexedParameter) parameters
+        axes = {"arc": ("arc", self.A_ARCS, 4),
+                "fuel": ("fuel", self.F_FUEL, 1),
+                "product": ("product", self.P_PRODUCTS, 1),
+                "year": ("year", self.T_TIME_PERIODS, 1),
+                "scenario": ("scenario", self.S_SCENARIOS_ALL, 1)}
+        return [axes[d] for d in dimensions]
+
+    def compact_parameters(self):
+        # store the large (arc-indexed) parameters as IndexedParameter instead of dict
+        for name, dimensions in COMPACT_PARAMETERS.items():
+            param = getattr(self, name)
+            if not isinstance(param, IndexedParameter):
+                setattr(self, name, IndexedParameter.from_dict(param, self.parameter_axes(*dimensions)))
+
     @timeit
     def construct_sets(self, mode_sets, fuel_sets, product_sets, time_period_sets):
 
@@ -508,17 +579,21 @@ class TransportSets():
         D_DEMAND_ALL = {}  #5330 entries, after cutting off the small elements, only 4105 entries
 
         #then read the pwc_aggr data
-        for index, row in pwc_aggr.iterrows(): #WE ONLY TAKE DEMAND BETWEEN COUNTIES! SO, THIS IS OUR DEFINITION OF LONG-DISTANCE TRANSPORT
-            from_zone = row['from_aggr_zone']
-            to_zone = row['to_aggr_zone']
-            from_node = self.zone_to_centroid[from_zone]
-            to_node = self.zone_to_centroid[to_zone]
-            product = row['product_group']
-            if product in self.P_PRODUCTS:
-                D_DEMAND_ALL[(from_node, to_node,product ,int(row['year']))] = round(float(row['amount_tons']),0)
-            else:
-                if product != 'Liquid bulk':
-                    product
+        #WE ONLY TAKE DEMAND BETWEEN COUNTIES! SO, THIS IS OUR DEFINITION OF LONG-DISTANCE TRANSPORT
+        unknown_zones = set(pwc_aggr['from_aggr_zone']).union(pwc_aggr['to_aggr_zone']).difference(self.zone_to_centroid)
+        if len(unknown_zones) > 0:
+            raise KeyError(f"zones without centroid in demand data: {sorted(unknown_zones)}")
+        demand = pd.DataFrame({'o': pwc_aggr['from_aggr_zone'].map(self.zone_to_centroid),
+                               'd': pwc_aggr['to_aggr_zone'].map(self.zone_to_centroid),
+                               'p': pwc_aggr['product_group'],
+                               't': pwc_aggr['year'].astype(int),
+                               'amount': pwc_aggr['amount_tons'].astype(float)})
+        demand = demand[demand['p'].isin(self.P_PRODUCTS)]      #e.g. 'Liquid bulk' is not modelled
+        # (o,d,p,t) keys are numbered in order of first appearance; if zones share a centroid, the last row counts
+        demand = demand.assign(key=demand.groupby(['o','d','p','t'], sort=False).ngroup().to_numpy())
+        demand = demand.drop_duplicates('key', keep='last').sort_values('key')
+        D_DEMAND_ALL = dict(zip(zip(demand['o'], demand['d'], demand['p'], demand['t'].tolist()),
+                                demand['amount'].round(0).tolist()))
     
 
         demands = pd.Series(D_DEMAND_ALL.values())         
@@ -554,20 +629,16 @@ class TransportSets():
 
         #ODP
         self.OD_PAIRS = {p: [] for p in self.P_PRODUCTS}
-        for (o,d,p,t), value in D_DEMAND_ALL.items():
-            if ((o,d) not in self.OD_PAIRS[p]):
-                self.OD_PAIRS[p].append((o,d))
-        self.ODP = []
-        self.OD_PAIRS_ALL = set()
-        for p in self.P_PRODUCTS:
-            for (o, d) in self.OD_PAIRS[p]:
-                self.OD_PAIRS_ALL.add((o, d))
-                self.ODP.append((o, d, p))
-        self.OD_PAIRS_ALL = list(self.OD_PAIRS_ALL)
+        od_pairs = demand.drop_duplicates(['o','d','p'])   #in order of first appearance
+        for (o,d,p) in zip(od_pairs['o'], od_pairs['d'], od_pairs['p']):
+            self.OD_PAIRS[p].append((o,d))
+        self.ODP = [(o, d, p) for p in self.P_PRODUCTS for (o, d) in self.OD_PAIRS[p]]
+        self.OD_PAIRS_ALL = list(dict.fromkeys((o, d) for (o, d, p) in self.ODP))
         
         self.D_DEMAND = {(o,d,p,t):0 for t in self.T_TIME_PERIODS_PWC for (o,d,p) in self.ODP}        
-        for (o,d,p,t), value in D_DEMAND_ALL.items():
-            self.D_DEMAND[(o,d,p,t)] = round(value / self.scaling_factor_weight,self.precision_digits)
+        scaled_demand = (demand['amount'].round(0) / self.scaling_factor_weight).tolist()
+        for key, value in zip(D_DEMAND_ALL.keys(), scaled_demand):
+            self.D_DEMAND[key] = round(value, self.precision_digits)
         
         # if TIMES_data != None:
         #     for (o,d,p,t), val in TIMES_data.trade_TIMES_odpt.items():
@@ -625,111 +696,133 @@ class TransportSets():
                         "CO2 emission per km",
                         "CO2 emission cost per km"]
         
-        self.VEHICLES_DATA_MP = {(m,p):pd.DataFrame(columns=columns_MP).set_index('Year') for m in self.M_MODES for p in self.PC_PRODUCT_CLASSES}
-        self.VEHICLES_DATA_MF = {(m,f):pd.DataFrame(columns=columns_MF).set_index('Year') for m in self.M_MODES for f in self.FM_FUEL[m]}
+        self.VEHICLES_COLUMNS_MP = columns_MP[1:]
+        self.VEHICLES_COLUMNS_MF = columns_MF[1:]
+        
+        grid = ws.to_array()   #all cell values of the sheet, read at once
+        
+        def value(row, col):    #1-based, as ws.cell(row, col).value
+            if row <= grid.shape[0] and col <= grid.shape[1]:
+                return grid[row-1, col-1]
+            return None
         
+        def block(row, n_rows, cols):    #the n_rows rows below row, selected (1-based) columns, as floats
+            return grid[row:row+n_rows, [c-1 for c in cols]].astype(float)
         
+        # first pass: locate all tables in the sheet
         taxes = {}
+        tables = []     #(table type, mode, product class/fuel, t_start, t_end, parameters) in order of appearance
         
-        for row in range(1, ws.max_row+1):
+        for row in range(1, grid.shape[0]+1):
             
-            if ws.cell(row, 2).value == "TAX":
-                taxes[(ws.cell(row, 3).value, ws.cell(row, 4).value)] = float(ws.cell(row, 5).value)
+            if value(row, 2) == "TAX":
+                taxes[(value(row, 3), value(row, 4))] = float(value(row, 5))
             
-            if ws.cell(row, 1).value is not None and type(ws.cell(row, 1).value) == str :
-                if "Road" in ws.cell(row, 1).value:
+            if value(row, 1) is not None and type(value(row, 1)) == str :
+                if "Road" in value(row, 1):
                     mode = "Road"
-                elif "Railway" in ws.cell(row, 1).value:
+                elif "Railway" in value(row, 1):
                     mode = "Rail"
-                elif "Sea" in ws.cell(row, 1).value:
+                elif "Sea" in value(row, 1):
                     mode = "Sea"
             
-            if ws.cell(row, 1).value is not None and type(ws.cell(row, 1).value) == str and ws.cell(row, 1).value.split(": ")[-1] in self.PC_PRODUCT_CLASSES:
-                product = ws.cell(row, 1).value.split(": ")[-1]
-                t_start = int(ws.cell(row, 2).value)
-                t_end = int(ws.cell(row, 3).value)
-                for t in range(t_start, t_end+1):
-                    values = [sigmoid(t,
-                                        float(ws.cell(row+subrow, 2).value),
-                                        float(ws.cell(row+subrow, 3).value),
-                                        t_start, t_end,
-                                        float(ws.cell(row+subrow, 5).value),
-                                        float(ws.cell(row+subrow, 6).value),
-                                        float(ws.cell(row+subrow, 7).value)) for subrow in range(1,9)]
-                    self.VEHICLES_DATA_MP[(mode,product)].loc[int(t)] = values
-                                        
+            if value(row, 1) is not None and type(value(row, 1)) == str and value(row, 1).split(": ")[-1] in self.PC_PRODUCT_CLASSES:
+                product = value(row, 1).split(": ")[-1]
+                tables.append(("MP", mode, product, int(value(row, 2)), int(value(row, 3)), block(row, 8, [2, 3, 5, 6, 7])))
             
-            if ws.cell(row, 11).value is not None and type(ws.cell(row, 11).value) == str and ws.cell(row, 11).value.split(" ")[0] in self.F_FUEL:
-                fuel = ws.cell(row, 11).value.split(" ")[0]
-                t_start = int(ws.cell(row, 12).value)
-                t_end = int(ws.cell(row, 13).value)
-                for t in range(t_start, t_end+1):
-                    values = [sigmoid(t,
-                                      float(ws.cell(row+subrow, 12).value),
-                                      float(ws.cell(row+subrow, 13).value),
-                                      t_start, t_end,
-                                      float(ws.cell(row+subrow, 15).value),
-                                      float(ws.cell(row+subrow, 16).value),
-                                      float(ws.cell(row+subrow, 17).value))
-                              for subrow in range(1,10)]
-                    
-                    if t in self.VEHICLES_DATA_MF[(mode,fuel)].index:
-                        for subrow in range(1, 10):
-                            self.VEHICLES_DATA_MF[(mode,fuel)].loc[t, columns_MF[:10][subrow]] = values[subrow-1]
-                    else:
-                        self.VEHICLES_DATA_MF[(mode,fuel)].loc[int(t)] = values + 6*[0]
-
-                    
+            if value(row, 11) is not None and type(value(row, 11)) == str and value(row, 11).split(" ")[0] in self.F_FUEL:
+                fuel = value(row, 11).split(" ")[0]
+                tables.append(("MF", mode, fuel, int(value(row, 12)), int(value(row, 13)), block(row, 9, [12, 13, 15, 16, 17])))
             
             col = 23
-            while ws.cell(row, col).value is not None and type(ws.cell(row, col).value) == str and ws.cell(row, col).value.split(" ")[-1][0].upper() + ws.cell(row, col).value.split(" ")[-1][1:] in self.F_FUEL:
-                mode_bis = ws.cell(row, col).value.split(" ")[0].title()
+            while value(row, col) is not None and type(value(row, col)) == str and value(row, col).split(" ")[-1][0].upper() + value(row, col).split(" ")[-1][1:] in self.F_FUEL:
+                mode_bis = value(row, col).split(" ")[0].title()
                 if mode_bis == "Truck":
                     mode_bis = "Road"
-                fuel = ws.cell(row, col).value.split(" ")[-1][0].upper() + ws.cell(row, col).value.split(" ")[-1][1:]
-                t_start = int(ws.cell(row, col+1).value)
-                t_end = int(ws.cell(row, col+2).value)
+                fuel = value(row, col).split(" ")[-1][0].upper() + value(row, col).split(" ")[-1][1:]
                 cur_mid = 12 #TODO:change hardcoded
                 cur_a = 0.9
                 cur_k = 0.4
-                for t in range(t_start, t_end+1):
-                    values = [sigmoid(t,
-                                      float(ws.cell(row+subrow, col+1).value),
-                                      float(ws.cell(row+subrow, col+2).value),
-                                      t_start, t_end, cur_mid, cur_a, cur_k)
-                              for subrow in range(1,7)]
-                    
-                    if t in self.VEHICLES_DATA_MF[(mode_bis,fuel)].index:
-                        for subrow in range(1,7):
-                            self.VEHICLES_DATA_MF[(mode_bis,fuel)].loc[t, columns_MF[10:][subrow]] = values[subrow-1]
-                    else:
-                        self.VEHICLES_DATA_MF[(mode_bis,fuel)].loc[int(t)] = 9*[0] + values
-                
+                parameters = np.zeros((6, 5))
+                parameters[:, 0:2] = block(row, 6, [col+1, col+2])
+                parameters[:, 2:5] = [cur_mid, cur_a, cur_k]
+                tables.append(("MF_CO2", mode_bis, fuel, int(value(row, col+1)), int(value(row, col+2)), parameters))
                 col += 5
         
+        # (mode, product class/fuel, year, attribute) arrays, nan where there is no data
+        # the years of the fuel cost table (row 3, from column J) are added to the years of the parameter tables
+        fuel_cost_years = []
+        col = 10
+        while col < 100 and value(3, col) is not None:
+            year = value(3, col)
+            if not isinstance(year, (int, np.integer)) and not (isinstance(year, float) and year.is_integer()):
+                raise ValueError(f"Parameter Input sheet (cost_calculator.xlsx), cell {get_column_letter(col)}3: "
+                                 f"fuel cost year {year!r} is not a year")
+            fuel_cost_years.append(int(year))
+            col += 1
+        self.VEHICLE_YEARS = sorted(set(range(min(t[3] for t in tables), max(t[4] for t in tables)+1)) | set(fuel_cost_years))
+        year_index = {t: i for i, t in enumerate(self.VEHICLE_YEARS)}
+        M, PC, F = self.M_MODES, self.PC_PRODUCT_CLASSES, self.F_FUEL
+        self.VEHICLES_ARRAY_MP = np.full((len(M), len(PC), len(self.VEHICLE_YEARS), len(columns_MP)-1), np.nan)
+        self.VEHICLES_ARRAY_MF = np.full((len(M), len(F), len(self.VEHICLE_YEARS), len(columns_MF)-1), np.nan)
+        has_year_MP = np.zeros(self.VEHICLES_ARRAY_MP.shape[:3], dtype=bool)
+        has_year_MF = np.zeros(self.VEHICLES_ARRAY_MF.shape[:3], dtype=bool)
+        
+        for (table, m, k, t_start, t_end, parameters) in tables:
+            years = np.arange(t_start, t_end+1)
+            t_idx = np.arange(year_index[t_start], year_index[t_end]+1)
+            values = sigmoid(years[:, None], parameters[:, 0], parameters[:, 1], t_start, t_end,
+                             parameters[:, 2], parameters[:, 3], parameters[:, 4])    #(year, parameter)
+            if table == "MP":
+                self.VEHICLES_ARRAY_MP[M.index(m), PC.index(k), t_idx] = values
+                has_year_MP[M.index(m), PC.index(k), t_idx] = True
+            else:
+                cols = slice(0, 9) if table == "MF" else slice(9, 15)
+                other_cols = slice(9, 15) if table == "MF" else slice(0, 9)
+                new_years = t_idx[~has_year_MF[M.index(m), F.index(k), t_idx]]
+                self.VEHICLES_ARRAY_MF[M.index(m), F.index(k), t_idx, cols] = values
+                self.VEHICLES_ARRAY_MF[M.index(m), F.index(k), new_years, other_cols] = 0
+                has_year_MF[M.index(m), F.index(k), t_idx] = True
+        
         # WARNING: fuel cost values inconsistent between table on right and left side of sheet input parameters 
         # Values here: left table. Values after next section: right values
+        fuel_cost = columns_MF.index("Fuel Cost") - 1
+        mf_keys = [(m,f) for m in M for f in self.FM_FUEL[m]]
         if True:
-            for row in range(1, ws.max_row+1):
-                if ws.cell(row, 9).value is None and row > 5:
+            for row in range(1, grid.shape[0]+1):
+                if value(row, 9) is None and row > 5:
                     break
-                elif ws.cell(row, 9).value is not None:
-                    for key in self.VEHICLES_DATA_MF.keys(): # key = ("Road", "Battery") for example
-                        if ws.cell(row, 9).value in key or ws.cell(row, 9).value == "Electricity":
-                            for col in range(10, 100):
-                                if ws.cell(row, col).value is not None:
-                                    if ws.cell(row, 9).value == "Electricity" and key[0] != "Sea":
-                                        self.VEHICLES_DATA_MF[(key[0], "Battery")].loc[ws.cell(3, col).value, "Fuel Cost"] = ws.cell(row, col).value
-                                        if key[0] == "Rail":
-                                            self.VEHICLES_DATA_MF[(key[0], "Catenary")].loc[ws.cell(3, col).value, "Fuel Cost"] = ws.cell(row, col).value
-                                        # print(key, ws.cell(3, col).value, self.VEHICLES_DATA_MF[key].loc[ws.cell(3, col).value, "Fuel Cost"])
-                                    else:
-                                        self.VEHICLES_DATA_MF[key].loc[ws.cell(3, col).value, "Fuel Cost"] = ws.cell(row, col).value
-                                else:
-                                    break
+                elif value(row, 9) is not None:
+                    col_end = 10
+                    while col_end < 100 and value(row, col_end) is not None:
+                        col_end += 1
+                    t_idx = [year_index[int(value(3, col))] for col in range(10, col_end)]
+                    prices = [value(row, col) for col in range(10, col_end)]
+                    for key in mf_keys: # key = ("Road", "Battery") for example
+                        if value(row, 9) in key or value(row, 9) == "Electricity":
+                            if value(row, 9) == "Electricity" and key[0] != "Sea":
+                                fuels = ["Battery", "Catenary"] if key[0] == "Rail" else ["Battery"]
+                            else:
+                                fuels = [key[1]]
+                            for f in fuels:
+                                self.VEHICLES_ARRAY_MF[M.index(key[0]), F.index(f), t_idx, fuel_cost] = prices
+                                has_year_MF[M.index(key[0]), F.index(f), t_idx] = True   #a fuel cost year outside the table adds a year (other values nan)
     
         for (m,f) in taxes.keys():
-            self.VEHICLES_DATA_MF[(m,f)]["Fuel Cost"] = self.VEHICLES_DATA_MF[(m,f)]["Fuel Cost"]  + taxes[(m,f)]
+            self.VEHICLES_ARRAY_MF[M.index(m), F.index(f), :, fuel_cost] += taxes[(m,f)]
+        
+        # DataFrame views (indexed by year) on the arrays
+        def frame(values, has_year, columns):
+            t_idx = np.flatnonzero(has_year)
+            if len(t_idx) > 0 and t_idx[-1] - t_idx[0] + 1 == len(t_idx):
+                t_idx = slice(t_idx[0], t_idx[-1]+1)    #contiguous years: no copy
+            return pd.DataFrame(values[t_idx], index=pd.Index(np.array(self.VEHICLE_YEARS)[t_idx], name="Year"),
+                                columns=columns, copy=False)
+        
+        self.VEHICLES_DATA_MP = {(m,p):frame(self.VEHICLES_ARRAY_MP[M.index(m), PC.index(p)], has_year_MP[M.index(m), PC.index(p)], columns_MP[1:])
+                                 for m in M for p in PC}
+        self.VEHICLES_DATA_MF = {(m,f):frame(self.VEHICLES_ARRAY_MF[M.index(m), F.index(f)], has_year_MF[M.index(m), F.index(f)], columns_MF[1:])
+                                 for m in M for f in self.FM_FUEL[m]}
             
         
     @timeit
@@ -810,20 +903,11 @@ class TransportSets():
                 self.CO2_fee[t] = fee_adj/self.scaling_factor_monetary*self.scaling_factor_emissions
 
         COST_BIG_M = 10**8
-        #base level transport costs (in average scenario)
-        self.C_TRANSP_COST_BASE = {(i,j,m,r, f, p, t): COST_BIG_M for (i,j,m,r) in self.A_ARCS for f in self.FM_FUEL[m] 
-                              for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS}   #UNIT: NOK/T
-        #scenario-dependent transport cost (computed using base cost)
+        #the arc-indexed transport costs (C_TRANSP_COST_BASE, C_TRANSP_COST) are constructed in construct_costs
         self.C_TRANSP_COST_NORMALIZED = {(m,f, p, t): COST_BIG_M for m in self.M_MODES for f in self.FM_FUEL[m] 
                               for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS}   #UNIT: NOK/Tkm
         self.E_EMISSIONS_NORMALIZED = {(m,f,p,t): COST_BIG_M for m in self.M_MODES for f in self.FM_FUEL[m] 
                             for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS}      #UNIT:  gCO2/T
-        self.C_TRANSP_COST = {(i,j,m,r, f, p, t,s): COST_BIG_M for (i,j,m,r) in self.A_ARCS for f in self.FM_FUEL[m] 
-                              for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS for s in self.S_SCENARIOS}   #UNIT: NOK/T
-        self.E_EMISSIONS = {(i,j,m,r,f,p,t): COST_BIG_M for (i,j,m,r) in self.A_ARCS for f in self.FM_FUEL[m] 
-                            for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS}      #UNIT:  gCO2/T
-        self.C_CO2 = {(i,j,m,r,f,p,t): COST_BIG_M for (i,j,m,r) in self.A_ARCS for f in self.FM_FUEL[m] 
-                      for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS}   #UNIT: nok/T
         # new: time value
         self.TIME_VALUE_PER_TH = {p: COST_BIG_M for p in self.P_PRODUCTS}   #UNIT: NOK/Th (NOK per tonne-hour)
         self.TIME_IN_TERMINAL = {m: 0 for m in self.M_MODES}   #UNIT: NOK/Th (NOK per tonne-hour)
@@ -847,15 +931,22 @@ class TransportSets():
         
         
         
-        # process emissions per arc
-        for (i,j,m,r) in self.A_ARCS:
-            a = (i, j, m, r)
+        # process emissions per arc (directly as IndexedParameter over (arc, fuel, product, year), nan for the fuels of other modes)
+        M, F, P, T = self.M_MODES, self.F_FUEL, self.P_PRODUCTS, self.T_TIME_PERIODS
+        normalized = np.full((len(M), len(F), len(P), len(T)), np.nan)
+        for m in M:
             for f in self.FM_FUEL[m]:
-                for p in self.P_PRODUCTS:
-                    for y in self.T_TIME_PERIODS:
-                        self.E_EMISSIONS[(i, j, m, r, f, p, y)] = round(self.AVG_DISTANCE[a] * self.E_EMISSIONS_NORMALIZED[(m,f,p,y)], self.precision_digits)
-                        #CO2 costs per tonne:
-                        self.C_CO2[(i, j, m, r, f, p, y)] =  round(self.E_EMISSIONS[(i, j, m, r, f, p, y)] * self.CO2_fee[y], self.precision_digits)
+                for p_nr, p in enumerate(P):
+                    for y_nr, y in enumerate(T):
+                        normalized[M.index(m), F.index(f), p_nr, y_nr] = self.E_EMISSIONS_NORMALIZED[(m,f,p,y)]
+        arc_mode = [M.index(m) for (i,j,m,r) in self.A_ARCS]
+        distance = np.array([self.AVG_DISTANCE[a] for a in self.A_ARCS], dtype=float)
+        emissions = round_array(distance[:, None, None, None]*normalized[arc_mode], self.precision_digits)     #UNIT:  gCO2/T
+        co2_fee = np.array([self.CO2_fee[y] for y in T], dtype=float)
+        self.E_EMISSIONS = IndexedParameter(self.parameter_axes("arc", "fuel", "product", "year"), emissions)
+        #CO2 costs per tonne:
+        self.C_CO2 = IndexedParameter(self.parameter_axes("arc", "fuel", "product", "year"), 
+                                      round_array(emissions*co2_fee, self.precision_digits))     #UNIT: nok/T
         
 
     # @timeit
@@ -923,6 +1014,88 @@ class TransportSets():
 
         return cost_euro_per_t_km #euro/tkm
     
+    def get_cost_table(self):
+        # vectorized version of get_cost_MFPA (without TIMES fuel prices): euro/tkm as an array over (mode, fuel, product class, year)
+        # entries of fuels that are not available for a mode are nan
+        M, F, PC, T = self.M_MODES, self.F_FUEL, self.PC_PRODUCT_CLASSES, self.T_TIME_PERIODS
+        
+        columns_MF = ["WACC", "Lifetime vehicle", "Capex vehicle", "Residual value (vehicle)", "Opex maintenance & repair",
+                      "Emission cost", "Fuel Economy", "Fuel Cost", "Payload loss (fuel)"]
+        columns_MP = ["Lifetime costumization", "Tonnage", "Annual Mileage", "Capex costumization", "Residual value (costumization)",
+                      "Opex fix (admin, crew, insurance)", "Opex var (mode-fees)", "Market failure (av. utilization)"]
+        
+        MF = np.full((len(columns_MF), len(M), len(F), 1, len(T)), np.nan)
+        for (m,f), df in self.VEHICLES_DATA_MF.items():
+            MF[:, M.index(m), F.index(f), 0, :] = df.reindex(index=T, columns=columns_MF).to_numpy(dtype=float).T
+        MP = np.full((len(columns_MP), len(M), 1, len(PC), len(T)), np.nan)
+        for (m,pc), df in self.VEHICLES_DATA_MP.items():
+            MP[:, M.index(m), 0, PC.index(pc), :] = df.reindex(index=T, columns=columns_MP).to_numpy(dtype=float).T
+        
+        wacc, lt_veh, capex_veh, res_veh, opex_maint, emission_cost, fuel_economy, fuel_cost, payload_loss = MF
+        lt_cus, tonnage, mileage, capex_cus, res_cus, opex_fix, opex_var, market_failure = MP
+        
+        def equation(wacc, lifetime, capex):
+            return ((1+wacc)**np.trunc(lifetime))*wacc*capex/(((1+wacc)**np.trunc(lifetime))-1)
+        
+        # same order of operations as in get_cost_MFPA
+        cost_euro = equation(wacc, lt_veh, capex_veh)
+        cost_euro = cost_euro + equation(wacc, lt_veh, res_veh)
+        cost_euro = cost_euro + equation(wacc, lt_cus, capex_cus)
+        cost_euro = cost_euro + equation(wacc, lt_cus, res_cus)
+        cost_euro = cost_euro + opex_fix
+        cost_euro = cost_euro + opex_maint
+        cost_euro = cost_euro + opex_var*mileage
+        cost_euro = cost_euro + emission_cost*mileage
+        cost_euro = cost_euro + fuel_economy*(fuel_cost*0.5 + fuel_cost*0.5)*mileage
+        
+        cost_euro_per_t_km = cost_euro/(mileage*tonnage)
+        cost_euro_per_t_km = cost_euro_per_t_km + cost_euro*(1/market_failure - 1)/(mileage*tonnage)
+        cost_euro_per_t_km = cost_euro_per_t_km + cost_euro*(1/(1-payload_loss) - 1)/(mileage*tonnage)
+        
+        return cost_euro_per_t_km #euro/tkm
+    
+    def construct_costs_vectorized(self):
+        # computes the per-tkm cost once per (m,f,pc,y) and broadcasts it over the arcs and scenarios
+        M, F, T, S = self.M_MODES, self.F_FUEL, self.T_TIME_PERIODS, self.S_SCENARIOS
+        
+        pc_index = [self.PC_PRODUCT_CLASSES.index(self.P_TO_PC[p]) for p in self.P_PRODUCTS]
+        cost = self.get_cost_table()[:, :, pc_index, :]*EXCHANGE_RATE_EURO_TO_NOK    #(m,f,p,y)
+        normalized = round_array(cost/self.scaling_factor_monetary*self.scaling_factor_weight, self.precision_digits)
+        
+        # cost factor per (m,f,p,y,cost path), equal to 1 for the first stage, and the cost path per (f,s)
+        scen_info = self.scenario_information
+        fuel_cost_path = {(f,s): scen_info.fg_fuel_cost_path_name[scen_info.scen_name_to_nr[s]][self.F_TO_FG[f]] 
+                            for m in M for f in self.FM_FUEL[m] for s in S}   #  "B", "P" or "O"
+        cost_paths = sorted(set(fuel_cost_path.values()))
+        fuel_paths = np.zeros((len(F), len(S)), dtype=int)
+        for (f,s), fg_scen in fuel_cost_path.items():
+            fuel_paths[F.index(f), S.index(s)] = cost_paths.index(fg_scen)
+        factor = np.ones(normalized.shape + (len(cost_paths),))
+        for m in M:
+            for f in self.FM_FUEL[m]:
+                for fg_scen in {fuel_cost_path[(f,s)] for s in S}:
+                    for p_nr, p in enumerate(self.P_PRODUCTS):
+                        pc = self.P_TO_PC[p]
+                        for y_nr, y in enumerate(T):
+                            if y in self.T_TIME_SECOND_STAGE_BASE:
+                                factor[M.index(m), F.index(f), p_nr, y_nr, cost_paths.index(fg_scen)] = scen_info.cost_factor[(fg_scen,y,m,pc,f)]
+        stage = np.array([y in self.T_TIME_FIRST_STAGE_BASE or y in self.T_TIME_SECOND_STAGE_BASE for y in T])
+        factor[:, :, :, ~stage, :] = np.nan
+        
+        arc_mode = [M.index(m) for (i,j,m,r) in self.A_ARCS]
+        distance = np.array([self.AVG_DISTANCE[a] for a in self.A_ARCS], dtype=float)
+        base = round_array(distance[:, None, None, None]*normalized[arc_mode], self.precision_digits)          #(a,f,p,y)
+        
+        normalized_list = normalized.tolist()
+        for m in M:
+            for f in self.FM_FUEL[m]:
+                for p_nr, p in enumerate(self.P_PRODUCTS):
+                    for y_nr, y in enumerate(T):
+                        self.C_TRANSP_COST_NORMALIZED[(m,f,p,y)] = normalized_list[M.index(m)][F.index(f)][p_nr][y_nr]
+        
+        self.C_TRANSP_COST_BASE = IndexedParameter(self.parameter_axes("arc", "fuel", "product", "year"), base)
+        self.C_TRANSP_COST = FactoredParameter(self.C_TRANSP_COST_BASE, factor, arc_mode, fuel_paths, S, self.precision_digits)
+    
     @timeit
     def construct_costs(self, param_input, conv_file, TIMES_data=None):
         # read transport costs
@@ -931,6 +1104,18 @@ class TransportSets():
         
         
         self.sreg_to_treg = dict()
+        if TIMES_data is None:  # costs do not depend on the arc (other than through the distance)
+            self.construct_costs_vectorized()
+            return
+        
+        COST_BIG_M = 10**8
+        #base level transport costs (in average scenario)
+        self.C_TRANSP_COST_BASE = {(i,j,m,r, f, p, t): COST_BIG_M for (i,j,m,r) in self.A_ARCS for f in self.FM_FUEL[m] 
+                              for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS}   #UNIT: NOK/T
+        #scenario-dependent transport cost (computed using base cost)
+        self.C_TRANSP_COST = {(i,j,m,r, f, p, t,s): COST_BIG_M for (i,j,m,r) in self.A_ARCS for f in self.FM_FUEL[m] 
+                              for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS for s in self.S_SCENARIOS}   #UNIT: NOK/T
+        
         for (i,j,m,r) in self.A_ARCS:
             a = (i, j, m, r)
             if TIMES_data is not None:
@@ -1267,7 +1452,7 @@ class TransportSets():
 
 
     @timeit
-    def construct_path_generation(self, path):
+    def construct_path_generation(self, cache_dir):
         #----------------------------------------
         #      PATH GENERATION
         #-----------------------------------------
@@ -1276,9 +1461,9 @@ class TransportSets():
 
         #from Data.settings import *
         
-        if not os.path.exists(path):         
-            path_generation(
-                    products=self.P_PRODUCTS, 
+        #the paths are stored per combination of inputs (keyed on their content hash), and only generated if 
+        #there are no paths yet for the current inputs
+        inputs = dict(products=self.P_PRODUCTS, 
                     p_to_pc=self.P_TO_PC,
                     modes=self.M_MODES, 
                     nodes=self.N_NODES, 
@@ -1290,88 +1475,46 @@ class TransportSets():
                     emission_fee=self.CO2_fee,           
                     prod_transfer_costs=self.TRANSFER_COST_PER_MODE_PAIR,    
                     mode_to_fuels=self.FM_FUEL,           
-                    mode_comb_level=NUM_MODE_PATHS         
-                    )
+                    mode_comb_level=NUM_MODE_PATHS)
+        self.PATH_KEY = path_generation_key(**inputs)
+        #the same inputs, except for the network (paths with the same cost_key can be updated incrementally)
+        cost_key = path_generation_key(**{name: value for name, value in inputs.items() if name not in ("edges", "distances")})
+        self.PATH_FILE = os.path.join(cache_dir, 'generated_paths_'+str(NUM_MODE_PATHS)+'_modes_'+self.PATH_KEY)
+        
+        if not path_store_exists(self.PATH_FILE):
+            print("Generating paths (no paths for the current inputs in "+cache_dir+")")
+            metadata = {"key": self.PATH_KEY, 
+                        "cost_key": cost_key,
+                        "mode_comb_level": NUM_MODE_PATHS,
+                        "num_nodes": len(self.N_NODES), 
+                        "num_edges": len(self.E_EDGES),
+                        "products": list(self.P_PRODUCTS), 
+                        "years": [int(y) for y in self.T_TIME_PERIODS],
+                        "fuels": {m: list(fuels) for m, fuels in self.FM_FUEL.items()},
+                        "co2_fee": {int(y): float(fee) for y, fee in self.CO2_fee.items()},
+                        "edges": [[i,j,m,int(r),float(self.AVG_DISTANCE[(i,j,m,r)])] for (i,j,m,r) in self.E_EDGES]}
+            previous = None
+            if PATH_INCREMENTAL:
+                previous = load_previous_paths(cache_dir, cost_key, self.E_EDGES, self.AVG_DISTANCE)
+            path_generation(**inputs, workers=PATH_GENERATION_WORKERS, file_name=self.PATH_FILE, metadata=metadata, previous=previous,
+                            check=PATH_INCREMENTAL_CHECK)
 
         #import ast
         #all_generated_paths = pd.read_csv(r'Data/SPATIAL/'+filename, converters={'paths': ast.literal_eval})  #, converters={'paths': eval}        #This provides an encoding error
         
-        with open(path, 'rb') as file:
-            all_generated_paths = pickle.load(file)
+        path_store = PathStore(self.PATH_FILE)
+        all_generated_paths = path_store.paths()
         
-        self.K_PATH_DICT = {i:None for i in range(len(all_generated_paths))}
+        #self.K_PATH_DICT = {i:None for i in range(len(all_generated_paths))}
         #for index, row in all_generated_paths.iterrows():
         #    elem = tuple(row['paths']) 
         #    self.K_PATHS.append(index)
         #    self.K_PATH_DICT[index]=elem
-        for i in range(len(all_generated_paths)):
-            elem = tuple(all_generated_paths[i]) 
-            self.K_PATHS.append(i)
-            self.K_PATH_DICT[i]=elem        
-
-        self.OD_PATHS = {od: [] for od in self.OD_PAIRS_ALL}
-        for od in self.OD_PAIRS_ALL:
-            for k in self.K_PATHS:
-                path = self.K_PATH_DICT[k]
-                if od[0] == path[0][0] and od[-1] == path[-1][1]:
-                    self.OD_PATHS[od].append(k)
-
-        #multi-mode paths and unimodal paths
-        self.MULTI_MODE_PATHS = []
-        for kk in self.K_PATHS:
-            k = self.K_PATH_DICT[kk]
-            if len(k) > 1:
-                for i in range(len(k)-1):
-                    if k[i][2] != k[i+1][2]:
-                        self.MULTI_MODE_PATHS.append(kk)
-        self.UNI_MODAL_PATHS = list(set(self.K_PATHS)-set(self.MULTI_MODE_PATHS))
-
-        self.UNI_MODAL_PATHS_PER_MODE = {m:[] for m in self.M_MODES}
-        for kk in self.UNI_MODAL_PATHS:
-            (i,j,m,r) = self.K_PATH_DICT[kk][0]
-            self.UNI_MODAL_PATHS_PER_MODE[m].append(kk)
-
-        self.PATHS_NO_UNIMODAL_ROAD = list(set(self.K_PATHS)-set(self.UNI_MODAL_PATHS_PER_MODE["Road"]))
-
-
-        #Paths with transfer in node i to/from mode m
-        #self.TRANSFER_PATHS = {(i,m) : [] for m in self.M_MODES_CAP for i in self.N_NODES_CAP_NORWAY[m]}
-        self.TRANSFER_PATHS = {(i,m) : [] for (i,m) in self.NM_CAP}  #When transfering, you will have to use a mode with a capacitated terminal (rail or sea)
-
-        for (i,m) in self.NM_CAP:
-            for kk in self.MULTI_MODE_PATHS:
-                k = self.K_PATH_DICT[kk]
-                for j in range(len(k)-1):
-                    if (k[j][1] == i) and (k[j][2] == m or k[j+1][2] == m) and (k[j][2] != k[j+1][2]):
-                        self.TRANSFER_PATHS[(i,m)].append(kk)
-
-        #Origin and destination paths  (this is used to calculate the capacity usage in terminals)
-        self.ORIGIN_PATHS = {(i,m): [] for (i,m) in self.NM_CAP}
-        self.DESTINATION_PATHS = {(i,m): [] for (i,m) in self.NM_CAP}
         
-        for (i,m) in self.NM_CAP:
-            for kk in self.K_PATHS:
-                k = self.K_PATH_DICT[kk]
-                if (k[0][0] == i) and (k[0][2] == m):
-                    self.ORIGIN_PATHS[(i,m)].append(kk)
-                if (k[-1][1] == i) and (k[-1][2] == m):
-                    self.DESTINATION_PATHS[(i,m)].append(kk)
-        
-        
-        self.KA_PATHS = {a:[] for a in self.A_ARCS}
-        for kk in self.K_PATHS:
-            k = self.K_PATH_DICT[kk]
-            for (i,j,m,r) in k:
-                a = (i,j,m,r)
-                self.KA_PATHS[a].append(kk)
+        self.construct_fuel_combinations()
+        self.set_paths(all_generated_paths, path_store.ids.tolist())   #the paths keep their id when the paths are updated incrementally
 
-        self.KA_PATHS_UNIMODAL = {a:[] for a in self.A_ARCS}
-        for kk in self.UNI_MODAL_PATHS:
-            k = self.K_PATH_DICT[kk]
-            for (i,j,m,r) in k:
-                a = (i,j,m,r)
-                self.KA_PATHS_UNIMODAL[a].append(kk)
-        
+    def construct_fuel_combinations(self):
         self.FM_MULTI = {}
         for m1 in self.M_MODES:
             self.FM_MULTI[(m1,m1)] = []
@@ -1385,6 +1528,175 @@ class TransportSets():
                             self.FM_MULTI[(m1,m2)].append((f1, f2))
         # For each modes combination, we have a list of possible fuel combination
         # Ex: self.FM_MULTI[("Road", "Rail")] = [("Diesel", "Catenary"), ("Diesel", "Battery"), ..., ("Hydrogen", "Catenary"),("Hydrogen", "Battery"), ...]
+
+    def set_paths(self, paths, ids=None):
+        # (re)build the paths K_PATHS/K_PATH_DICT and all path index sets (path ids[n] is paths[n], ids: 0, 1, ... if None)
+        self._set_paths(paths, ids)
+        if "C_TRANSFER" in self.__dict__:   #already constructed (see construct_param2)
+            self.construct_param2()
+        self.invalidate_sets()
+
+    def copy_with_paths(self, paths):
+        # copy of this data (of a view: with the time periods/scenarios of the view) with other paths, this data is not changed
+        # (only the paths and the data that depends on them are replaced, everything else is shared with this data)
+        data = copy.copy(self.__dict__.get("_parent", self))
+        for name in SET_KEY_ATTRIBUTES:
+            setattr(data, name, getattr(self, name))
+        #the paths of this data keep their id, the other paths get new ids
+        path_id = {path: k for k, path in self.K_PATH_DICT.items()}
+        next_id = max(self.K_PATHS, default=-1) + 1
+        ids = []
+        for path in paths:
+            path = tuple(path)
+            if path not in path_id:
+                path_id[path] = next_id
+                next_id += 1
+            ids.append(path_id[path])
+        data.set_paths(paths, ids)
+        return data
+
+    def save_paths(self, directory):
+        # store the current paths with their ids (path k is K_PATH_DICT[k]), see Data/path_store.py
+        save_path_store(directory, [self.K_PATH_DICT[k] for k in self.K_PATHS], self.N_NODES, self.M_MODES, self.AVG_DISTANCE, self.K_PATHS)
+
+    def add_paths(self, paths):
+        # append the paths that are not there yet (with new ids), returns their ids
+        existing = set(self.K_PATH_DICT.values())
+        new_paths = []
+        for path in paths:
+            path = tuple(path)
+            if path not in existing:
+                existing.add(path)
+                new_paths.append(path)
+        next_id = max(self.K_PATHS, default=-1) + 1
+        new_ids = list(range(next_id, next_id + len(new_paths)))
+        self.set_paths([self.K_PATH_DICT[k] for k in self.K_PATHS] + new_paths, self.K_PATHS + new_ids)
+        return new_ids
+
+    def shortest_path_per_mode_combination(self):
+        # the shortest path (in distance) for every OD pair and sequence of modes, among the current paths
+        shortest = {}
+        for k in self.K_PATHS:
+            path = self.K_PATH_DICT[k]
+            modes = tuple(path[n][2] for n in range(len(path)) if n == 0 or path[n][2] != path[n-1][2])
+            key = (path[0][0], path[-1][1], modes)
+            length = sum(self.AVG_DISTANCE[a] for a in path)
+            if key not in shortest or length < shortest[key][0]:
+                shortest[key] = (length, path)
+        return [path for (length, path) in shortest.values()]
+
+    @timeit
+    def prune_dominated_paths(self, tolerance=0):
+        # Remove the paths that are dominated by another path for the same OD pair and sequence of modes: a path k is
+        # removed if a path kk is not longer and not more expensive for any fuel combination, product, year and scenario,
+        # i.e. cost[kk] <= cost[k] + tolerance*|cost[k]|. A tolerance > 0 removes more paths, at the cost of optimality.
+        # Only paths with the same modes are compared, such that the mode and fuel shares can be met in the same way.
+        if isinstance(self.C_TRANSP_COST, FactoredParameter):
+            #scenarios with the same cost path for every fuel have the same costs, so only one of them is evaluated
+            (A, F, P, T), S = self.C_TRANSP_COST_BASE.array.shape, np.unique(self.C_TRANSP_COST.fuel_paths, axis=1, return_index=True)[1]
+            transport_costs = self.C_TRANSP_COST.values(*np.ix_(range(A), range(F), range(P), range(T), np.sort(S)))
+        else:
+            transport_costs = self.C_TRANSP_COST.array
+        arc_costs = transport_costs + self.C_CO2.array[..., None] + self.C_TIME_VALUE.array[:, None, :, None, None]
+        fuel_nr = {f: nr for nr, f in enumerate(self.F_FUEL)}
+        groups = {}
+        for k in self.K_PATHS:
+            path = self.K_PATH_DICT[k]
+            legs = tuple(path[n][2] for n in range(len(path)) if n == 0 or path[n][2] != path[n-1][2])
+            groups.setdefault((path[0][0], path[-1][1], legs), []).append(k)
+
+        dominated = set()
+        for (o, d, legs), paths in groups.items():
+            if len(paths) == 1:
+                continue
+            modes = list(dict.fromkeys(legs))
+            fuels = np.array([[fuel_nr[f] for f in combination[:len(modes)]] for combination in self.FM_MULTI_K[paths[0]]])
+            transfer = np.array([[self.C_TRANSFER[(k,p)] + self.C_TRANSFER_TIME[(k,p)] for p in self.P_PRODUCTS] for k in paths])
+            costs = []
+            for k in paths:
+                path = self.K_PATH_DICT[k]
+                arcs = np.array([self.ARC_NR[a] for a in path])
+                arc_modes = np.array([modes.index(a[2]) for a in path])
+                costs.append(arc_costs[arcs[None, :], fuels[:, arc_modes]].sum(axis=1))
+            costs = np.array(costs) + transfer[:, None, :, None, None]   #(path, fuel combination, product, year, scenario)
+            distance = [sum(self.AVG_DISTANCE[a] for a in self.K_PATH_DICT[k]) for k in paths]
+            #a path can only be dominated by a path that comes earlier in this order, and only by a path that is kept
+            order = sorted(range(len(paths)), key=lambda n: (distance[n], np.nanmean(costs[n]), paths[n]))
+            kept = []
+            for n in order:
+                if any(distance[nn] <= distance[n] and np.all(costs[nn] <= costs[n] + tolerance*np.abs(costs[n])) for nn in kept):
+                    dominated.add(paths[n])
+                else:
+                    kept.append(n)
+
+        num_paths = len(self.K_PATHS)
+        num_arcs = sum(len(self.K_PATH_DICT[k]) for k in self.K_PATHS)
+        num_pts = len(self.P_PRODUCTS)*len(self.T_TIME_PERIODS)*len(self.S_SCENARIOS)
+        kept_paths = [k for k in self.K_PATHS if k not in dominated]
+        self.set_paths([self.K_PATH_DICT[k] for k in kept_paths], kept_paths)
+        print(f"Path pruning: removed {len(dominated)} of {num_paths} paths (tolerance {tolerance}). "
+              f"h_path variables: {num_paths*num_pts} -> {len(self.K_PATHS)*num_pts}, "
+              f"h_path terms in PathArcRel: {num_arcs*num_pts} -> {sum(len(self.K_PATH_DICT[k]) for k in self.K_PATHS)*num_pts}")
+
+    def _set_paths(self, paths, ids=None):
+        if ids is None:
+            ids = range(len(paths))
+        self.K_PATHS = []
+        self.K_PATH_DICT = {}
+        for i in range(len(paths)):
+            elem = tuple(paths[i]) 
+            self.K_PATHS.append(ids[i])
+            self.K_PATH_DICT[ids[i]]=elem        
+
+        #all path index sets are built in a single pass over the paths, using hash indexes on the (first/last/transfer) nodes
+        self.OD_PATHS = {od: [] for od in self.OD_PAIRS_ALL}
+        self.MULTI_MODE_PATHS = []      #multi-mode paths and unimodal paths
+        self.UNI_MODAL_PATHS = []
+        self.UNI_MODAL_PATHS_PER_MODE = {m:[] for m in self.M_MODES}
+        self.PATHS_NO_UNIMODAL_ROAD = []
+        #Paths with transfer in node i to/from mode m
+        #self.TRANSFER_PATHS = {(i,m) : [] for m in self.M_MODES_CAP for i in self.N_NODES_CAP_NORWAY[m]}
+        self.TRANSFER_PATHS = {(i,m) : [] for (i,m) in self.NM_CAP}  #When transfering, you will have to use a mode with a capacitated terminal (rail or sea)
+        #Origin and destination paths  (this is used to calculate the capacity usage in terminals)
+        self.ORIGIN_PATHS = {(i,m): [] for (i,m) in self.NM_CAP}
+        self.DESTINATION_PATHS = {(i,m): [] for (i,m) in self.NM_CAP}
+        self.KA_PATHS = {a:[] for a in self.A_ARCS}
+        self.KA_PATHS_UNIMODAL = {a:[] for a in self.A_ARCS}
+        
+        for kk in self.K_PATHS:
+            k = self.K_PATH_DICT[kk]
+            od = (k[0][0], k[-1][1])
+            if od in self.OD_PATHS:
+                self.OD_PATHS[od].append(kk)
+            
+            transfers = [(k[j][1], k[j][2], k[j+1][2]) for j in range(len(k)-1) if k[j][2] != k[j+1][2]]
+            if len(transfers) > 0:
+                self.MULTI_MODE_PATHS.append(kk)
+                for (i, m_from, m_to) in transfers:
+                    for m in (m_from, m_to):
+                        if (i,m) in self.TRANSFER_PATHS:
+                            self.TRANSFER_PATHS[(i,m)].append(kk)
+            else:
+                self.UNI_MODAL_PATHS.append(kk)
+                self.UNI_MODAL_PATHS_PER_MODE[k[0][2]].append(kk)
+            if len(transfers) > 0 or k[0][2] != "Road":
+                self.PATHS_NO_UNIMODAL_ROAD.append(kk)
+            
+            if (k[0][0], k[0][2]) in self.ORIGIN_PATHS:
+                self.ORIGIN_PATHS[(k[0][0], k[0][2])].append(kk)
+            if (k[-1][1], k[-1][2]) in self.DESTINATION_PATHS:
+                self.DESTINATION_PATHS[(k[-1][1], k[-1][2])].append(kk)
+            
+            for a in k:
+                self.KA_PATHS[a].append(kk)
+                if len(transfers) == 0:
+                    self.KA_PATHS_UNIMODAL[a].append(kk)
+        
+        #arc-path incidence matrices (rows: arcs in the order of A_ARCS, columns: paths in the order of K_PATHS)
+        self.ARC_NR = {a: nr for nr, a in enumerate(self.A_ARCS)}
+        self.KA_INCIDENCE = self.incidence_matrix(self.KA_PATHS)
+        self.KA_INCIDENCE_UNIMODAL = self.incidence_matrix(self.KA_PATHS_UNIMODAL)
+        
         self.FM_MULTI_K = {}
         for k in self.K_PATHS:
             result = [i[2] for i in self.K_PATH_DICT[k]]
@@ -1393,8 +1705,37 @@ class TransportSets():
             modes = tuple(modes)
             if len(modes) == 1:
                 modes = modes + modes
+            if modes not in self.FM_MULTI:  #three different modes
+                self.FM_MULTI[modes] = list(itertools.product(*(self.FM_FUEL[m] for m in modes)))
             self.FM_MULTI_K[k] = self.FM_MULTI[modes]
 
+    def incidence_matrix(self, arc_paths):
+        # sparse (CSR) version of an {arc: [paths]} dict
+        path_nr = {k: nr for nr, k in enumerate(self.K_PATHS)}
+        rows = np.repeat(np.arange(len(self.A_ARCS)), [len(arc_paths[a]) for a in self.A_ARCS])
+        cols = np.fromiter((path_nr[k] for k in itertools.chain.from_iterable(arc_paths[a] for a in self.A_ARCS)), dtype=np.int64, count=len(rows))
+        return sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(len(self.A_ARCS), len(self.K_PATHS)))
+
+    def transfer_costs(self, p):
+        # transfer costs and transfer time costs (cost, time_cost) per tonne of product p for
+        # - the first mile with Road to mode m:    first_mile[m]
+        # - the last mile with Road from mode m:   last_mile[m]
+        # - a transfer from mode m1 to mode m2:    transfer[(m1,m2)]
+        first_mile = {m: (0,0) for m in self.M_MODES}
+        last_mile = {m: (0,0) for m in self.M_MODES}
+        transfer = {}
+        for m in self.M_MODES:
+            if m in ["Rail", "Sea"]: #first/last mile with Road and hence a transfer cost
+                first_mile[m] = (0 + self.TRANSFER_COST_PER_MODE_PAIR["Road", m, self.P_TO_PC[p]], 
+                                 0 + self.TOTAL_TRANSFER_TIME["Road", m, self.P_TO_PC[p]]*self.TIME_VALUE_PER_TH[p])
+                last_mile[m] = (self.TRANSFER_COST_PER_MODE_PAIR[m, "Road", self.P_TO_PC[p]], 
+                                self.TOTAL_TRANSFER_TIME["Road", m, self.P_TO_PC[p]]*self.TIME_VALUE_PER_TH[p])
+            for m2 in self.M_MODES:
+                if m != m2:
+                    transfer[(m,m2)] = (self.TRANSFER_COST_PER_MODE_PAIR[m, m2, self.P_TO_PC[p]], 
+                                        self.TOTAL_TRANSFER_TIME[m, m2, self.P_TO_PC[p]]*self.TIME_VALUE_PER_TH[p])
+        return first_mile, last_mile, transfer
+
     @timeit
     def construct_param2(self):
         #----------------------------------------
@@ -1416,29 +1757,37 @@ class TransportSets():
 
         self.C_TRANSFER = {(k,p):0 for k in self.K_PATHS for p in self.P_PRODUCTS}   #UNIT: NOK/T     MANY ELEMENTS WILL BE ZERO!! (NO TRANSFERS)
         self.C_TRANSFER_TIME = {(k,p):0 for k in self.K_PATHS for p in self.P_PRODUCTS}
-        for kk in self.PATHS_NO_UNIMODAL_ROAD:
-            k = self.K_PATH_DICT[kk]
-            for p in self.P_PRODUCTS:
-                cost = 0
-                time_cost = 0
+        for p in self.P_PRODUCTS:
+            first_mile, last_mile, transfer = self.transfer_costs(p)
+            for kk in self.PATHS_NO_UNIMODAL_ROAD:
+                k = self.K_PATH_DICT[kk]
                 num_arcs = len(k)
                 initial_mode = k[0][2]
                 final_mode = k[num_arcs-1][2]
-                if initial_mode in ["Rail", "Sea"]: #first mile with Road and hence a transfer cost
-                    cost += self.TRANSFER_COST_PER_MODE_PAIR["Road", initial_mode, self.P_TO_PC[p]]
-                    time_cost += self.TOTAL_TRANSFER_TIME["Road", initial_mode, self.P_TO_PC[p]]*self.TIME_VALUE_PER_TH[p]
-                if final_mode in ["Rail", "Sea"]: #last mile with Road and hence a transfer cost 
-                    cost += self.TRANSFER_COST_PER_MODE_PAIR[final_mode,"Road", self.P_TO_PC[p]]
-                    time_cost += self.TOTAL_TRANSFER_TIME["Road", final_mode, self.P_TO_PC[p]]*self.TIME_VALUE_PER_TH[p]
+                cost, time_cost = first_mile[initial_mode]
+                cost += last_mile[final_mode][0]
+                time_cost += last_mile[final_mode][1]
                 if num_arcs>1: #Calculate the transfer costs DURING the path (not first-/last-mile)
                     for n in range(num_arcs-1):
                         mode_from = k[n][2]
                         mode_to = k[n+1][2]
                         if mode_from != mode_to: 
-                            cost += self.TRANSFER_COST_PER_MODE_PAIR[mode_from, mode_to, self.P_TO_PC[p]]
-                            time_cost += self.TOTAL_TRANSFER_TIME[mode_from, mode_to, self.P_TO_PC[p]]*self.TIME_VALUE_PER_TH[p]
+                            cost += transfer[(mode_from, mode_to)][0]
+                            time_cost += transfer[(mode_from, mode_to)][1]
                 self.C_TRANSFER[(kk,p)] = round(cost,self.precision_digits)
                 self.C_TRANSFER_TIME[(kk,p)] = round(time_cost,self.precision_digits)
+
+        #the same transfer costs (cost + time cost) per mode change, for the node-arc formulation (see TranspModel.construct_node_arc_flow)
+        self.C_FIRST_MILE = {}      #(m,p): from the origin to mode m
+        self.C_LAST_MILE = {}       #(m,p): from mode m to the destination
+        self.C_MODE_CHANGE = {}     #(m1,m2,p): transfer from mode m1 to mode m2
+        for p in self.P_PRODUCTS:
+            first_mile, last_mile, transfer = self.transfer_costs(p)
+            for m in self.M_MODES:
+                self.C_FIRST_MILE[(m,p)] = sum(round(cost,self.precision_digits) for cost in first_mile[m])
+                self.C_LAST_MILE[(m,p)] = sum(round(cost,self.precision_digits) for cost in last_mile[m])
+            for (m1,m2), costs in transfer.items():
+                self.C_MODE_CHANGE[(m1,m2,p)] = sum(round(cost,self.precision_digits) for cost in costs)
         
         #EMISSIONS
         #if EMISSION_CONSTRAINT:
@@ -1447,54 +1796,98 @@ class TransportSets():
     
     @timeit
     def combined_sets(self, TIMES_data=None):
-
-        if True:  #Q: is this still necessary? Or can we remove this
-        
-            #####################
-            ## VEHICLE TYPES ####
-            #####################
-            
-            #Vehicle types
-            prod_to_vehicle_type = pd.read_excel(r'Data/transport_costs_emissions_raw.xlsx', sheet_name='prod_to_vehicle')
-            self.VEHICLE_TYPE_MP = {}
-            self.VEHICLE_TYPES_M = {m:[] for m in self.M_MODES}
-            prod_veh_data = zip(prod_to_vehicle_type['Mode'], prod_to_vehicle_type['Product class'], prod_to_vehicle_type['Vehicle type'])
-            for (m,pc,v) in prod_veh_data:
-                for p in self.PC_TO_P[pc]:
-                    if p in self.P_PRODUCTS:
-                        self.VEHICLE_TYPE_MP[(m,p)] = v
-                        self.VEHICLE_TYPES_M[m].append(v)
-            for m in self.M_MODES:
-                self.VEHICLE_TYPES_M[m] = list(set(self.VEHICLE_TYPES_M[m]))
-            self.V_VEHICLE_TYPES = list(set(self.VEHICLE_TYPE_MP.values()))
-            
-            self.PV_PRODUCTS = {v:[] for v in self.V_VEHICLE_TYPES}
-            for (m,p),v in self.VEHICLE_TYPE_MP.items():
-                self.PV_PRODUCTS[v].append(p)
-
-
-        self.SS_SCENARIOS_NONANT = []
+        # The combined (index) sets below are built lazily on first access and memoized per set_key(), 
+        # i.e. per (T_TIME_PERIODS, S_SCENARIOS, single_time_period). Changing one of these attributes 
+        # (by assignment) activates the sets of the new key; switching back reuses the earlier sets.
+        # If other data that the sets depend on changes, call invalidate_sets().
+        self.times_sets = TIMES_data is not None   # the KFPT/KFVT sets are only needed when linking with TIMES
+
+    def view(self, time_periods=None, scenarios=None, single_time_period=None):
+        # read-only view on this data with other time periods and/or scenarios (see TransportSetsView)
+        return TransportSetsView(self.__dict__.get("_parent", self),
+                                 time_periods if time_periods is not None else self.T_TIME_PERIODS,
+                                 scenarios if scenarios is not None else self.S_SCENARIOS,
+                                 single_time_period,
+                                 self.times_sets)
+
+    def set_key(self):
+        return (tuple(self.T_TIME_PERIODS), tuple(self.S_SCENARIOS), self.single_time_period, self.times_sets)
+
+    def invalidate_sets(self):
+        self.__dict__.pop("_set_cache", None)
+        for name in INDEX_SETS:
+            self.__dict__.pop(name, None)
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in SET_KEY_ATTRIBUTES:  # deactivate the sets of the previous key (they stay in the cache)
+            for set_name in INDEX_SETS:
+                self.__dict__.pop(set_name, None)
+
+    def __getstate__(self):
+        # the index sets are not copied/pickled, they are rebuilt when needed
+        return {k:v for k,v in self.__dict__.items() if k != "_set_cache" and k not in INDEX_SETS}
+
+    #####################
+    ## VEHICLE TYPES ####
+    #####################
+    
+    @index_set(key_dependent=False)
+    def VEHICLE_TYPE_MP(self):
+        prod_to_vehicle_type = self.prod_to_vehicle_type   #read in construct_pyomo_data
+        VEHICLE_TYPE_MP = {}
+        prod_veh_data = zip(prod_to_vehicle_type['Mode'], prod_to_vehicle_type['Product class'], prod_to_vehicle_type['Vehicle type'])
+        for (m,pc,v) in prod_veh_data:
+            for p in self.PC_TO_P[pc]:
+                if p in self.P_PRODUCTS:
+                    VEHICLE_TYPE_MP[(m,p)] = v
+        return VEHICLE_TYPE_MP
+
+    @index_set(key_dependent=False)
+    def VEHICLE_TYPES_M(self):
+        VEHICLE_TYPES_M = {m:[] for m in self.M_MODES}
+        for (m,p),v in self.VEHICLE_TYPE_MP.items():
+            VEHICLE_TYPES_M[m].append(v)
+        return {m:list(set(VEHICLE_TYPES_M[m])) for m in self.M_MODES}
+
+    @index_set(key_dependent=False)
+    def V_VEHICLE_TYPES(self):
+        return list(set(self.VEHICLE_TYPE_MP.values()))
+
+    @index_set(key_dependent=False)
+    def PV_PRODUCTS(self):
+        PV_PRODUCTS = {v:[] for v in self.V_VEHICLE_TYPES}
+        for (m,p),v in self.VEHICLE_TYPE_MP.items():
+            PV_PRODUCTS[v].append(p)
+        return PV_PRODUCTS
+
+    #####################
+    ## TIME PERIODS  ####
+    #####################
+
+    @index_set()
+    def SS_SCENARIOS_NONANT(self):
+        SS_SCENARIOS_NONANT = []
         for s in self.S_SCENARIOS:
             for ss in self.S_SCENARIOS:
-                if (s != ss) and ((ss,s) not in self.SS_SCENARIOS_NONANT):
-                    self.SS_SCENARIOS_NONANT.append((s,ss))
+                if (s != ss) and ((ss,s) not in SS_SCENARIOS_NONANT):
+                    SS_SCENARIOS_NONANT.append((s,ss))
+        return SS_SCENARIOS_NONANT
 
-        self.T_TIME_FIRST_STAGE = [t for t in self.T_TIME_FIRST_STAGE_BASE if t in self.T_TIME_PERIODS]  
-        self.T_TIME_SECOND_STAGE = [t for t in self.T_TIME_SECOND_STAGE_BASE if t in self.T_TIME_PERIODS]  
+    T_TIME_FIRST_STAGE = index_set()(lambda self: [t for t in self.T_TIME_FIRST_STAGE_BASE if t in self.T_TIME_PERIODS])
+    T_TIME_SECOND_STAGE = index_set()(lambda self: [t for t in self.T_TIME_SECOND_STAGE_BASE if t in self.T_TIME_PERIODS])
 
-        start = self.T_TIME_PERIODS[0]
-        #if len(self.T_TIME_PERIODS) == len(self.T_TIME_PERIODS_ALL):
-        end = self.T_TIME_PERIODS[len(self.T_TIME_PERIODS)-1] + 1   #we only need to model the development until the end
-        #else:
-        #    end = 
-        self.T_YEARLY_TIME_PERIODS = [*range(start,end)] #all years from 2022 up to 2050
-        self.T_YEARLY_TIME_PERIODS_ALL = [*range(start,self.T_TIME_PERIODS_ALL[len(self.T_TIME_PERIODS_ALL)-1] + 1)] #all years from 2022 up to 2050
-        
-        self.T_YEARLY_TIME_FIRST_STAGE = [ty for ty in self.T_YEARLY_TIME_PERIODS if ty < self.T_TIME_SECOND_STAGE_BASE[0] ]
-        #self.T_YEARLY_TIME_FIRST_STAGE_NO_TODAY = [*range(self.T_TIME_PERIODS[0] + 1, 2030)] #first-stage years without the first period
-        self.T_YEARLY_TIME_SECOND_STAGE = [ty for ty in self.T_YEARLY_TIME_PERIODS if ty >= self.T_TIME_SECOND_STAGE_BASE[0] ]
-        
-        self.Y_YEARS = {t:[] for t in self.T_TIME_PERIODS_ALL}
+    #we only need to model the development until the end
+    T_YEARLY_TIME_PERIODS = index_set()(lambda self: [*range(self.T_TIME_PERIODS[0],self.T_TIME_PERIODS[-1] + 1)]) #all years from 2022 up to 2050
+    T_YEARLY_TIME_PERIODS_ALL = index_set()(lambda self: [*range(self.T_TIME_PERIODS[0],self.T_TIME_PERIODS_ALL[-1] + 1)]) #all years from 2022 up to 2050
+    
+    T_YEARLY_TIME_FIRST_STAGE = index_set()(lambda self: [ty for ty in self.T_YEARLY_TIME_PERIODS if ty < self.T_TIME_SECOND_STAGE_BASE[0] ])
+    #self.T_YEARLY_TIME_FIRST_STAGE_NO_TODAY = [*range(self.T_TIME_PERIODS[0] + 1, 2030)] #first-stage years without the first period
+    T_YEARLY_TIME_SECOND_STAGE = index_set()(lambda self: [ty for ty in self.T_YEARLY_TIME_PERIODS if ty >= self.T_TIME_SECOND_STAGE_BASE[0] ])
+
+    @index_set()
+    def Y_YEARS(self):
+        Y_YEARS = {t:[] for t in self.T_TIME_PERIODS_ALL}
         t0 = self.T_TIME_PERIODS[0]
         num_periods = len(self.T_TIME_PERIODS_ALL)
         
@@ -1502,152 +1895,172 @@ class TransportSets():
             t = self.T_TIME_PERIODS_ALL[i]
             if i < num_periods-1:
                 tp1 = self.T_TIME_PERIODS_ALL[i+1]
-                self.Y_YEARS[t] = list(range(t-t0,tp1-t0))
+                Y_YEARS[t] = list(range(t-t0,tp1-t0))
             elif i == (num_periods - 1):  #this is the last time period. Lasts only a year?? 
-                duration_previous = len(self.Y_YEARS[self.T_TIME_PERIODS_ALL[i-1]])
-                self.Y_YEARS[t] = [self.T_TIME_PERIODS_ALL[i]-t0 + j for j in range(duration_previous)]
+                duration_previous = len(Y_YEARS[self.T_TIME_PERIODS_ALL[i-1]])
+                Y_YEARS[t] = [self.T_TIME_PERIODS_ALL[i]-t0 + j for j in range(duration_previous)]
+        return Y_YEARS
 
-        self.T_MOST_RECENT_DECISION_PERIOD = {}
+    @index_set()
+    def T_MOST_RECENT_DECISION_PERIOD(self):
+        T_MOST_RECENT_DECISION_PERIOD = {}
         for ty in self.T_YEARLY_TIME_PERIODS: #loop over all (yearly) years
             cur_most_recent_dec_period = self.T_TIME_PERIODS[0] #initialize at 2022
             for t in self.T_TIME_PERIODS: # loop over all decision periods
                 if t <= ty:
                     cur_most_recent_dec_period = t 
-            self.T_MOST_RECENT_DECISION_PERIOD[ty] = cur_most_recent_dec_period
+            T_MOST_RECENT_DECISION_PERIOD[ty] = cur_most_recent_dec_period
+        return T_MOST_RECENT_DECISION_PERIOD
 
-
-        self.T_TIME_PERIODS_OPERATIONAL = self.T_TIME_PERIODS
+    @index_set()
+    def T_TIME_PERIODS_OPERATIONAL(self):
         if self.single_time_period is not None:
-            self.T_TIME_PERIODS_OPERATIONAL = [self.single_time_period]
+            return [self.single_time_period]
+        return self.T_TIME_PERIODS
 
-        #
-        #       WITHOUT SCENARIOS
-        #
-        
-        #------------------------
-        "Combined sets - time independent"
-        #------------------------
+    #
+    #       WITHOUT SCENARIOS
+    #
+    
+    #------------------------
+    "Combined sets - time independent"
+    #------------------------
 
-        self.MF = [(m,f) for m in self.M_MODES for f in self.FM_FUEL[m]]
-
-        "Combined sets - time dependent"
-
-        self.TS = [(t,) for t in self.T_TIME_PERIODS]
-        self.TS_CONSTR = [(t,) for t in self.T_TIME_PERIODS_OPERATIONAL]
-        self.TS_NO_BASE_YEAR = [(t,) for t in self.T_TIME_PERIODS if t is not self.T_TIME_PERIODS[0]]
-        self.TS_NO_BASE_YEAR_CONSTR = [(t,) for t in self.T_TIME_PERIODS_OPERATIONAL if t is not self.T_TIME_PERIODS[0]]
-
-
-        self.APT = [(i,j,m,r) + (p,) + (t,) for (i,j,m,r) in self.A_ARCS for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS] 
-        self.AVT = [(i,j,m,r) + (v,) + (t,) for (i,j,m,r) in self.A_ARCS for v in self.VEHICLE_TYPES_M[m] for t in self.T_TIME_PERIODS] 
-        self.APT_CONSTR = [(i,j,m,r) + (p,) + (t,) for (i,j,m,r) in self.A_ARCS for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS_OPERATIONAL] 
-        self.AVT_CONSTR = [(i,j,m,r) + (v,) + (t,) for (i,j,m,r) in self.A_ARCS for v in self.VEHICLE_TYPES_M[m] for t in self.T_TIME_PERIODS_OPERATIONAL] 
-        
-        
-        self.AFPT = [(i,j,m,r) + (f,) + (p,) + (t,)  for (i,j,m,r) in self.A_ARCS for f in self.FM_FUEL[m] for p in self.P_PRODUCTS for t in
-                         self.T_TIME_PERIODS ]
-        self.AFVT = [(i,j,m,r) + (f,) + (v,) + (t,) for (i,j,m,r) in self.A_ARCS for f in self.FM_FUEL[m] for v in self.VEHICLE_TYPES_M[m] for t in
-                         self.T_TIME_PERIODS ]  
-        self.KPT = [(k, p, t) for k in self.K_PATHS for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS]        
-        self.KVT = [(k, v, t) for k in self.K_PATHS for v in self.V_VEHICLE_TYPES for t in self.T_TIME_PERIODS]
-        self.K_uni_VT = [(k, v, t) for k in self.UNI_MODAL_PATHS for v in self.V_VEHICLE_TYPES for t in self.T_TIME_PERIODS]
-
-        self.ET_INV = [l+(t,) for l in self.E_EDGES_INV for t in self.T_TIME_PERIODS                                   if (t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_EDGE_INV[l]) and (t in self.T_TIME_FIRST_STAGE)]
-        self.EAT_INV = [e+(a,)+(t,) for e in self.E_EDGES_INV for a in self.AE_ARCS[e] for t in self.T_TIME_PERIODS   if (t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_EDGE_INV[e]) and (t in self.T_TIME_FIRST_STAGE)]
-        self.EAT_INV_CONSTR = [e+(a,)+(t,) for e in self.E_EDGES_INV for a in self.AE_ARCS[e] for t in self.T_TIME_PERIODS_OPERATIONAL]        
-        self.EFT_CHARGE = [(e,f,t) for (e,f) in self.EF_CHARGING for t in self.T_TIME_PERIODS ] # if t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_CHARGING[(e,f)]]
-        self.EFT_CHARGE_CONSTR = [(e,f,t) for (e,f) in self.EF_CHARGING for t in self.T_TIME_PERIODS_OPERATIONAL]
-        self.NM_CAP_INCR_T = [(i,m,t) for (i,m) in self.NM_CAP_INCR for t in self.T_TIME_PERIODS if t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_NODE_INV[i,m]]
-        self.NM_CAP_T = [(i,m,t) for (i,m) in self.NM_CAP for t in self.T_TIME_PERIODS if t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_NODE_INV[i,m]]
-        self.NM_CAP_T_CONSTR = [(i,m,t) for (i,m) in self.NM_CAP for t in self.T_TIME_PERIODS_OPERATIONAL ]
-        self.NMFVT = [(i,m,f,v,t) for m in self.M_MODES for f in self.FM_FUEL[m] for i in self.NM_NODES[m]
-                                    for v in self.VEHICLE_TYPES_M[m] for t in self.T_TIME_PERIODS]
-        self.NMFVT_CONSTR = [(i,m,f,v,t) for m in self.M_MODES for f in self.FM_FUEL[m] for i in self.NM_NODES[m]
-                                    for v in self.VEHICLE_TYPES_M[m] for t in self.T_TIME_PERIODS_OPERATIONAL]
-        self.ODPTS = [odp + (t,) for odp in self.ODP for t in self.T_TIME_PERIODS]
-        self.ODPTS_CONSTR = [odp + (t,) for odp in self.ODP for t in self.T_TIME_PERIODS_OPERATIONAL]
-        self.EPT = [l + (p,) + (t,) for l in self.E_EDGES for p in self.P_PRODUCTS for t in
-                         self.T_TIME_PERIODS]
-        self.MFT_MATURITY = [mf + (t,) for mf in self.NEW_MF_LIST for t in self.T_TIME_PERIODS]
-        self.MFT_MATURITY_CONSTR = [mf + (t,) for mf in self.NEW_MF_LIST for t in self.T_TIME_PERIODS_OPERATIONAL]
-        self.MFT = [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_TIME_PERIODS]
-        self.MFT_CONSTR = [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_TIME_PERIODS_OPERATIONAL]
-        
-        self.MFTT = [(m,f,t,tau) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_TIME_PERIODS 
-                            for tau in self.T_TIME_PERIODS if tau <= t]
-        self.MFT_MIN0 = [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] 
-                                    for t in self.T_TIME_PERIODS if t!=self.T_TIME_PERIODS[0]]
-        self.MT_MIN0 = [(m,t) for m in self.M_MODES for t in self.T_TIME_PERIODS if t!=self.T_TIME_PERIODS[0]]
-
-        self.MT = [(m,t) for m in self.M_MODES for t in self.T_TIME_PERIODS]
-
-        self.MFT_NEW = [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_TIME_PERIODS if not self.tech_is_mature[(m,f)]]
-        self.MFT_NEW_YEARLY = [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_YEARLY_TIME_PERIODS if not self.tech_is_mature[(m,f)]] #only new technologies (not mature yet)
-        self.MFT_NEW_YEARLY_FIRST_STAGE_MIN0 = [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_YEARLY_TIME_FIRST_STAGE if (not self.tech_is_mature[(m,f)] and t!=self.T_YEARLY_TIME_FIRST_STAGE[0])]
-        self.MFT_NEW_YEARLY_SECOND_STAGE = [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_YEARLY_TIME_SECOND_STAGE if not self.tech_is_mature[(m,f)]]
-        self.MFT_NEW_FIRST_PERIOD = [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in [self.T_TIME_PERIODS[0]] if not self.tech_is_mature[(m,f)]]
-
-        self.UT_UPG = [(e,f,t) for (e,f) in self.U_UPGRADE for t in self.T_TIME_PERIODS if (t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_EDGE_UPG[(e,f)]) and (t in self.T_TIME_FIRST_STAGE) ]       
-        self.UT_UPG_CONSTR = [(e,f,t) for (e,f) in self.U_UPGRADE for t in self.T_TIME_PERIODS_OPERATIONAL]  
-
-        #
-        #       WITH SCENARIOS
-        #
-
-        def combinations(list_of_tuples, list):
-            list_of_tuples2 = []
-            for tpl in list_of_tuples:
-                for l in list:
-                    tpl2 = tpl + (l,)
-                    list_of_tuples2.append(tpl2) 
-            return list_of_tuples2
-
-        self.AFPT_S =          combinations(self.AFPT,self.S_SCENARIOS)
-        self.APT_CONSTR_S =    combinations(self.APT_CONSTR,self.S_SCENARIOS)
-        self.AFVT_S =          combinations(self.AFVT,self.S_SCENARIOS)
-        self.AVT_CONSTR_S =    combinations(self.AVT_CONSTR,self.S_SCENARIOS)
-        self.EAT_INV_CONSTR_S = combinations(self.EAT_INV_CONSTR,self.S_SCENARIOS)
-        self.E_EDGES_INV_S = combinations(self.E_EDGES_INV,self.S_SCENARIOS)
-        self.EFT_CHARGE_S = combinations(self.EFT_CHARGE,self.S_SCENARIOS)
-        self.EFT_CHARGE_CONSTR_S = combinations(self.EFT_CHARGE_CONSTR,self.S_SCENARIOS)
-        self.ET_INV_S = combinations(self.ET_INV,self.S_SCENARIOS)
-        self.KPT_S = combinations(self.KPT,self.S_SCENARIOS)
-        self.KVT_S = combinations(self.KVT,self.S_SCENARIOS)
-        self.K_uni_VT_S = combinations(self.K_uni_VT,self.S_SCENARIOS)
-        self.NM_CAP_S = combinations(self.NM_CAP,self.S_SCENARIOS)
-        self.NM_CAP_T_CONSTR_S = combinations(self.NM_CAP_T_CONSTR,self.S_SCENARIOS)
-        self.NM_CAP_T_S = combinations(self.NM_CAP_T,self.S_SCENARIOS)
-        self.NM_CAP_INCR_T_S = combinations(self.NM_CAP_INCR_T,self.S_SCENARIOS)
-        self.NM_CAP_INCR_S = combinations(self.NM_CAP_INCR,self.S_SCENARIOS)  
-        self.MFT_S = combinations(self.MFT,self.S_SCENARIOS)
-        self.MFT_MATURITY_CONSTR_S = combinations(self.MFT_MATURITY_CONSTR,self.S_SCENARIOS)
-        self.MFT_NEW_YEARLY_S = combinations(self.MFT_NEW_YEARLY,self.S_SCENARIOS)
-        self.MFT_NEW_S = combinations(self.MFT_NEW,self.S_SCENARIOS)
-        self.MFT_MIN0_S = combinations(self.MFT_MIN0,self.S_SCENARIOS)
-        self.MT_MIN0_S = combinations(self.MT_MIN0,self.S_SCENARIOS)
-        self.MFT_INIT_TRANSP_SHARE_S = combinations(self.MFT_INIT_TRANSP_SHARE,self.S_SCENARIOS)
-        self.MFT_NEW_FIRST_PERIOD_S = combinations(self.MFT_NEW_FIRST_PERIOD,self.S_SCENARIOS)
-        self.MFT_NEW_YEARLY_FIRST_STAGE_MIN0_S = combinations(self.MFT_NEW_YEARLY_FIRST_STAGE_MIN0,self.S_SCENARIOS)
-        self.MFT_NEW_YEARLY_SECOND_STAGE_S = combinations(self.MFT_NEW_YEARLY_SECOND_STAGE,self.S_SCENARIOS)
-        self.MF_S = combinations(self.MF,self.S_SCENARIOS)
-        self.MT_S = combinations(self.MT,self.S_SCENARIOS)
-        self.MFT_CONSTR_S = combinations(self.MFT_CONSTR,self.S_SCENARIOS)
-        self.M_MODES_S = combinations([(m,) for m in self.M_MODES],self.S_SCENARIOS)
-        self.NMFVT_CONSTR_S = combinations(self.NMFVT_CONSTR,self.S_SCENARIOS)
-        self.ODPTS_CONSTR_S = combinations(self.ODPTS_CONSTR,self.S_SCENARIOS)
-        self.TS_S = combinations(self.TS,self.S_SCENARIOS)
-        self.TS_NO_BASE_YEAR_S = combinations(self.TS_NO_BASE_YEAR,self.S_SCENARIOS)
-        self.TS_CONSTR_S = combinations(self.TS_CONSTR,self.S_SCENARIOS)
-        self.TS_NO_BASE_YEAR_CONSTR_S = combinations(self.TS_NO_BASE_YEAR_CONSTR,self.S_SCENARIOS)
-        self.T_TIME_PERIODS_S = combinations([(t,) for t in self.T_TIME_PERIODS],self.S_SCENARIOS)
-        self.UT_UPG_S = combinations(self.UT_UPG,self.S_SCENARIOS)
-        self.UT_UPG_CONSTR_S = combinations(self.UT_UPG_CONSTR,self.S_SCENARIOS)
-
-
-        #DERIVED PARAMETERS
+    MF = index_set()(lambda self: [(m,f) for m in self.M_MODES for f in self.FM_FUEL[m]])
 
+    "Combined sets - time dependent"
+
+    TS = index_set()(lambda self: [(t,) for t in self.T_TIME_PERIODS])
+    TS_CONSTR = index_set()(lambda self: [(t,) for t in self.T_TIME_PERIODS_OPERATIONAL])
+    TS_NO_BASE_YEAR = index_set()(lambda self: [(t,) for t in self.T_TIME_PERIODS if t is not self.T_TIME_PERIODS[0]])
+    TS_NO_BASE_YEAR_CONSTR = index_set()(lambda self: [(t,) for t in self.T_TIME_PERIODS_OPERATIONAL if t is not self.T_TIME_PERIODS[0]])
+
+
+    APT = index_set()(lambda self: [(i,j,m,r) + (p,) + (t,) for (i,j,m,r) in self.A_ARCS for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS])
+    AVT = index_set()(lambda self: [(i,j,m,r) + (v,) + (t,) for (i,j,m,r) in self.A_ARCS for v in self.VEHICLE_TYPES_M[m] for t in self.T_TIME_PERIODS])
+    APT_CONSTR = index_set()(lambda self: [(i,j,m,r) + (p,) + (t,) for (i,j,m,r) in self.A_ARCS for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS_OPERATIONAL])
+    AVT_CONSTR = index_set()(lambda self: [(i,j,m,r) + (v,) + (t,) for (i,j,m,r) in self.A_ARCS for v in self.VEHICLE_TYPES_M[m] for t in self.T_TIME_PERIODS_OPERATIONAL])
+    
+    
+    AFPT = index_set()(lambda self: [(i,j,m,r) + (f,) + (p,) + (t,)  for (i,j,m,r) in self.A_ARCS for f in self.FM_FUEL[m] for p in self.P_PRODUCTS for t in
+                     self.T_TIME_PERIODS ])
+    AFVT = index_set()(lambda self: [(i,j,m,r) + (f,) + (v,) + (t,) for (i,j,m,r) in self.A_ARCS for f in self.FM_FUEL[m] for v in self.VEHICLE_TYPES_M[m] for t in
+                     self.T_TIME_PERIODS ])
+    KPT = index_set()(lambda self: [(k, p, t) for k in self.K_PATHS for p in self.P_PRODUCTS for t in self.T_TIME_PERIODS])
+    KVT = index_set()(lambda self: [(k, v, t) for k in self.K_PATHS for v in self.V_VEHICLE_TYPES for t in self.T_TIME_PERIODS])
+    K_uni_VT = index_set()(lambda self: [(k, v, t) for k in self.UNI_MODAL_PATHS for v in self.V_VEHICLE_TYPES for t in self.T_TIME_PERIODS])
+
+    ET_INV = index_set()(lambda self: [l+(t,) for l in self.E_EDGES_INV for t in self.T_TIME_PERIODS                                   if (t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_EDGE_INV[l]) and (t in self.T_TIME_FIRST_STAGE)])
+    EAT_INV = index_set()(lambda self: [e+(a,)+(t,) for e in self.E_EDGES_INV for a in self.AE_ARCS[e] for t in self.T_TIME_PERIODS   if (t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_EDGE_INV[e]) and (t in self.T_TIME_FIRST_STAGE)])
+    EAT_INV_CONSTR = index_set()(lambda self: [e+(a,)+(t,) for e in self.E_EDGES_INV for a in self.AE_ARCS[e] for t in self.T_TIME_PERIODS_OPERATIONAL])
+    EFT_CHARGE = index_set()(lambda self: [(e,f,t) for (e,f) in self.EF_CHARGING for t in self.T_TIME_PERIODS ]) # if t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_CHARGING[(e,f)]]
+    EFT_CHARGE_CONSTR = index_set()(lambda self: [(e,f,t) for (e,f) in self.EF_CHARGING for t in self.T_TIME_PERIODS_OPERATIONAL])
+    NM_CAP_INCR_T = index_set()(lambda self: [(i,m,t) for (i,m) in self.NM_CAP_INCR for t in self.T_TIME_PERIODS if t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_NODE_INV[i,m]])
+    NM_CAP_T = index_set()(lambda self: [(i,m,t) for (i,m) in self.NM_CAP for t in self.T_TIME_PERIODS if t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_NODE_INV[i,m]])
+    NM_CAP_T_CONSTR = index_set()(lambda self: [(i,m,t) for (i,m) in self.NM_CAP for t in self.T_TIME_PERIODS_OPERATIONAL ])
+    NMFVT = index_set()(lambda self: [(i,m,f,v,t) for m in self.M_MODES for f in self.FM_FUEL[m] for i in self.NM_NODES[m]
+                                for v in self.VEHICLE_TYPES_M[m] for t in self.T_TIME_PERIODS])
+    NMFVT_CONSTR = index_set()(lambda self: [(i,m,f,v,t) for m in self.M_MODES for f in self.FM_FUEL[m] for i in self.NM_NODES[m]
+                                for v in self.VEHICLE_TYPES_M[m] for t in self.T_TIME_PERIODS_OPERATIONAL])
+    ODPTS = index_set()(lambda self: [odp + (t,) for odp in self.ODP for t in self.T_TIME_PERIODS])
+    ODPTS_CONSTR = index_set()(lambda self: [odp + (t,) for odp in self.ODP for t in self.T_TIME_PERIODS_OPERATIONAL])
+    EPT = index_set()(lambda self: [l + (p,) + (t,) for l in self.E_EDGES for p in self.P_PRODUCTS for t in
+                     self.T_TIME_PERIODS])
+    MFT_MATURITY = index_set()(lambda self: [mf + (t,) for mf in self.NEW_MF_LIST for t in self.T_TIME_PERIODS])
+    MFT_MATURITY_CONSTR = index_set()(lambda self: [mf + (t,) for mf in self.NEW_MF_LIST for t in self.T_TIME_PERIODS_OPERATIONAL])
+    MFT = index_set()(lambda self: [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_TIME_PERIODS])
+    MFT_CONSTR = index_set()(lambda self: [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_TIME_PERIODS_OPERATIONAL])
+    
+    MFTT = index_set()(lambda self: [(m,f,t,tau) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_TIME_PERIODS 
+                        for tau in self.T_TIME_PERIODS if tau <= t])
+    MFT_MIN0 = index_set()(lambda self: [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] 
+                                for t in self.T_TIME_PERIODS if t!=self.T_TIME_PERIODS[0]])
+    MT_MIN0 = index_set()(lambda self: [(m,t) for m in self.M_MODES for t in self.T_TIME_PERIODS if t!=self.T_TIME_PERIODS[0]])
+
+    MT = index_set()(lambda self: [(m,t) for m in self.M_MODES for t in self.T_TIME_PERIODS])
+
+    MFT_NEW = index_set()(lambda self: [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_TIME_PERIODS if not self.tech_is_mature[(m,f)]])
+    MFT_NEW_YEARLY = index_set()(lambda self: [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_YEARLY_TIME_PERIODS if not self.tech_is_mature[(m,f)]]) #only new technologies (not mature yet)
+    MFT_NEW_YEARLY_FIRST_STAGE_MIN0 = index_set()(lambda self: [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_YEARLY_TIME_FIRST_STAGE if (not self.tech_is_mature[(m,f)] and t!=self.T_YEARLY_TIME_FIRST_STAGE[0])])
+    MFT_NEW_YEARLY_SECOND_STAGE = index_set()(lambda self: [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_YEARLY_TIME_SECOND_STAGE if not self.tech_is_mature[(m,f)]])
+    MFT_NEW_FIRST_PERIOD = index_set()(lambda self: [(m,f,t) for m in self.M_MODES for f in self.FM_FUEL[m] for t in [self.T_TIME_PERIODS[0]] if not self.tech_is_mature[(m,f)]])
+
+    UT_UPG = index_set()(lambda self: [(e,f,t) for (e,f) in self.U_UPGRADE for t in self.T_TIME_PERIODS if (t <= self.T_TIME_PERIODS[-1] - self.LEAD_TIME_EDGE_UPG[(e,f)]) and (t in self.T_TIME_FIRST_STAGE) ])
+    UT_UPG_CONSTR = index_set()(lambda self: [(e,f,t) for (e,f) in self.U_UPGRADE for t in self.T_TIME_PERIODS_OPERATIONAL])
+
+    #node-arc formulation (see TranspModel.construct_node_arc_flow): one commodity per destination and product, on a network with 
+    #a node (n,m) per node n and mode m. Mode changes (n,m1,m2) are transfers, the flow enters the network in the origin and leaves in the destination
+    DP_COMMODITIES = index_set()(lambda self: list(dict.fromkeys((d,p) for (o,d,p) in self.ODP)))
+    NMM_MODE_CHANGES = index_set()(lambda self: [(n,m1,m2) for n in self.N_NODES for m1 in self.M_MODES for m2 in self.M_MODES 
+                                                 if m1 != m2 and n in self.NM_NODES[m1] and n in self.NM_NODES[m2]])
+    ADPT_CONSTR = index_set()(lambda self: [(i,j,m,r,d,p,t) for (d,p) in self.DP_COMMODITIES for (i,j,m,r) in self.A_ARCS if i != d
+                                            for t in self.T_TIME_PERIODS_OPERATIONAL])
+    NMMDPT_CONSTR = index_set()(lambda self: [(n,m1,m2,d,p,t) for (d,p) in self.DP_COMMODITIES for (n,m1,m2) in self.NMM_MODE_CHANGES if n != d
+                                              for t in self.T_TIME_PERIODS_OPERATIONAL])
+    NMDPT_FIRST_CONSTR = index_set()(lambda self: [(o,m,d,p,t) for (o,d,p) in self.ODP for m in self.M_MODES if o in self.NM_NODES[m]
+                                                   for t in self.T_TIME_PERIODS_OPERATIONAL])
+    MDPT_LAST_CONSTR = index_set()(lambda self: [(m,d,p,t) for (d,p) in self.DP_COMMODITIES for m in self.M_MODES if d in self.NM_NODES[m]
+                                                 for t in self.T_TIME_PERIODS_OPERATIONAL])
+    NMDPT_CONSTR = index_set()(lambda self: [(n,m,d,p,t) for (d,p) in self.DP_COMMODITIES for m in self.M_MODES for n in self.NM_NODES[m]
+                                             for t in self.T_TIME_PERIODS_OPERATIONAL])
+
+    #
+    #       WITH SCENARIOS
+    #
+
+    AFPT_S =          scenario_set("AFPT")
+    APT_CONSTR_S =    scenario_set("APT_CONSTR")
+    AFVT_S =          scenario_set("AFVT")
+    AVT_CONSTR_S =    scenario_set("AVT_CONSTR")
+    EAT_INV_CONSTR_S = scenario_set("EAT_INV_CONSTR")
+    E_EDGES_INV_S = scenario_set("E_EDGES_INV")
+    EFT_CHARGE_S = scenario_set("EFT_CHARGE")
+    EFT_CHARGE_CONSTR_S = scenario_set("EFT_CHARGE_CONSTR")
+    ET_INV_S = scenario_set("ET_INV")
+    KPT_S = scenario_set("KPT")
+    KVT_S = scenario_set("KVT")
+    K_uni_VT_S = scenario_set("K_uni_VT")
+    NM_CAP_S = scenario_set("NM_CAP")
+    NM_CAP_T_CONSTR_S = scenario_set("NM_CAP_T_CONSTR")
+    NM_CAP_T_S = scenario_set("NM_CAP_T")
+    NM_CAP_INCR_T_S = scenario_set("NM_CAP_INCR_T")
+    NM_CAP_INCR_S = scenario_set("NM_CAP_INCR")
+    MFT_S = scenario_set("MFT")
+    MFT_MATURITY_CONSTR_S = scenario_set("MFT_MATURITY_CONSTR")
+    MFT_NEW_YEARLY_S = scenario_set("MFT_NEW_YEARLY")
+    MFT_NEW_S = scenario_set("MFT_NEW")
+    MFT_MIN0_S = scenario_set("MFT_MIN0")
+    MT_MIN0_S = scenario_set("MT_MIN0")
+    MFT_INIT_TRANSP_SHARE_S = scenario_set("MFT_INIT_TRANSP_SHARE")
+    MFT_NEW_FIRST_PERIOD_S = scenario_set("MFT_NEW_FIRST_PERIOD")
+    MFT_NEW_YEARLY_FIRST_STAGE_MIN0_S = scenario_set("MFT_NEW_YEARLY_FIRST_STAGE_MIN0")
+    MFT_NEW_YEARLY_SECOND_STAGE_S = scenario_set("MFT_NEW_YEARLY_SECOND_STAGE")
+    MF_S = scenario_set("MF")
+    MT_S = scenario_set("MT")
+    MFT_CONSTR_S = scenario_set("MFT_CONSTR")
+    M_MODES_S = scenario_set(lambda self: [(m,) for m in self.M_MODES])
+    NMFVT_CONSTR_S = scenario_set("NMFVT_CONSTR")
+    ODPTS_CONSTR_S = scenario_set("ODPTS_CONSTR")
+    TS_S = scenario_set("TS")
+    TS_NO_BASE_YEAR_S = scenario_set("TS_NO_BASE_YEAR")
+    TS_CONSTR_S = scenario_set("TS_CONSTR")
+    TS_NO_BASE_YEAR_CONSTR_S = scenario_set("TS_NO_BASE_YEAR_CONSTR")
+    T_TIME_PERIODS_S = scenario_set(lambda self: [(t,) for t in self.T_TIME_PERIODS])
+    UT_UPG_S = scenario_set("UT_UPG")
+    UT_UPG_CONSTR_S = scenario_set("UT_UPG_CONSTR")
+    ADPT_CONSTR_S = scenario_set("ADPT_CONSTR")
+    NMMDPT_CONSTR_S = scenario_set("NMMDPT_CONSTR")
+    NMDPT_FIRST_CONSTR_S = scenario_set("NMDPT_FIRST_CONSTR")
+    MDPT_LAST_CONSTR_S = scenario_set("MDPT_LAST_CONSTR")
+    NMDPT_CONSTR_S = scenario_set("NMDPT_CONSTR")
+
+
+    #DERIVED PARAMETERS
+
+    @index_set()
+    def cheapest_product_per_vehicle(self):
         #find the "cheapest" product group per vehicle type. 
-        self.cheapest_product_per_vehicle = {(m,f,t,v):None for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_TIME_PERIODS for v in self.VEHICLE_TYPES_M[m]}
+        cheapest_product_per_vehicle = {(m,f,t,v):None for m in self.M_MODES for f in self.FM_FUEL[m] for t in self.T_TIME_PERIODS for v in self.VEHICLE_TYPES_M[m]}
         for m in self.M_MODES: 
             for f in self.FM_FUEL[m]: 
                 for t in self.T_TIME_PERIODS:
@@ -1658,10 +2071,13 @@ class TransportSets():
                             if self.C_TRANSP_COST_NORMALIZED[(m,f,p,t)] < lowest_cost:
                                 lowest_cost = self.C_TRANSP_COST_NORMALIZED[(m,f,p,t)]
                                 cheapest_product = p
-                        self.cheapest_product_per_vehicle[(m,f,t,v)] = cheapest_product
-        
-        self.KFPT = []
-        self.KFPT_S = []
+                        cheapest_product_per_vehicle[(m,f,t,v)] = cheapest_product
+        return cheapest_product_per_vehicle
+    
+    @index_set()
+    def TIMES_PATH_SETS(self):
+        KFPT = []
+        KFPT_S = []
         # for k,p,t in self.KPT:
         #     result = [i[2] for i in self.K_PATH_DICT[k]]
         #     modes = [] 
@@ -1677,36 +2093,89 @@ class TransportSets():
         # Ex: k = (("Hamar", "Trondheim", "Rail", 1), ("Trondheim", "Bodø", "Rail", 1), ("Bodø", "Narvik", "Road", 1))
         # the combination of fuels are self.FM_MULTI[("Rail", "Road")], with N elements
         # we have N new (k,fuels) combination
-        self.KFVT = []
-        self.K_uni_FVT = []
-        self.KFVT_S = []
-        self.K_uni_FVT_S = []
+        KFVT = []
+        K_uni_FVT = []
+        KFVT_S = []
+        K_uni_FVT_S = []
         
-        if TIMES_data is not None:
+        if self.times_sets:
             for t in self.T_TIME_PERIODS:
                 for k_uni in self.UNI_MODAL_PATHS:
                     for fuels in self.FM_MULTI_K[k_uni]:
                         for v in self.V_VEHICLE_TYPES:
-                            self.K_uni_FVT.append((k_uni,) + (fuels,) + (v,) + (t,))
-                            self.KFVT.append((k_uni,) + (fuels,) + (v,) + (t,))
+                            K_uni_FVT.append((k_uni,) + (fuels,) + (v,) + (t,))
+                            KFVT.append((k_uni,) + (fuels,) + (v,) + (t,))
                             for s in self.S_SCENARIOS:
-                                self.K_uni_FVT_S.append((k_uni,) + (fuels,) + (v,) + (t,) + (s,))
-                                self.KFVT_S.append((k_uni,) + (fuels,) + (v,) + (t,) + (s,))
+                                K_uni_FVT_S.append((k_uni,) + (fuels,) + (v,) + (t,) + (s,))
+                                KFVT_S.append((k_uni,) + (fuels,) + (v,) + (t,) + (s,))
                         for p in self.P_PRODUCTS:
                             for s in self.S_SCENARIOS:
-                                self.KFPT_S.append((k_uni,) + (fuels,) + (p,) + (t,) + (s,))
-                            self.KFPT.append((k_uni,) + (fuels,) + (p,) + (t,))
+                                KFPT_S.append((k_uni,) + (fuels,) + (p,) + (t,) + (s,))
+                            KFPT.append((k_uni,) + (fuels,) + (p,) + (t,))
                             
                 for k_multi in self.MULTI_MODE_PATHS:
                     for fuels in self.FM_MULTI_K[k_multi]:
                         for v in self.V_VEHICLE_TYPES:
                             for s in self.S_SCENARIOS:
-                                self.KFVT_S.append((k_multi,) + (fuels,) + (v,) + (t,) + (s,))
-                            self.KFVT.append((k_multi,) + (fuels,) + (v,) + (t,))
+                                KFVT_S.append((k_multi,) + (fuels,) + (v,) + (t,) + (s,))
+                            KFVT.append((k_multi,) + (fuels,) + (v,) + (t,))
                         for p in self.P_PRODUCTS:
                             for s in self.S_SCENARIOS:
-                                self.KFPT_S.append((k_multi,) + (fuels,) + (p,) + (t,) + (s,))
-                            self.KFPT.append((k_multi,) + (fuels,) + (p,) + (t,))
+                                KFPT_S.append((k_multi,) + (fuels,) + (p,) + (t,) + (s,))
+                            KFPT.append((k_multi,) + (fuels,) + (p,) + (t,))
+        
+        return {"KFPT":KFPT, "KFPT_S":KFPT_S, "KFVT":KFVT, "K_uni_FVT":K_uni_FVT, "KFVT_S":KFVT_S, "K_uni_FVT_S":K_uni_FVT_S}
+
+    KFPT = index_set()(lambda self: self.TIMES_PATH_SETS["KFPT"])
+    KFPT_S = index_set()(lambda self: self.TIMES_PATH_SETS["KFPT_S"])
+    KFVT = index_set()(lambda self: self.TIMES_PATH_SETS["KFVT"])
+    K_uni_FVT = index_set()(lambda self: self.TIMES_PATH_SETS["K_uni_FVT"])
+    KFVT_S = index_set()(lambda self: self.TIMES_PATH_SETS["KFVT_S"])
+    K_uni_FVT_S = index_set()(lambda self: self.TIMES_PATH_SETS["K_uni_FVT_S"])
+
+
+#Read-only view on a TransportSets object, restricted to other time periods/scenarios/single time period
+#All parameters are shared with the parent (nothing is copied), only the index sets for the view's key are built, 
+#and these are memoized in the cache of the parent, so that the parent and all of its views share them
+class TransportSetsView(TransportSets):
+
+    def __init__(self, parent, time_periods, scenarios, single_time_period, times_sets):
+        self.__dict__["_parent"] = parent
+        self.__dict__["T_TIME_PERIODS"] = list(time_periods)
+        self.__dict__["S_SCENARIOS"] = list(scenarios)
+        self.__dict__["single_time_period"] = single_time_period
+        self.__dict__["times_sets"] = times_sets
+        self.__dict__["_set_cache"] = parent.__dict__.setdefault("_set_cache", {})
+
+    def __getattr__(self, name):    # only called for attributes that are not in the view itself
+        parent = self.__dict__.get("_parent")
+        if parent is None or name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(parent, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"TransportSetsView is read-only (cannot set {name}), use TransportSets.view() to create another view")
+
+    def set_paths(self, paths, ids=None):
+        raise AttributeError("TransportSetsView is read-only (cannot change the paths), use copy_with_paths() to get data with other paths")
+
+    def invalidate_sets(self):
+        self.__dict__["_parent"].invalidate_sets()
+        self.__dict__["_set_cache"] = self.__dict__["_parent"].__dict__.setdefault("_set_cache", {})
+        for name in INDEX_SETS:
+            self.__dict__.pop(name, None)
+
+
+# all lazily built index sets of TransportSets, and the attributes they are memoized on
+INDEX_SETS = {name for name, attr in vars(TransportSets).items() if isinstance(attr, index_set)}
+SET_KEY_ATTRIBUTES = ("T_TIME_PERIODS", "S_SCENARIOS", "single_time_period", "times_sets")
+
+# parameters that are stored as IndexedParameter, with their index sets (see TransportSets.parameter_axes)
+COMPACT_PARAMETERS = {"C_TRANSP_COST": ("arc", "fuel", "product", "year", "scenario"),
+                      "C_TRANSP_COST_BASE": ("arc", "fuel", "product", "year"),
+                      "E_EMISSIONS": ("arc", "fuel", "product", "year"),
+                      "C_CO2": ("arc", "fuel", "product", "year"),
+                      "C_TIME_VALUE": ("arc", "product")}
 
 
 print("Finished reading sets and classes.")
@@ -0,0 +1,155 @@
+"""A compact, dict-like parameter stored as a dense numpy array over integer-coded index sets"""
+
+from collections.abc import MutableMapping
+
+import numpy as np
+
+class IndexedParameter(MutableMapping):
+    # A parameter such as C_TRANSP_COST[(i,j,m,r,f,p,t,s)] behaves as a dict keyed by flat tuples,
+    # but the values are stored in a numpy array with one axis per index set (nan = key does not exist).
+    # axes is a list of (name, labels, width): an axis with width > 1 consumes several key elements, e.g.
+    # the arc axis ("arc", A_ARCS, 4) for the (i,j,m,r) part of the key.
+    # Labels are interned: axis_codes[n][label] is the position of the label on axis n.
+
+    def __init__(self, axes, array=None, fill=np.nan):
+        self.axes = [(name, list(labels), width) for (name, labels, width) in axes]
+        self.axis_codes = [{label: nr for nr, label in enumerate(labels)} for (name, labels, width) in self.axes]
+        shape = tuple(len(labels) for (name, labels, width) in self.axes)
+        if array is None:
+            array = np.full(shape, fill, dtype=float)
+        if array.shape != shape:
+            raise ValueError(f"array of shape {array.shape} does not match the axes {shape}")
+        self.array = array
+        self.key_length = sum(width for (name, labels, width) in self.axes)
+
+    @classmethod
+    def from_dict(cls, dictionary, axes):
+        # all keys must fit the axes (a key that does not, e.g. with a mistyped fuel or a year that is not a time period, raises a KeyError)
+        param = cls(axes)
+        for key, value in dictionary.items():
+            index = param.index(key)
+            if index is None:
+                raise KeyError(f"{key} does not fit the index sets ({', '.join(name for (name, labels, width) in param.axes)}) of this parameter")
+            param.array[index] = value
+        return param
+
+    def index(self, key):
+        # position of key in the array (None if the key does not fit the axes)
+        if type(key) is not tuple or len(key) != self.key_length:
+            return None
+        index = []
+        pos = 0
+        for (name, labels, width), codes in zip(self.axes, self.axis_codes):
+            label = key[pos] if width == 1 else key[pos:pos+width]
+            code = codes.get(label)
+            if code is None:
+                return None
+            index.append(code)
+            pos += width
+        return tuple(index)
+
+    def labels(self, index):
+        # inverse of self.index
+        key = ()
+        for (name, labels, width), code in zip(self.axes, index):
+            key += (labels[code],) if width == 1 else labels[code]
+        return key
+
+    def __getitem__(self, key):
+        index = self.index(key)
+        if index is None:
+            raise KeyError(key)
+        value = self.array.item(index)
+        if value != value:     # nan: not defined
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        index = self.index(key)
+        if index is None:
+            raise KeyError(f"{key} does not fit the index sets of this parameter")
+        self.array[index] = value
+
+    def __delitem__(self, key):
+        self[key] = np.nan
+
+    def __iter__(self):
+        for index in np.argwhere(~np.isnan(self.array)).tolist():
+            yield self.labels(index)
+
+    def __len__(self):
+        return int(np.count_nonzero(~np.isnan(self.array)))
+
+    def __contains__(self, key):
+        index = self.index(key)
+        return index is not None and not np.isnan(self.array[index])
+
+    def __repr__(self):
+        return f"IndexedParameter({', '.join(name for (name, labels, width) in self.axes)}; {len(self)} entries)"
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+class FactoredParameter(IndexedParameter):
+    # A scenario-dependent parameter, stored in factored form:
+    #   value[(i,j,m,r,f,p,t,s)] = round(base[(i,j,m,r,f,p,t)] * factor[m,f,p,t,k], digits)
+    # where k is the cost path of fuel f in scenario s (e.g. "B", "P" or "O" for the fuel group of f).
+    # The factor table grows with the number of cost paths instead of with the number of scenarios. Values are
+    # computed when they are accessed; the array attribute evaluates all of them at once (not stored), values() only the given ones.
+    # base: IndexedParameter with axes (arc, fuel, product, year)
+    # factor: array over (mode, fuel, product, year, cost path), or over (arc, fuel, product, year, cost path) after interpolation
+    # arc_modes[a]: position of the factor row of arc a on the first axis of factor (its mode, or the arc itself)
+    # fuel_paths[f,s]: position of the cost path of fuel f in scenario s on the last axis of factor
+
+    def __init__(self, base, factor, arc_modes, fuel_paths, scenarios, digits):
+        self.base = base
+        self.factor = np.asarray(factor, dtype=float)
+        self.arc_modes = np.asarray(arc_modes, dtype=int)
+        self.fuel_paths = np.asarray(fuel_paths, dtype=int)
+        self.digits = digits
+        self.axes = base.axes + [("scenario", list(scenarios), 1)]
+        self.axis_codes = base.axis_codes + [{label: nr for nr, label in enumerate(scenarios)}]
+        self.key_length = base.key_length + 1
+        if self.factor.shape[1:4] != base.array.shape[1:] or self.fuel_paths.shape != (base.array.shape[1], len(scenarios)):
+            raise ValueError("the factor table does not match the base parameter and scenarios")
+
+    def value(self, index):
+        (a, f, p, t, s) = index
+        return self.base.array.item(a,f,p,t) * self.factor.item(self.arc_modes.item(a), f, p, t, self.fuel_paths.item(f,s))
+
+    def path_values(self):
+        # rounded values over (arc, fuel, product, year, cost path)
+        factor = self.factor[self.arc_modes]
+        values = self.base.array[..., None] * factor
+        return np.array([round(v, self.digits) for v in values.ravel().tolist()]).reshape(values.shape)
+
+    def values(self, a, f, p, t, s):
+        # rounded values for the (broadcast) arrays of positions a, f, p, t and s on the axes
+        values = self.base.array[a, f, p, t] * self.factor[self.arc_modes[a], f, p, t, self.fuel_paths[f, s]]
+        return np.array([round(v, self.digits) for v in values.ravel().tolist()]).reshape(values.shape)
+
+    @property
+    def array(self):
+        F, P, T = self.base.array.shape[1:]
+        return self.path_values()[:, np.arange(F)[:,None,None,None], np.arange(P)[None,:,None,None], 
+                                  np.arange(T)[None,None,:,None], self.fuel_paths[:,None,None,:]]     #(a,f,p,t,s)
+
+    def __getitem__(self, key):
+        index = self.index(key)
+        if index is None:
+            raise KeyError(key)
+        value = self.value(index)
+        if value != value:     # nan: not defined
+            raise KeyError(key)
+        return round(value, self.digits)
+
+    def __setitem__(self, key, value):
+        raise TypeError("FactoredParameter is read-only, change its base or factor instead")
+
+    def __contains__(self, key):
+        index = self.index(key)
+        return index is not None and not np.isnan(self.value(index))
+
+    def __repr__(self):
+        return f"FactoredParameter({', '.join(name for (name, labels, width) in self.axes)}; {self.factor.shape[-1]} cost paths)"
@@ -0,0 +1,142 @@
+"""
+Content-hashed cache for the Excel/CSV input files
+
+Every sheet that is parsed during the data construction is stored as a binary
+pickle in INPUT_CACHE_DIR. The cache key consists of the hash of the content of
+the source file, the sheet name and the read options, so a cached sheet is
+automatically ignored (and replaced) as soon as the workbook changes.
+
+On a cache miss, the sheet is read from a shared workbook handle: every workbook
+is opened only once (openpyxl read-only mode) and all sheet requests for that
+file are served from the same handle until close_workbooks() is called.
+"""
+
+import os
+import hashlib
+import pickle
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import coordinate_to_tuple
+
+from Data.settings import INPUT_CACHE, INPUT_CACHE_DIR
+
+
+_file_hashes = {}   # path -> (mtime, size, hash), avoids rehashing the same file within a run
+_workbooks = {}     # path -> ((mtime, size), pd.ExcelFile), the workbook registry
+
+
+def file_hash(path):
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if path in _file_hashes and _file_hashes[path][0] == signature:
+        return _file_hashes[path][1]
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    _file_hashes[path] = (signature, sha.hexdigest())
+    return _file_hashes[path][1]
+
+
+def workbook(path):
+    # shared (read-only, formulas evaluated) handle to an excel file
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if path in _workbooks:
+        if _workbooks[path][0] == signature:
+            return _workbooks[path][1]
+        _workbooks.pop(path)[1].close()
+    xl = pd.ExcelFile(path, engine="openpyxl")   # opens with read_only=True, data_only=True
+    _workbooks[path] = (signature, xl)
+    return xl
+
+
+def close_workbooks():
+    for signature, xl in _workbooks.values():
+        xl.close()
+    _workbooks.clear()
+
+
+def _cache_file(path, sheet_name, kind, options):
+    # file name: <stem>__<sheet>__<kind>__<hash of the read options>__<hash of the source file>.pkl
+    # the prefix (everything up to the source hash) identifies the stale versions of the same read
+    stem = os.path.splitext(os.path.basename(path))[0]
+    options_key = hashlib.sha1(repr((sheet_name, kind, sorted(options.items()))).encode('utf-8')).hexdigest()[:12]
+    source_key = file_hash(path)[:20]
+    prefix = f"{stem}__{sheet_name}__{kind}__{options_key}__"
+    return os.path.join(INPUT_CACHE_DIR, prefix + source_key + ".pkl"), prefix
+
+
+def _cached(path, sheet_name, kind, options, parse):
+    if not INPUT_CACHE:
+        return parse()
+    cache_file, prefix = _cache_file(path, sheet_name, kind, options)
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    value = parse()
+    os.makedirs(INPUT_CACHE_DIR, exist_ok=True)
+    for old in os.listdir(INPUT_CACHE_DIR):  #remove stale versions of the same sheet and read options (older source files)
+        if old.startswith(prefix) and old.endswith(".pkl"):
+            os.remove(os.path.join(INPUT_CACHE_DIR, old))
+    tmp_file = cache_file + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file)
+    return value
+
+
+def read_excel(path, sheet_name, **options):
+    # drop-in replacement for pd.read_excel(path, sheet_name=...)
+    return _cached(path, sheet_name, "frame", options,
+                   lambda: workbook(path).parse(sheet_name=sheet_name, **options))
+
+
+def read_csv(path, **options):
+    # drop-in replacement for pd.read_csv(path)
+    return _cached(path, "csv", "frame", options,
+                   lambda: pd.read_csv(path, **options))
+
+
+def read_sheet_values(path, sheet_name):
+    # cell values of a sheet (formulas evaluated, as with load_workbook(..., data_only=True))
+    def parse():
+        ws = workbook(path).book[sheet_name]
+        return [list(row) for row in ws.iter_rows(values_only=True)]
+    return SheetValues(_cached(path, sheet_name, "values", {}, parse))
+
+
+class _Cell():
+    __slots__ = ["value"]
+
+    def __init__(self, value):
+        self.value = value
+
+
+class SheetValues():
+    # read-only stand-in for an openpyxl worksheet (supports ws.cell(row, col).value and ws["B4"].value)
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.max_row = len(rows)
+        self.max_column = max((len(r) for r in rows), default=0)
+
+    def to_array(self):
+        # all values as a (max_row, max_column) object array, padded with None
+        grid = np.full((self.max_row, self.max_column), None, dtype=object)
+        for i, r in enumerate(self.rows):
+            grid[i, :len(r)] = r
+        return grid
+
+    def value(self, row, column):
+        if 1 <= row <= self.max_row and 1 <= column <= len(self.rows[row-1]):
+            return self.rows[row-1][column-1]
+        return None
+
+    def cell(self, row, column):
+        return _Cell(self.value(row, column))
+
+    def __getitem__(self, coordinate):
+        row, column = coordinate_to_tuple(coordinate)
+        return self.cell(row, column)
@@ -3,10 +3,75 @@ import numpy as np
 import os
 import sys
 
+from Data.IndexedParameter import IndexedParameter, FactoredParameter
+
+
+def interpolation_endpoints(orig_periods, new_periods):
+    # left and right endpoints (in orig_periods) of every new period (-inf/inf if there is none)
+    left = {}
+    right = {}
+    for t in new_periods:
+        left[t] = max((tt for tt in orig_periods if tt <= t), default=-np.infty)
+        right[t] = min((tt for tt in orig_periods if tt >= t), default=np.infty)
+    return left, right
+
+def interpolate_array(values, orig_periods, new_periods, digits, axis=-1):
+    # values along the given axis correspond to orig_periods; returns the values for new_periods (rounded, unless digits is None): 
+    # - linear interpolation between the left and right endpoint
+    # - linear extrapolation into the future, based on the last two periods (only increasing)
+    values = np.moveaxis(np.asarray(values, dtype=float), axis, -1)
+    position = {tt: nr for nr, tt in enumerate(orig_periods)}
+    left, right = interpolation_endpoints(orig_periods, new_periods)
+    last_period, penult_period = orig_periods[-1], orig_periods[-2]
+    last_value, penult_value = values[..., position[last_period]], values[..., position[penult_period]]
+    new_values = np.empty(values.shape[:-1] + (len(new_periods),))
+    for nr, t in enumerate(new_periods):
+        if left[t] == -np.infty:
+            # extrapolate into the past
+            raise Exception("We haven't implemented extrapolation into the past yet")
+        elif right[t] == np.infty:
+            # extrapolate into the future (linearly)
+            new_values[..., nr] = last_value + (t - last_period) * np.maximum(last_value - penult_value, 0) / (last_period - penult_period)
+        else:
+            left_value, right_value = values[..., position[left[t]]], values[..., position[right[t]]]
+            if left[t] == right[t]:
+                # we have exact data
+                new_values[..., nr] = left_value
+            else:
+                # interpolate between left and right (linearly)
+                new_values[..., nr] = left_value + (t - left[t]) * (right_value - left_value) / (right[t] - left[t])
+    if digits is not None:
+        new_values = np.round(new_values, digits)
+    return np.moveaxis(new_values, -1, axis)
+
+def interpolate_dict(param, prefixes, orig_periods, new_periods, digits):
+    # param is a dict with keys prefix + (t,), with t the last index
+    values = np.array([[param[prefix + (t,)] for t in orig_periods] for prefix in prefixes], dtype=float).reshape(len(prefixes), len(orig_periods))
+    new_values = interpolate_array(values, orig_periods, new_periods, digits).tolist()
+    return {prefix + (t,): new_values[nr][t_nr] for t_nr, t in enumerate(new_periods) for nr, prefix in enumerate(prefixes)}
+
+def interpolate_parameter(param, new_periods, digits):
+    # param is an IndexedParameter with a "year" axis
+    if isinstance(param, FactoredParameter):
+        # interpolate the (rounded) values of every cost path, as for the full parameter, and divide them by the interpolated 
+        # base to get the factors (now per arc instead of per mode)
+        year_axis = [name for (name, labels, width) in param.base.axes].index("year")
+        values = interpolate_array(param.path_values(), param.base.axes[year_axis][1], new_periods, digits, axis=year_axis)
+        base = interpolate_parameter(param.base, new_periods, digits)
+        base_values = base.array[..., None]
+        factor = np.divide(values, base_values, out=np.zeros_like(values), where=(base_values != 0))
+        return FactoredParameter(base, factor, np.arange(len(factor)), param.fuel_paths, param.axes[-1][1], param.digits)
+    year_axis = [name for (name, labels, width) in param.axes].index("year")
+    orig_periods = param.axes[year_axis][1]
+    axes = [(name, new_periods if name == "year" else labels, width) for (name, labels, width) in param.axes]
+    return IndexedParameter(axes, interpolate_array(param.array, orig_periods, new_periods, digits, axis=year_axis))
+
+
 def interpolate(orig_data, time_periods, num_first_stage_periods):
     # copy the original data 
-    # (we'll only change time-dependent data that should be interpolated)
-    new_data = copy.deepcopy(orig_data) 
+    # (only the time-dependent data is replaced, everything else is shared with orig_data)
+    new_data = copy.copy(orig_data)   # the index sets are not copied (see TransportSets.__getstate__)
+    digits = new_data.precision_digits
 
     # TIMING
 
@@ -17,42 +82,9 @@ def interpolate(orig_data, time_periods, num_first_stage_periods):
     new_data.T_TIME_FIRST_STAGE_BASE = time_periods[0:num_first_stage_periods]
     new_data.T_TIME_SECOND_STAGE_BASE = time_periods[num_first_stage_periods:len(time_periods)]
 
-    # define left and right endpoints for interpolation
-    new_data.T_LEFT = {}
-    new_data.T_RIGHT = {}
-    for t in time_periods:
-        # initialize
-        new_data.T_LEFT[t] = -np.infty 
-        new_data.T_RIGHT[t] = np.infty 
-        # find correct value
-        for tt in orig_data.T_TIME_PERIODS:
-            if tt <= t:
-                new_data.T_LEFT[t] = tt
-        for tt in reversed(orig_data.T_TIME_PERIODS):
-            if tt >= t:
-                new_data.T_RIGHT[t] = tt
-
-    LAST_PERIOD = orig_data.T_TIME_PERIODS[len(orig_data.T_TIME_PERIODS)-1]
-    PENULT_PERIOD = orig_data.T_TIME_PERIODS[len(orig_data.T_TIME_PERIODS)-2]
-
-    # define left and right endpoints for interpolation for PWC
-    new_data.T_LEFT_PWC = {}
-    new_data.T_RIGHT_PWC = {}
-    for t in time_periods:
-        # initialize
-        new_data.T_LEFT_PWC[t] = -np.infty 
-        new_data.T_RIGHT_PWC[t] = np.infty 
-        # find correct value
-        for tt in orig_data.T_TIME_PERIODS_PWC:
-            if tt <= t:
-                new_data.T_LEFT_PWC[t] = tt
-        for tt in reversed(orig_data.T_TIME_PERIODS_PWC):
-            if tt >= t:
-                new_data.T_RIGHT_PWC[t] = tt
-
-    LAST_PERIOD_PWC = orig_data.T_TIME_PERIODS_PWC[len(orig_data.T_TIME_PERIODS_PWC)-1]
-    PENULT_PERIOD_PWC = orig_data.T_TIME_PERIODS_PWC[len(orig_data.T_TIME_PERIODS_PWC)-2]
-
+    # define left and right endpoints for interpolation (also for PWC)
+    new_data.T_LEFT, new_data.T_RIGHT = interpolation_endpoints(orig_data.T_TIME_PERIODS, time_periods)
+    new_data.T_LEFT_PWC, new_data.T_RIGHT_PWC = interpolation_endpoints(orig_data.T_TIME_PERIODS_PWC, time_periods)
 
     # update other sets based on the above
     new_data.T_MIN1 = {new_data.T_TIME_PERIODS[tt]:new_data.T_TIME_PERIODS[tt-1] for tt in range(1,len(new_data.T_TIME_PERIODS))} 
@@ -64,30 +96,7 @@ def interpolate(orig_data, time_periods, num_first_stage_periods):
     # DEMAND
 
     # demand
-    new_data.D_DEMAND = {(o,d,p,t):0 for t in new_data.T_TIME_PERIODS for (o,d,p) in new_data.ODP} 
-    for (o,d,p) in new_data.ODP:
-        for t in new_data.T_TIME_PERIODS:
-            if new_data.T_LEFT_PWC[t] == -np.infty:
-                # extrapolate into the past
-                raise Exception("We haven't implemented extrapolation into the past yet")
-            elif new_data.T_RIGHT_PWC[t] == np.infty:
-                # extrapolate into the future (linearly)
-                last_value = orig_data.D_DEMAND[(o,d,p,LAST_PERIOD_PWC)]
-                penult_value = orig_data.D_DEMAND[(o,d,p,PENULT_PERIOD_PWC)]
-                new_data.D_DEMAND[(o,d,p,t)] = last_value + (t - LAST_PERIOD_PWC) * max(last_value - penult_value, 0) / (LAST_PERIOD_PWC - PENULT_PERIOD_PWC)
-            else:
-                # interpolate between left and right (linearly)
-                t_left = new_data.T_LEFT_PWC[t]
-                t_right = new_data.T_RIGHT_PWC[t]
-                left_value = orig_data.D_DEMAND[(o,d,p,t_left)]
-                right_value = orig_data.D_DEMAND[(o,d,p,t_right)]
-                if t_left == t_right:
-                    # we have exact data
-                    new_data.D_DEMAND[(o,d,p,t)] = left_value
-                else:
-                    # interpolate
-                    new_data.D_DEMAND[(o,d,p,t)] = left_value + (t - t_left) * (right_value - left_value) / (t_right - t_left)
-            new_data.D_DEMAND[(o,d,p,t)] = round(new_data.D_DEMAND[(o,d,p,t)], new_data.precision_digits)
+    new_data.D_DEMAND = interpolate_dict(orig_data.D_DEMAND, new_data.ODP, orig_data.T_TIME_PERIODS_PWC, time_periods, digits)
     # TODO: GET RID OF NEAR-ZERO DEMAND?
 
     # aggregate demand
@@ -98,148 +107,22 @@ def interpolate(orig_data, time_periods, num_first_stage_periods):
     
     # OTHER PARAMETERS
 
-    new_data.CO2_fee = {t: 10000000 for t in new_data.T_TIME_PERIODS}   #UNIT: nok/gCO2
-    for t in new_data.T_TIME_PERIODS:
-        if new_data.T_LEFT[t] == -np.infty:
-            # extrapolate into the past
-            raise Exception("We haven't implemented extrapolation into the past yet")
-        elif new_data.T_RIGHT[t] == np.infty:
-            # extrapolate into the future (linearly)
-            last_value = orig_data.CO2_fee[LAST_PERIOD]
-            penult_value = orig_data.CO2_fee[PENULT_PERIOD]
-            new_data.CO2_fee[t] = last_value + (t - LAST_PERIOD) * max(last_value - penult_value, 0) / (LAST_PERIOD - PENULT_PERIOD)
-        else:
-            # interpolate between left and right (linearly)
-            t_left = new_data.T_LEFT[t]
-            t_right = new_data.T_RIGHT[t]
-            left_value = orig_data.CO2_fee[t_left]
-            right_value = orig_data.CO2_fee[t_right]
-            if t_left == t_right:
-                new_data.CO2_fee[t] = left_value
-            else:
-                new_data.CO2_fee[t] = left_value + (t - t_left) * (right_value - left_value) / (t_right - t_left)
-        new_data.CO2_fee[t] = round(new_data.CO2_fee[t],new_data.precision_digits)
-
-    #base level transport costs (in average scenario)
-    new_data.C_TRANSP_COST_BASE = {(i,j,m,r,f,p,t): 1000000 for (i,j,m,r) in new_data.A_ARCS for f in new_data.FM_FUEL[m] 
-                            for p in new_data.P_PRODUCTS for t in new_data.T_TIME_PERIODS}   #UNIT: NOK/T
-    #scenario-dependent transport cost (computed using base cost)
-    new_data.C_TRANSP_COST_NORMALIZED = {(m,f,p,t): 1000000 for m in new_data.M_MODES for f in new_data.FM_FUEL[m] 
-                            for p in new_data.P_PRODUCTS for t in new_data.T_TIME_PERIODS}   #UNIT: NOK/Tkm
-    
-    new_data.E_EMISSIONS_NORMALIZED = {(m,f,p,t): 1000000 for m in new_data.M_MODES for f in new_data.FM_FUEL[m] 
-                        for p in new_data.P_PRODUCTS for t in new_data.T_TIME_PERIODS}      #UNIT:  gCO2/T
-    new_data.C_TRANSP_COST = {(i,j,m,r,f,p,t): 1000000 for (i,j,m,r) in new_data.A_ARCS for f in new_data.FM_FUEL[m] 
-                            for p in new_data.P_PRODUCTS for t in new_data.T_TIME_PERIODS}   #UNIT: NOK/T
-    new_data.E_EMISSIONS = {(i,j,m,r,f,p,t): 1000000 for (i,j,m,r) in new_data.A_ARCS for f in new_data.FM_FUEL[m] 
-                        for p in new_data.P_PRODUCTS for t in new_data.T_TIME_PERIODS}      #UNIT:  gCO2/T
-    new_data.C_CO2 = {(i,j,m,r,f,p,t): 1000000 for (i,j,m,r) in new_data.A_ARCS for f in new_data.FM_FUEL[m] 
-                    for p in new_data.P_PRODUCTS for t in new_data.T_TIME_PERIODS}   #UNIT: nok/T
+    CO2_fee = interpolate_array([orig_data.CO2_fee[t] for t in orig_data.T_TIME_PERIODS], orig_data.T_TIME_PERIODS, time_periods, digits)
+    new_data.CO2_fee = dict(zip(time_periods, CO2_fee.tolist()))   #UNIT: nok/gCO2
 
     # everything with index (m,f,p,t)
-    # that is: C_TRANSP_COST_NORMALIZED, E_EMISSIONS_NORMALIZED
-    for m in new_data.M_MODES:
-        for f in new_data.FM_FUEL[m]:
-            for p in new_data.P_PRODUCTS:
-                for t in new_data.T_TIME_PERIODS:
-                    if new_data.T_LEFT[t] == -np.infty:
-                        # extrapolate into the past
-                        raise Exception("We haven't implemented extrapolation into the past yet")
-                    elif new_data.T_RIGHT[t] == np.infty:
-                        # extrapolate into the future (linearly)
-                        # C_TRANSP_COST_NORMALIZED
-                        last_value = orig_data.C_TRANSP_COST_NORMALIZED[(m,f,p,LAST_PERIOD)]
-                        penult_value = orig_data.C_TRANSP_COST_NORMALIZED[(m,f,p,PENULT_PERIOD)]
-                        new_data.C_TRANSP_COST_NORMALIZED[(m,f,p,t)] = last_value + (t - LAST_PERIOD) * max(last_value - penult_value, 0) / (LAST_PERIOD - PENULT_PERIOD)
-                        # E_EMISSIONS_NORMALIZED
-                        last_value = orig_data.E_EMISSIONS_NORMALIZED[(m,f,p,LAST_PERIOD)]
-                        penult_value = orig_data.E_EMISSIONS_NORMALIZED[(m,f,p,PENULT_PERIOD)]
-                        new_data.E_EMISSIONS_NORMALIZED[(m,f,p,t)] = last_value + (t - LAST_PERIOD) * max(last_value - penult_value, 0) / (LAST_PERIOD - PENULT_PERIOD)
-                    else:
-                        # interpolate between left and right (linearly)
-                        t_left = new_data.T_LEFT[t]
-                        t_right = new_data.T_RIGHT[t]
-                        # C_TRANSP_COST_NORMALIZED
-                        left_value = orig_data.C_TRANSP_COST_NORMALIZED[(m,f,p,t_left)]
-                        right_value = orig_data.C_TRANSP_COST_NORMALIZED[(m,f,p,t_right)]
-                        if t_left == t_right:
-                            new_data.C_TRANSP_COST_NORMALIZED[(m,f,p,t)] = left_value
-                        else:
-                            new_data.C_TRANSP_COST_NORMALIZED[(m,f,p,t)] = left_value + (t - t_left) * (right_value - left_value) / (t_right - t_left)
-                        # E_EMISSIONS_NORMALIZED
-                        left_value = orig_data.E_EMISSIONS_NORMALIZED[(m,f,p,t_left)]
-                        right_value = orig_data.E_EMISSIONS_NORMALIZED[(m,f,p,t_right)]
-                        if t_left == t_right:
-                            new_data.E_EMISSIONS_NORMALIZED[(m,f,p,t)] = left_value
-                        else:
-                            new_data.E_EMISSIONS_NORMALIZED[(m,f,p,t)] = left_value + (t - t_left) * (right_value - left_value) / (t_right - t_left)
-                    new_data.C_TRANSP_COST_NORMALIZED[(m,f,p,t)] = round(new_data.C_TRANSP_COST_NORMALIZED[(m,f,p,t)],new_data.precision_digits)
-                    new_data.E_EMISSIONS_NORMALIZED[(m,f,p,t)] = round(new_data.E_EMISSIONS_NORMALIZED[(m,f,p,t)],new_data.precision_digits)
-    # everything with index (i,j,m,r,f,p,t)
-    # that is: C_TRANSP_COST_BASE, C_TRANSP_COST, E_EMISSIONS, C_CO2
-    for (i,j,m,r) in new_data.A_ARCS:
-        for f in new_data.FM_FUEL[m]:
-            for p in new_data.P_PRODUCTS:
-                for t in new_data.T_TIME_PERIODS:
-                    if new_data.T_LEFT[t] == -np.infty:
-                        # extrapolate into the past
-                        raise Exception("We haven't implemented extrapolation into the past yet")
-                    elif new_data.T_RIGHT[t] == np.infty:
-                        # extrapolate into the future (linearly)
-                        # C_TRANSP_COST_BASE
-                        last_value = orig_data.C_TRANSP_COST_BASE[(i,j,m,r,f,p,LAST_PERIOD)]
-                        penult_value = orig_data.C_TRANSP_COST_BASE[(i,j,m,r,f,p,PENULT_PERIOD)]
-                        new_data.C_TRANSP_COST_BASE[(i,j,m,r,f,p,t)] = last_value + (t - LAST_PERIOD) * max(last_value - penult_value, 0) / (LAST_PERIOD - PENULT_PERIOD)
-                        # C_TRANSP_COST
-                        last_value = orig_data.C_TRANSP_COST[(i,j,m,r,f,p,LAST_PERIOD)]
-                        penult_value = orig_data.C_TRANSP_COST[(i,j,m,r,f,p,PENULT_PERIOD)]
-                        new_data.C_TRANSP_COST[(i,j,m,r,f,p,t)] = last_value + (t - LAST_PERIOD) * max(last_value - penult_value, 0) / (LAST_PERIOD - PENULT_PERIOD)
-                        # E_EMISSIONS
-                        last_value = orig_data.E_EMISSIONS[(i,j,m,r,f,p,LAST_PERIOD)]
-                        penult_value = orig_data.E_EMISSIONS[(i,j,m,r,f,p,PENULT_PERIOD)]
-                        new_data.E_EMISSIONS[(i,j,m,r,f,p,t)] = last_value + (t - LAST_PERIOD) * max(last_value - penult_value, 0) / (LAST_PERIOD - PENULT_PERIOD)
-                        # C_CO2
-                        last_value = orig_data.C_CO2[(i,j,m,r,f,p,LAST_PERIOD)]
-                        penult_value = orig_data.C_CO2[(i,j,m,r,f,p,PENULT_PERIOD)]
-                        new_data.C_CO2[(i,j,m,r,f,p,t)] = last_value + (t - LAST_PERIOD) * max(last_value - penult_value, 0) / (LAST_PERIOD - PENULT_PERIOD)
-                    else:
-                        # interpolate between left and right (linearly)
-                        t_left = new_data.T_LEFT[t]
-                        t_right = new_data.T_RIGHT[t]
-                        # C_TRANSP_COST_BASE
-                        left_value = orig_data.C_TRANSP_COST_BASE[(i,j,m,r,f,p,t_left)]
-                        right_value = orig_data.C_TRANSP_COST_BASE[(i,j,m,r,f,p,t_right)]
-                        if t_left == t_right:
-                            new_data.C_TRANSP_COST_BASE[(i,j,m,r,f,p,t)] = left_value
-                        else:
-                            new_data.C_TRANSP_COST_BASE[(i,j,m,r,f,p,t)] = left_value + (t - t_left) * (right_value - left_value) / (t_right - t_left)
-                        # C_TRANSP_COST
-                        for s in orig_data.S_SCENARIOS:
-                            left_value = orig_data.C_TRANSP_COST[(i,j,m,r,f,p,t_left,s)]
-                            right_value = orig_data.C_TRANSP_COST[(i,j,m,r,f,p,t_right,s)]
-                            if t_left == t_right:
-                                new_data.C_TRANSP_COST[(i,j,m,r,f,p,t,s)] = left_value
-                            else:
-                                new_data.C_TRANSP_COST[(i,j,m,r,f,p,t,s)] = left_value + (t - t_left) * (right_value - left_value) / (t_right - t_left)
-                        # E_EMISSIONS
-                        left_value = orig_data.E_EMISSIONS[(i,j,m,r,f,p,t_left)]
-                        right_value = orig_data.E_EMISSIONS[(i,j,m,r,f,p,t_right)]
-                        if t_left == t_right:
-                            new_data.E_EMISSIONS[(i,j,m,r,f,p,t)] = left_value
-                        else:
-                            new_data.E_EMISSIONS[(i,j,m,r,f,p,t)] = left_value + (t - t_left) * (right_value - left_value) / (t_right - t_left)
-                        # C_CO2
-                        left_value = orig_data.C_CO2[(i,j,m,r,f,p,t_left)]
-                        right_value = orig_data.C_CO2[(i,j,m,r,f,p,t_right)]
-                        if t_left == t_right:
-                            new_data.C_CO2[(i,j,m,r,f,p,t)] = left_value
-                        else:
-                            new_data.C_CO2[(i,j,m,r,f,p,t)] = left_value + (t - t_left) * (right_value - left_value) / (t_right - t_left)
-                    new_data.C_TRANSP_COST_BASE[(i,j,m,r,f,p,t)] = round(new_data.C_TRANSP_COST_BASE[(i,j,m,r,f,p,t)],new_data.precision_digits)
-                    new_data.C_TRANSP_COST[(i,j,m,r,f,p,t,s)] = round(new_data.C_TRANSP_COST[(i,j,m,r,f,p,t,s)],new_data.precision_digits)
-                    new_data.E_EMISSIONS[(i,j,m,r,f,p,t)] = round(new_data.E_EMISSIONS[(i,j,m,r,f,p,t)],new_data.precision_digits)
-                    new_data.C_CO2[(i,j,m,r,f,p,t)] = round(new_data.C_CO2[(i,j,m,r,f,p,t)] ,new_data.precision_digits)
+    MFP = [(m,f,p) for m in new_data.M_MODES for f in new_data.FM_FUEL[m] for p in new_data.P_PRODUCTS]
+    new_data.C_TRANSP_COST_NORMALIZED = interpolate_dict(orig_data.C_TRANSP_COST_NORMALIZED, MFP, orig_data.T_TIME_PERIODS, time_periods, digits)   #UNIT: NOK/Tkm
+    new_data.E_EMISSIONS_NORMALIZED = interpolate_dict(orig_data.E_EMISSIONS_NORMALIZED, MFP, orig_data.T_TIME_PERIODS, time_periods, digits)       #UNIT:  gCO2/T
+
+    # everything with index (i,j,m,r,f,p,t) or (i,j,m,r,f,p,t,s), stored as IndexedParameter
+    new_data.C_TRANSP_COST_BASE = interpolate_parameter(orig_data.C_TRANSP_COST_BASE, time_periods, digits)   #UNIT: NOK/T
+    new_data.C_TRANSP_COST = interpolate_parameter(orig_data.C_TRANSP_COST, time_periods, digits)             #UNIT: NOK/T
+    new_data.E_EMISSIONS = interpolate_parameter(orig_data.E_EMISSIONS, time_periods, digits)                 #UNIT:  gCO2/T
+    new_data.C_CO2 = interpolate_parameter(orig_data.C_CO2, time_periods, digits)                             #UNIT: nok/T
+
     # initialize R_TECH_READINESS_MATURITY at base path
+    new_data.R_TECH_READINESS_MATURITY = dict(orig_data.R_TECH_READINESS_MATURITY)
     for s in new_data.S_SCENARIOS:
         for (m,f) in new_data.tech_is_mature:
             if new_data.tech_is_mature[(m,f)]:
@@ -255,16 +138,12 @@ def interpolate(orig_data, time_periods, num_first_stage_periods):
     new_data.MFT_INIT_TRANSP_SHARE = []
     for m in new_data.M_MODES:
         for f in new_data.FM_FUEL[m]:
-            new_data.Q_SHARE_INIT_MAX[(m,f,new_data.T_TIME_PERIODS[0])] = orig_data.Q_SHARE_INIT_MAX[(m,f,orig_data.T_TIME_PERIODS[0])]
             new_data.Q_SHARE_INIT_MAX[(m,f,new_data.T_TIME_PERIODS[0])] = orig_data.Q_SHARE_INIT_MAX[(m,f,orig_data.T_TIME_PERIODS[0])]
             new_data.MFT_INIT_TRANSP_SHARE.append((m,f,new_data.T_TIME_PERIODS[0]))
 
 
-
-    # TODO: SOME ROUNDING?
-
-
     # UPDATE COMBINED SETS
+    new_data.invalidate_sets()  # the sets depend on the interpolated data
     new_data.combined_sets()
 
     return new_data
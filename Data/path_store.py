@@ -0,0 +1,125 @@
+"""
+Compact binary store for (generated) paths
+
+A path store is a directory of .npy files, so every array can be memory-mapped:
+- nodes.npy, modes.npy           names of the nodes and modes (the node and mode ids are positions in these arrays)
+- arcs.npy                       arc table (from node, to node, mode, route, distance), the arc ids are positions in this table
+- offsets.npy, path_arcs.npy     the arcs of path k are path_arcs[offsets[k]:offsets[k+1]] (CSR)
+- info.npy                       per path: origin, destination, first and last mode, number of transfers and length
+- transfer_offsets.npy, transfer_nodes.npy, transfer_modes.npy
+                                 the transfers of path k (CSR): node of the transfer and the mode after it
+- ids.npy (optional)             path ids: path k has id ids[k] (if there is no ids.npy, the id of path k is k)
+
+The paths are read back as tuples of (i,j,m,r) arcs, exactly as they were saved.
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+ARC_DTYPE = np.dtype([("from", np.int32), ("to", np.int32), ("mode", np.int16), ("route", np.int32), ("distance", np.float64)])
+INFO_DTYPE = np.dtype([("origin", np.int32), ("destination", np.int32), ("first_mode", np.int16), ("last_mode", np.int16),
+                       ("num_transfers", np.int16), ("length", np.float64)])
+STORE_ARRAYS = ("nodes", "modes", "arcs", "offsets", "path_arcs", "info", "transfer_offsets", "transfer_nodes", "transfer_modes")
+
+
+def save_path_store(directory, paths, nodes, modes, distances, ids=None):
+    # paths: list of tuples of (i,j,m,r) arcs, distances: {(i,j,m,r): distance} (nan for arcs without a distance)
+    # ids: the path ids (see ids.npy), None if path k has id k
+    nodes = list(dict.fromkeys(list(nodes) + [n for path in paths for a in path for n in a[:2]]))
+    modes = list(dict.fromkeys(list(modes) + [a[2] for path in paths for a in path]))
+    node_nr = {n: nr for nr, n in enumerate(nodes)}
+    mode_nr = {m: nr for nr, m in enumerate(modes)}
+    arc_list = list(dict.fromkeys(a for path in paths for a in path))
+    arc_nr = {a: nr for nr, a in enumerate(arc_list)}
+    arcs = np.array([(node_nr[i], node_nr[j], mode_nr[m], r, distances.get((i,j,m,r), np.nan)) for (i,j,m,r) in arc_list], dtype=ARC_DTYPE)
+
+    offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(path) for path in paths])
+    path_arcs = np.array([arc_nr[a] for path in paths for a in path], dtype=np.int32)
+    info = np.zeros(len(paths), dtype=INFO_DTYPE)
+    transfers = []
+    for k, path in enumerate(paths):
+        path_transfers = [(node_nr[path[n][1]], mode_nr[path[n+1][2]]) for n in range(len(path)-1) if path[n][2] != path[n+1][2]]
+        transfers.append(path_transfers)
+        info[k] = (node_nr[path[0][0]], node_nr[path[-1][1]], mode_nr[path[0][2]], mode_nr[path[-1][2]],
+                   len(path_transfers), arcs["distance"][[arc_nr[a] for a in path]].sum())
+    transfer_offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+    transfer_offsets[1:] = np.cumsum([len(path_transfers) for path_transfers in transfers])
+    transfer_nodes = np.array([i for path_transfers in transfers for (i, m) in path_transfers], dtype=np.int32)
+    transfer_modes = np.array([m for path_transfers in transfers for (i, m) in path_transfers], dtype=np.int16)
+
+    #write to a temporary directory first, such that an interrupted write does not leave an incomplete store
+    temp_directory = directory + ".tmp"
+    if os.path.exists(temp_directory):
+        shutil.rmtree(temp_directory)
+    os.makedirs(temp_directory)
+    arrays = dict(nodes=np.array(nodes, dtype=str), modes=np.array(modes, dtype=str), arcs=arcs, offsets=offsets, path_arcs=path_arcs,
+                  info=info, transfer_offsets=transfer_offsets, transfer_nodes=transfer_nodes, transfer_modes=transfer_modes)
+    for name in STORE_ARRAYS:
+        np.save(os.path.join(temp_directory, name + ".npy"), arrays[name], allow_pickle=False)
+    if ids is not None:
+        np.save(os.path.join(temp_directory, "ids.npy"), np.array(ids, dtype=np.int64), allow_pickle=False)
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.replace(temp_directory, directory)
+
+def run_path_store(run_identifier):
+    # path store with the paths of a model run, next to its results (Data/Output/<run_identifier>_results.pickle)
+    return os.path.join("Data", "Output", run_identifier + "_paths")
+
+def path_store_exists(directory):
+    return all(os.path.exists(os.path.join(directory, name + ".npy")) for name in STORE_ARRAYS)
+
+
+class PathStore():
+    # read access to a path store, the arrays are memory-mapped (mmap_mode=None loads them into memory)
+
+    def __init__(self, directory, mmap_mode="r"):
+        self.directory = directory
+        for name in STORE_ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode, allow_pickle=False))
+        self.node_names = self.nodes.tolist()
+        self.mode_names = self.modes.tolist()
+        self.arc_tuples = [(self.node_names[i], self.node_names[j], self.mode_names[m], r)
+                           for (i, j, m, r) in zip(*(self.arcs[field].tolist() for field in ("from", "to", "mode", "route")))]
+        if os.path.exists(os.path.join(directory, "ids.npy")):
+            self.ids = np.load(os.path.join(directory, "ids.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+        else:
+            self.ids = np.arange(len(self))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def arc_ids(self, k):
+        return self.path_arcs[self.offsets[k]:self.offsets[k+1]]
+
+    def path(self, k):
+        return tuple(self.arc_tuples[a] for a in self.arc_ids(k).tolist())
+
+    def paths(self):
+        arc_ids = self.path_arcs.tolist()
+        offsets = self.offsets.tolist()
+        return [tuple(self.arc_tuples[a] for a in arc_ids[offsets[k]:offsets[k+1]]) for k in range(len(self))]
+
+    def leg_modes(self, k):
+        # modes of the legs of path k, e.g. ("Road", "Rail")
+        transfer_modes = self.transfer_modes[self.transfer_offsets[k]:self.transfer_offsets[k+1]].tolist()
+        return tuple(self.mode_names[m] for m in [int(self.info["first_mode"][k])] + transfer_modes)
+
+    def transfer_node_names(self, k):
+        return tuple(self.node_names[i] for i in self.transfer_nodes[self.transfer_offsets[k]:self.transfer_offsets[k+1]].tolist())
+
+    def frame(self):
+        # one row per path (index: path id) with the metadata and the arcs of the path (column "paths")
+        info = self.info
+        return pd.DataFrame({"origin": [self.node_names[i] for i in info["origin"].tolist()],
+                             "destination": [self.node_names[i] for i in info["destination"].tolist()],
+                             "modes": [self.leg_modes(k) for k in range(len(self))],
+                             "transfer_nodes": [self.transfer_node_names(k) for k in range(len(self))],
+                             "num_transfers": info["num_transfers"],
+                             "length": info["length"],
+                             "paths": [list(path) for path in self.paths()]}, index=np.asarray(self.ids))
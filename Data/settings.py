@@ -17,6 +17,11 @@ SCALING_FACTOR_EMISSIONS = 10**8 #if smaller, then the CO2_FEE disappears, needs
 # Data settings (ConstructData.py)
 
 EXCHANGE_RATE_EURO_TO_NOK = 10
+
+#input cache (parsed excel/csv sheets, keyed on the content hash of the source file)
+INPUT_CACHE = True
+INPUT_CACHE_DIR = "Data/Cache"
+
 RISK_FREE_RATE = 0.038 # social discount rate, ref Ruben (Old:  https://tradingeconomics.com/norway/government-bond-yield  -> 3.2%)
 NO_DRY_BULK = False
 NO_LIQUID_BULK = True
@@ -24,6 +29,21 @@ NO_LIQUID_BULK = True
 #path generation
 NUM_MODE_PATHS = 2  #hvor mange modes kan bli brukt på en path? 
 # single mode paths can lead to infeasibilities in the model (the flow/demand constraint). Some demand requests are then not feasible.
+PATH_GENERATION_WORKERS = 1 #number of processes for the path generation (1: no parallelization)
+PATH_CACHE_DIR = "Data/SPATIAL/Paths"   #generated paths, one path store per combination of path generation inputs (see construct_path_generation)
+PATH_INCREMENTAL = True  #when only the network changed, update the most recent paths in PATH_CACHE_DIR: only the shortest paths that can be affected by the changed arcs are computed again, the other paths keep their id
+PATH_INCREMENTAL_CHECK = False  #also do a full path generation after an incremental update, and raise an error if the paths differ (slow, for testing)
+#remove the paths that are dominated by another path with the same modes (see TransportSets.prune_dominated_paths)
+#this ignores the arc and terminal capacities, so it can remove paths that are needed when the network is congested
+PATH_PRUNING = False
+PATH_PRUNING_TOLERANCE = 0  #relative cost difference: 0.01 also removes paths that are at most 1% cheaper than a shorter path (faster, not optimal)
+
+#column generation for the paths (see TranspModel.solve_column_generation): start from the shortest path per OD pair and mode combination,
+#and add paths with a negative reduced cost in the LP relaxation, with at most COLUMN_GENERATION_MODE_PATHS modes (also more than NUM_MODE_PATHS)
+COLUMN_GENERATION = False
+COLUMN_GENERATION_MODE_PATHS = 3
+COLUMN_GENERATION_MAX_ITERATIONS = 50
+COLUMN_GENERATION_TOLERANCE = 10**(-6)  #minimum (negative) reduced cost of a new path
 
 NUM_DIGITS_PRECISION = 5 #for the rounding in data generation
 
@@ -38,6 +58,13 @@ EMPTY_VEHICLE_FACTOR = 0.6
 NO_INVESTMENTS = False
 MIPGAP = 0.002 # fraction, multiply with 100 to get percentage (0.5%)
 
+#solver (see Solvers.py): "gurobi" or "highs" (open source)
+SOLVER = "gurobi"
+SOLVER_THREADS = 0   #0: automatic. With more than one thread, HiGHS uses its parallel dual simplex
+#persistent solver (see TranspModel.solve_model): the model is kept in the solver between solves, and changes in the model
+#(fixed/unfixed variables, bounds) are passed to it instead of writing the whole model to a file again
+PERSISTENT_SOLVER = False
+
 #discount rate
 RHO_STAR = 0.975  #implied rho of around 20% over 5 years
 
@@ -4,7 +4,8 @@ import numpy as np
 # Q: What is the name of the function?
 def sigmoid(t, start_value, end_value, t_start, t_end, mid, a, k):
     # check for errors in input
-    if(not (t >= t_start and t <= t_end and mid >= 0 and a > 0 and a < 1 and k > 0 and k < 1)):
+    # (works elementwise on numpy arrays as well)
+    if(not np.all((t >= t_start) & (t <= t_end) & (mid >= 0) & (a > 0) & (a < 1) & (k > 0) & (k < 1))):
         raise Exception("Incorrect sigmoid input")
     sig_fraction = 1 + (0 - 1)*((1/(1+np.exp(-k*(t - t_start - mid)))**a))  # starts at 1, goes to zero
     return sig_fraction*start_value + (1-sig_fraction)*end_value
@@ -87,7 +87,7 @@ class OutputData():
                                     a_series = pd.Series([variable,i,j,m,r,f,v,t,weight, scen_name], index=b_flow.columns)
                                     b_flow = pd.concat([b_flow, a_series.to_frame().T],axis=0, ignore_index=True)
             variable = 'h_path'
-            for kk in base_data.K_PATHS:
+            for kk in (base_data.K_PATHS if hasattr(modell,'h_path') else []):   #no paths in the node-arc formulation
                 #k = K_PATH_DICT[kk]
                 for t in base_data.T_TIME_PERIODS:
                     for p in base_data.P_PRODUCTS:
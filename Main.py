@@ -22,6 +22,7 @@ from ExtractResults import OutputData
 from Data.ConstructData import TransportSets, get_scen_sheet_name
 from Data.settings import *
 from Data.interpolate import interpolate
+from Data.path_store import run_path_store
 from VisualizeResults import visualize_results
 from ExtractModel import ModelExtractor
 
@@ -48,6 +49,8 @@ analysis_type = "SP" #,   'EEV' , 'SP'         , expectation of expected value p
 co2_fee = "base" #"high, low", "base", "intermediate"
 emission_cap_constraint = True   #False or True
 wrm_strt = False  #use EEV as warm start for SP
+formulation = "path"  # "path" or "node_arc" (commodity flows per destination and product, no path generation)
+solver = SOLVER  # "gurobi" or "highs" (open source), see Solvers.py
 
 store_solved_model = False
 
@@ -94,13 +97,14 @@ def solve_init_model(base_data, risk_info,emission_cap_constraint):
     
     print("Solving the first time period for initialization purposes...")
             
-    #update data
-    time_periods = base_data.T_TIME_PERIODS
-    base_data.T_TIME_PERIODS = [time_periods[0]]
-    base_data.combined_sets()
+    #restrict the data to the first time period (read-only view, base_data itself is not changed)
+    init_data = base_data.view(time_periods=[base_data.T_TIME_PERIODS[0]],
+                               single_time_period=base_data.single_time_period)
     
     #
-    model_instance_init = TranspModel(data=base_data, risk_info=risk_info)
+    model_instance_init = TranspModel(data=init_data, risk_info=risk_info)
+    model_instance_init.formulation = formulation
+    model_instance_init.solver = solver
     model_instance_init.emission_cap_constraint = emission_cap_constraint #does not really matter if the first year is 100%
     model_instance_init.construct_model()
     model_instance_init.solve_model(FeasTol=10**(-4),  #typically 10**(-6)
@@ -108,10 +112,6 @@ def solve_init_model(base_data, risk_info,emission_cap_constraint):
                         #Method=-1,  
                         )
 
-    #data back to normal        
-    base_data.T_TIME_PERIODS = time_periods
-    base_data.combined_sets()
-
     return model_instance_init
 
 def construct_and_solve_model(base_data,
@@ -127,7 +127,13 @@ def construct_and_solve_model(base_data,
     print(f"Constructing full {analysis_type} model...")
 
     start = time.time()
-    model_instance = TranspModel(data=base_data, risk_info=risk_info)
+    data = base_data
+    if COLUMN_GENERATION and formulation == "path":   #start from a small set of paths, the other paths are generated while solving
+        #on a copy with these paths (base_data itself is not changed, e.g. the EEV model is built on all paths)
+        data = base_data.copy_with_paths(base_data.shortest_path_per_mode_combination())
+    model_instance = TranspModel(data=data, risk_info=risk_info)
+    model_instance.formulation = formulation
+    model_instance.solver = solver
     model_instance.NoBalancingTrips = NoBalancingTrips
     model_instance.single_time_period = single_time_period
     model_instance.emission_cap_constraint = emission_cap_constraint
@@ -142,10 +148,13 @@ def construct_and_solve_model(base_data,
 
     print("Solving model...",flush=True)
     start = time.time()
-    model_instance.solve_model(FeasTol=FeasTol, #10**(-2),
-                               #num_focus=1,
-                               #Method=-1,  
-                               ) 
+    if COLUMN_GENERATION and formulation == "path":
+        model_instance.solve_column_generation(FeasTol=FeasTol)
+    else:
+        model_instance.solve_model(FeasTol=FeasTol, #10**(-2),
+                                   #num_focus=1,
+                                   #Method=-1,  
+                                   ) 
     print("Done solving model.",flush=True)
     print("Time used solving the model:", time.time() - start,flush=True)
     print("----------", end="", flush=True)
@@ -174,7 +183,7 @@ def construct_and_solve_SP(base_data,
                                 risk_info, single_time_period,NoBalancingTrips,emission_cap_constraint,
                                 FeasTol=10**-2)
     
-    return model_instance,base_data
+    return model_instance,model_instance.data   #with column generation, the data has the generated paths
 
 def construct_and_solve_EEV(base_data,risk_info,emission_cap_constraint=False):
 
@@ -183,18 +192,17 @@ def construct_and_solve_EEV(base_data,risk_info,emission_cap_constraint=False):
         ###  #2: solve EV        ###
         ############################
     
-    #base_data.S_SCENARIOS = ['BBB']
-    base_data.S_SCENARIOS = ['BB']
-    base_data.combined_sets()
+    #ev_data = base_data.view(scenarios=['BBB'])
+    ev_data = base_data.view(scenarios=['BB'])  #read-only view, base_data itself is not changed
 
     
     # ------ CONSTRUCT and SOLVE INIT MODEL ----------#
 
-    model_instance_init = solve_init_model(base_data, risk_info,emission_cap_constraint)
+    model_instance_init = solve_init_model(ev_data, risk_info,emission_cap_constraint)
     
     # ------ CONSTRUCT MODEL ----------#
 
-    model_instance_EV = construct_and_solve_model(base_data,
+    model_instance_EV = construct_and_solve_model(ev_data,
                                 model_instance_init,
                                 "EV",
                                 risk_info, emission_cap_constraint,
@@ -204,20 +212,18 @@ def construct_and_solve_EEV(base_data,risk_info,emission_cap_constraint=False):
 
     file_string = "EV_" + scenario_tree
     
-    output = OutputData(model_instance_EV.model,base_data)
+    output = OutputData(model_instance_EV.model,model_instance_EV.data)
 
     with open(r"Data//output//" + file_string+'.pickle', 'wb') as output_file: 
         print("Dumping EV output in pickle file.....", end="",flush=True)
         pickle.dump(output, output_file)
         print("done.",flush=True)
+    model_instance_EV.data.save_paths(run_path_store(file_string))   #the paths of the EV results
     
 
         ############################
         ###  #3: solve EEV       ###
         ############################
-    
-    base_data.S_SCENARIOS = base_data.S_SCENARIOS_ALL
-    base_data.combined_sets()
 
     # ------ CONSTRUCT MODEL ----------#
 
@@ -225,6 +231,8 @@ def construct_and_solve_EEV(base_data,risk_info,emission_cap_constraint=False):
 
     start = time.time()
     model_instance = TranspModel(data=base_data, risk_info=risk_info)
+    model_instance.formulation = formulation
+    model_instance.solver = solver
     model_instance.construct_model()
     model_instance.fix_variables_first_stage(model_instance_EV.model)
     
@@ -270,6 +278,8 @@ def construct_and_solve_SP_warm_start(base_data,
 def generate_base_data(scenario_tree,co2_fee="base",READ_FROM_FILE=False):
     
     identifier = scenario_tree+"_carbontax"+co2_fee+"_basedata"
+    if formulation == "node_arc":
+        identifier = identifier + "_nodearc"   #without paths
     
     if READ_FROM_FILE:
         with open(r'Data//Output//'+identifier+'.pickle', 'rb') as data_file: 
@@ -281,7 +291,8 @@ def generate_base_data(scenario_tree,co2_fee="base",READ_FROM_FILE=False):
         
         print("Reading data...", flush=True)
         start = time.time()
-        base_data = TransportSets(sheet_name_scenarios=sheet_name_scenarios,co2_fee=co2_fee)                                # how many of the periods above are in first stage
+        base_data = TransportSets(sheet_name_scenarios=sheet_name_scenarios,co2_fee=co2_fee,
+                                  generate_paths=(formulation == "path"))                                # how many of the periods above are in first stage
         base_data = interpolate(base_data, time_periods, num_first_stage_periods)
         print("Done reading data.", flush=True)
         print("Time used reading the base data:", time.time() - start,flush=True)
@@ -376,6 +387,7 @@ def main(scenario_tree,
         print("Dumping results in pickle file.....", end="")
         pickle.dump(output, output_file)
         print("done.")
+    base_data.save_paths(run_path_store(run_identifier2))   #the paths of the results (see VisualizeResults)
         
     #  --------- STORE SOLVED MODEL ---------    #
         
@@ -0,0 +1,944 @@
+# -*- coding: utf-8 -*-
+"""
+Matrix-based model builder
+
+Builds the same LP/MIP as TranspModel.construct_model (path formulation), but directly as a sparse coefficient matrix,
+without Pyomo expressions. The large constraint blocks (costs, emissions, flow, path-arc, fleet balance, terminal capacity,
+non-anticipativity) are assembled with numpy from integer codes of the index sets and the parameter arrays; the small
+ones are written as rules, like in TranspModel. The model is passed to HiGHS in one call (solve_model).
+
+Variables and constraints have the same names and (flattened) indices as in TranspModel, and verify() checks the
+matrix row for row against a constructed TranspModel (use a small instance, see the bottom of this file).
+
+The model can also be written to a (compressed) MPS file for other solvers (write_mps, read_solution), and saved
+to be solved again later (save, load).
+"""
+
+import gzip
+import pickle
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from Data.IndexedParameter import FactoredParameter
+from Data.settings import *
+from Solvers import solver_options
+
+
+def flatten(key):
+    # index as Pyomo flattens it: nested tuples are flattened, a scalar index becomes a 1-tuple, None (no index) becomes ()
+    if type(key) is not tuple:
+        return () if key is None else (key,)
+    if not any(type(k) is tuple for k in key):
+        return key
+    return sum((flatten(k) for k in key), ())
+
+def parameter_values(param, **labels):
+    # param[...] for all combinations of labels, with the same rounding as param[key]. labels: {axis name: (labels, shape)},
+    # the codes of the labels are reshaped to shape and broadcast against the other axes
+    codes = []
+    for (name, axis_labels, width), axis_codes in zip(param.axes, param.axis_codes):
+        (values, shape) = labels[name]
+        codes.append(np.array([axis_codes[label] for label in values], dtype=np.int64).reshape(shape))
+    if isinstance(param, FactoredParameter):
+        values = param.values(*codes)     #only the needed values (the full array is scenario-dense)
+    else:
+        values = param.array[tuple(codes)]
+    if np.isnan(values).any():
+        raise KeyError("parameter is not defined for all indices of the constraint")
+    return values
+
+
+class MatrixModel:
+
+    def __init__(self, data, risk_info):
+
+        self.data = data
+        self.risk_info = risk_info
+
+        self.single_time_period = None
+        self.emission_cap_constraint = False
+        self.NoBalancingTrips = False
+
+        self.num_cols = 0
+        self.num_rows = 0
+        self.column_blocks = {}     #name: (first column, index set, dense shape)
+        self.row_blocks = {}        #name: (first row, number of rows, function returning the (flat) row indices)
+        self._column_index = {}
+
+        self.col_lower = []
+        self.col_upper = []
+        self.col_integer = []
+        self.row_lower = []
+        self.row_upper = []
+        self.entry_rows = []
+        self.entry_cols = []
+        self.entry_values = []
+        self.objective_cols = []
+        self.objective_values = []
+
+        self.matrix = None          #scipy.sparse.csc_matrix, after construct_model
+        self.solution = None
+
+    #-----------------------------------------------#
+
+    # BUILDING BLOCKS
+
+    def add_variables(self, name, index, lower=0, upper=np.inf, integer=False, shape=None):
+        # columns for all elements of index. shape: dense layout of index (e.g. (|AF|,|P|,|T|,|S|) for x_flow), such that
+        # self.cols(name, ...) can compute the columns from integer codes
+        n = len(index)
+        if shape is None:
+            shape = (n // max(len(self.data.S_SCENARIOS), 1), len(self.data.S_SCENARIOS))   #index = base set x S_SCENARIOS
+        if int(np.prod(shape)) != n:
+            raise ValueError(f"shape {shape} does not match the {n} indices of {name}")
+        self.column_blocks[name] = (self.num_cols, index, shape)
+        self.col_lower.append(np.full(n, lower, dtype=float))
+        self.col_upper.append(np.full(n, upper, dtype=float))
+        self.col_integer.append(np.full(n, integer, dtype=bool))
+        self.num_cols += n
+
+    def cols(self, name, *codes):
+        # columns of variable name for broadcastable integer codes along its dense shape
+        first, index, shape = self.column_blocks[name]
+        return first + np.ravel_multi_index(np.broadcast_arrays(*codes), shape)
+
+    def column_index(self, name):
+        # {flat index: column}, built on first use
+        if name not in self._column_index:
+            first, index, shape = self.column_blocks[name]
+            self._column_index[name] = {flatten(key): first + n for n, key in enumerate(index)}
+        return self._column_index[name]
+
+    def fix_variables(self, name, value=0):
+        block = list(self.column_blocks).index(name)
+        self.col_lower[block][:] = value
+        self.col_upper[block][:] = value
+
+    def add_rows(self, name, keys, n, terms, lower, upper, mask=None):
+        # rows 0..n-1 of constraint name. keys: function returning the n row indices, terms: list of (rows, cols, values)
+        # (broadcastable arrays). Rows without (non-zero) coefficients are left out, as are the rows where mask is False.
+        entries = [np.broadcast_arrays(rows, cols, values) for (rows, cols, values) in terms]
+        rows = np.concatenate([r.ravel() for (r, c, v) in entries] + [np.zeros(0, dtype=np.int64)]).astype(np.int64)
+        cols = np.concatenate([c.ravel() for (r, c, v) in entries] + [np.zeros(0, dtype=np.int64)]).astype(np.int64)
+        values = np.concatenate([np.asarray(v, dtype=float).ravel() for (r, c, v) in entries] + [np.zeros(0)])
+        nonzero = values != 0
+        present = np.zeros(n, dtype=bool)
+        present[rows[nonzero]] = True
+        if mask is not None:
+            present &= mask
+        new_rows = np.cumsum(present) - 1
+        keep = nonzero & present[rows]
+        self.entry_rows.append(self.num_rows + new_rows[rows[keep]])
+        self.entry_cols.append(cols[keep])
+        self.entry_values.append(values[keep])
+        self.row_lower.append(np.broadcast_to(np.asarray(lower, dtype=float), (n,))[present])
+        self.row_upper.append(np.broadcast_to(np.asarray(upper, dtype=float), (n,))[present])
+        count = int(present.sum())
+        self.row_blocks[name] = (self.num_rows, count, lambda: [flatten(key) for key, p in zip(keys(), present) if p])
+        self.num_rows += count
+
+    def add_rule_rows(self, name, index, rule):
+        # rows written as a rule, like a Pyomo constraint rule: rule(*index) returns None (skip) or (terms, lower, upper)
+        # with terms a list of (column, coefficient)
+        keys, rows, cols, values, lower, upper = [], [], [], [], [], []
+        for key in index:
+            result = rule(*flatten(key))
+            if result is None:
+                continue
+            terms, lb, ub = result
+            for (col, value) in terms:
+                rows.append(len(keys))
+                cols.append(col)
+                values.append(value)
+            keys.append(key)
+            lower.append(-np.inf if lb is None else lb)
+            upper.append(np.inf if ub is None else ub)
+        self.add_rows(name, lambda: keys, len(keys), [(np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64), np.array(values, dtype=float))],
+                      np.array(lower, dtype=float), np.array(upper, dtype=float))
+
+    def add_objective(self, cols, values):
+        cols, values = np.broadcast_arrays(cols, values)
+        self.objective_cols.append(cols.ravel())
+        self.objective_values.append(np.asarray(values, dtype=float).ravel())
+
+    #-----------------------------------------------#
+
+    # MODEL
+
+    def construct_model(self, risk_neutral=False):
+
+        start = time.time()
+        data = self.data
+
+        #integer codes of the index sets. The _S sets are the base set x S_SCENARIOS (scenario innermost), and AFPT, AFVT,
+        #KPT, KVT, ... are nested loops in the order of their name, which gives the dense shapes below
+        self.S = data.S_SCENARIOS
+        self.T = data.T_TIME_PERIODS
+        self.P = data.P_PRODUCTS
+        self.A = data.A_ARCS
+        self.K = data.K_PATHS
+        self.V = data.V_VEHICLE_TYPES
+        nS, nT, nP, nA, nK, nV = len(self.S), len(self.T), len(self.P), len(self.A), len(self.K), len(self.V)
+        self.t_code = {t: n for n, t in enumerate(self.T)}
+        self.p_code = {p: n for n, p in enumerate(self.P)}
+        self.a_code = {a: n for n, a in enumerate(self.A)}
+        self.k_code = {k: n for n, k in enumerate(self.K)}
+        self.v_code = {v: n for n, v in enumerate(self.V)}
+        self.T_OP = data.T_TIME_PERIODS_OPERATIONAL
+        self.t_op = np.array([self.t_code[t] for t in self.T_OP], dtype=np.int64)
+        self.AF = [(a, f) for a in self.A for f in data.FM_FUEL[a[2]]]
+        self.af_code = {af: n for n, af in enumerate(self.AF)}
+        self.af_arc = np.array([self.a_code[a] for (a, f) in self.AF], dtype=np.int64)
+        self.AFV = [(a, f, v) for a in self.A for f in data.FM_FUEL[a[2]] for v in data.VEHICLE_TYPES_M[a[2]]]
+        self.afv_code = {afv: n for n, afv in enumerate(self.AFV)}
+        self.afv_af = np.array([self.af_code[(a, f)] for (a, f, v) in self.AFV], dtype=np.int64)
+        self.MF = [(m, f) for m in data.M_MODES for f in data.FM_FUEL[m]]
+
+        "VARIABLES"
+
+        self.add_variables("x_flow", data.AFPT_S, shape=(len(self.AF), nP, nT, nS))
+        self.add_variables("b_flow", data.AFVT_S, shape=(len(self.AFV), nT, nS))
+        self.add_variables("h_path", data.KPT_S, shape=(nK, nP, nT, nS))
+        self.add_variables("h_path_balancing", data.KVT_S, shape=(nK, nV, nT, nS))
+        if self.NoBalancingTrips:
+            self.fix_variables("b_flow", 0)
+            self.fix_variables("h_path_balancing", 0)
+        self.add_variables("StageCosts", data.T_TIME_PERIODS_S, shape=(nT, nS))
+        self.add_variables("epsilon_edge", data.ET_INV_S, upper=1, integer=True)
+        self.add_variables("upsilon_upg", data.UT_UPG_S, upper=1, integer=True)
+        self.add_variables("nu_node", data.NM_CAP_INCR_T_S, upper=1)
+        self.add_variables("y_charge", data.EFT_CHARGE_S)
+        self.add_variables("q_transp_amount", data.MFT_S, shape=(len(self.MF), nT, nS))
+        self.add_variables("q_transp_delta", data.MFT_MIN0_S)
+        self.add_variables("q_aux_transp_amount", data.MFT_NEW_YEARLY_S)
+        self.add_variables("q_mode_total_transp_amount", data.MT_S)
+        self.add_variables("total_emissions", data.T_TIME_PERIODS_S, shape=(nT, nS))
+        self.add_variables("emissions_penalty", data.T_TIME_PERIODS_S, shape=(nT, nS))
+        self.cost_variables = ["TranspOpexCost", "TranspCO2Cost", "CO2_PENALTY", "TranspOpexCostB", "TranspCO2CostB", "TranspTimeCost",
+                               "TransfCost", "EdgeCost", "NodeCost", "UpgCost", "ChargeCost", "FillingCost"]
+        for name in self.cost_variables:
+            self.add_variables(name, data.T_TIME_PERIODS_S, shape=(nT, nS))
+        self.add_variables("CvarAux", [None], lower=-np.inf, shape=(1,))
+        self.add_variables("CvarPosPart", self.S, shape=(nS,))
+        self.add_variables("FirstStageCosts", self.S, lower=-np.inf, shape=(nS,))
+        self.add_variables("SecondStageCosts", self.S, lower=-np.inf, shape=(nS,))
+        if NO_INVESTMENTS:
+            for name in ["epsilon_edge", "upsilon_upg", "nu_node"]:
+                self.fix_variables(name, 0)
+
+        self.construct_costs()
+        self.construct_objective(risk_neutral)
+
+        "CONSTRAINTS"
+
+        self.construct_flow()
+        self.construct_emissions()
+        self.construct_capacity()
+        self.construct_transport_amount()
+        if len(self.S) > 1:
+            self.construct_nonanticipativity()
+
+        self.matrix = sp.coo_matrix((np.concatenate(self.entry_values), (np.concatenate(self.entry_rows), np.concatenate(self.entry_cols))),
+                                    shape=(self.num_rows, self.num_cols)).tocsc()   #duplicate entries are summed
+        self.matrix.eliminate_zeros()
+        self.cost = np.zeros(self.num_cols)
+        np.add.at(self.cost, np.concatenate(self.objective_cols), np.concatenate(self.objective_values))
+        print(f"Matrix model: {self.num_cols} variables, {self.num_rows} constraints, {self.matrix.nnz} nonzeros")
+        print("Time used constructing the matrix model:", round(time.time() - start, 2), flush=True)
+        return self.matrix
+
+    def ts_rows(self):
+        # rows (t,s) of a constraint over T_TIME_PERIODS_S
+        return np.arange(len(self.T))[:, None], np.arange(len(self.S))[None, :]
+
+    def construct_costs(self):
+        data = self.data
+        nT, nS = len(self.T), len(self.S)
+        t, s = self.ts_rows()
+        rows_ts = t*nS + s
+        ts_keys = lambda: data.T_TIME_PERIODS_S
+
+        #codes of x_flow (af,p,t,s) and b_flow (afv,t,s)
+        af = np.arange(len(self.AF))[:, None, None, None]
+        p4 = np.arange(len(self.P))[None, :, None, None]
+        t4 = np.arange(nT)[None, None, :, None]
+        s4 = np.arange(nS)[None, None, None, :]
+        afv = np.arange(len(self.AFV))[:, None, None]
+        t3 = np.arange(nT)[None, :, None]
+        s3 = np.arange(nS)[None, None, :]
+        x_cols = self.cols("x_flow", af, p4, t4, s4)
+        b_cols = self.cols("b_flow", afv, t3, s3)
+        x_rows = t4*nS + s4
+        b_rows = t3*nS + s3
+        b_product = [[data.cheapest_product_per_vehicle[(a[2], f, tt, v)] for tt in self.T] for (a, f, v) in self.AFV]
+
+        x_labels = {"arc": ([a for (a, f) in self.AF], (-1, 1, 1, 1)), "fuel": ([f for (a, f) in self.AF], (-1, 1, 1, 1)),
+                    "product": (self.P, (1, -1, 1, 1)), "year": (self.T, (1, 1, -1, 1)), "scenario": (self.S, (1, 1, 1, -1))}
+        b_labels = {"arc": ([a for (a, f, v) in self.AFV], (-1, 1, 1)), "fuel": ([f for (a, f, v) in self.AFV], (-1, 1, 1)),
+                    "product": ([p for products in b_product for p in products], (-1, nT, 1)), "year": (self.T, (1, -1, 1)),
+                    "scenario": (self.S, (1, 1, -1))}
+        parameter_x = lambda param: parameter_values(param, **x_labels)
+        parameter_b = lambda param: parameter_values(param, **b_labels)
+
+        #shapes (af,p,t,s) and (afv,t,s), with length 1 on the axes a parameter does not have (e.g. scenario for C_CO2)
+        self.C_x = parameter_x(data.C_TRANSP_COST)
+        self.C_CO2_x = parameter_x(data.C_CO2)
+        self.C_TIME_x = parameter_x(data.C_TIME_VALUE)
+        self.E_x = parameter_x(data.E_EMISSIONS)
+        self.C_b = EMPTY_VEHICLE_FACTOR*parameter_b(data.C_TRANSP_COST)
+        self.C_CO2_b = EMPTY_VEHICLE_FACTOR*parameter_b(data.C_CO2)
+        self.E_b = parameter_b(data.E_EMISSIONS)*EMPTY_VEHICLE_FACTOR
+
+        def cost_rows(name, terms):
+            # name[t,s] >= sum(terms) - FEAS_RELAX
+            own = (rows_ts, self.cols(name, t, s), 1)
+            self.add_rows(name + "Constr", ts_keys, nT*nS, [own] + [(r, c, -v) for (r, c, v) in terms], -FEAS_RELAX, np.inf)
+
+        cost_rows("TranspOpexCost", [(x_rows, x_cols, self.C_x)])
+        cost_rows("TranspCO2Cost", [(x_rows, x_cols, self.C_CO2_x)])
+        co2_fee_penalty = 10000 #NOK/tonneCO2
+        co2_fee_penalty_adj = co2_fee_penalty/(1000*1000)   #NOK/gCO2
+        co2_fee_penalty_adj = co2_fee_penalty_adj/SCALING_FACTOR_MONETARY*SCALING_FACTOR_EMISSIONS
+        own = (rows_ts, self.cols("CO2_PENALTY", t, s), 1)
+        self.add_rows("CO2PenaltyConstr", ts_keys, nT*nS, [own, (rows_ts, self.cols("emissions_penalty", t, s), -co2_fee_penalty_adj)], -FEAS_RELAX, np.inf)
+        cost_rows("TranspOpexCostB", [(b_rows, b_cols, self.C_b)])
+        cost_rows("TranspCO2CostB", [(b_rows, b_cols, self.C_CO2_b)])
+        cost_rows("TranspTimeCost", [(x_rows, x_cols, self.C_TIME_x)])
+
+        #transfer costs on the paths
+        transfer_paths = np.array([self.k_code[k] for k in data.PATHS_NO_UNIMODAL_ROAD], dtype=np.int64)
+        transfer_cost = np.array([[data.C_TRANSFER[(k, p)] + data.C_TRANSFER_TIME[(k, p)] for p in self.P] for k in data.PATHS_NO_UNIMODAL_ROAD]).reshape(-1, len(self.P))
+        h_cols = self.cols("h_path", transfer_paths[:, None, None, None], p4[0][None], t4[0][None], s4[0][None])
+        cost_rows("TransfCost", [((t4*nS + s4)[0][None], h_cols, transfer_cost[:, :, None, None])])
+
+        #investment and charging costs (few terms)
+        eps = self.column_index("epsilon_edge")
+        nu = self.column_index("nu_node")
+        upg = self.column_index("upsilon_upg")
+        y = self.column_index("y_charge")
+        ET_INV = set(data.ET_INV)
+        NM_CAP_INCR_T = set(data.NM_CAP_INCR_T)
+        UT_UPG = set(flatten(key) for key in data.UT_UPG)
+        small_costs = {"EdgeCost": lambda tt, ss: [(eps[e+(tt, ss)], data.C_EDGE_INV[e]) for e in data.E_EDGES_INV if e+(tt,) in ET_INV],
+                       "NodeCost": lambda tt, ss: [(nu[(i, m, tt, ss)], data.C_NODE_INV[(i, m)]) for (i, m) in data.NM_CAP_INCR if (i, m, tt) in NM_CAP_INCR_T],
+                       "UpgCost": lambda tt, ss: [(upg[e+(f, tt, ss)], data.C_EDGE_UPG[(e, f)]) for (e, f) in data.U_UPGRADE if e+(f, tt) in UT_UPG],
+                       "ChargeCost": lambda tt, ss: [(y[e+(f, tt, ss)], data.C_CHARGE[(e, f, tt)]) for (e, f) in data.EF_CHARGING if f == "Battery"],
+                       "FillingCost": lambda tt, ss: [(y[e+(f, tt, ss)], data.C_CHARGE[(e, f, tt)]) for (e, f) in data.EF_CHARGING if f == "Hydrogen"]}
+        for name, terms in small_costs.items():
+            own = self.column_index(name)
+            self.add_rule_rows(name + "Constr", data.T_TIME_PERIODS_S,
+                               lambda tt, ss, name=name, terms=terms, own=own: ([(own[(tt, ss)], 1)] + [(c, -v) for (c, v) in terms(tt, ss)], -FEAS_RELAX, None))
+
+        #stage costs
+        factor = np.array([round(sum(data.D_DISCOUNT_RATE**n for n in data.Y_YEARS[tt]), data.precision_digits) for tt in self.T])[:, None]
+        delta = np.array([round(data.D_DISCOUNT_RATE**data.Y_YEARS[tt][0], data.precision_digits) for tt in self.T])[:, None]
+        terms = [(rows_ts, self.cols("StageCosts", t, s), 1)]
+        for name in ["TranspOpexCost", "TranspCO2Cost", "CO2_PENALTY", "TranspOpexCostB", "TranspCO2CostB", "TranspTimeCost",
+                     "ChargeCost", "FillingCost", "TransfCost"]:
+            terms.append((rows_ts, self.cols(name, t, s), -factor))
+        for name in ["EdgeCost", "NodeCost", "UpgCost"]:
+            terms.append((rows_ts, self.cols(name, t, s), -delta))
+        self.add_rows("stage_costs", ts_keys, nT*nS, terms, -FEAS_RELAX, np.inf)
+
+        stage = self.column_index("StageCosts")
+        for (name, periods) in [("FirstStageCosts", data.T_TIME_FIRST_STAGE), ("SecondStageCosts", data.T_TIME_SECOND_STAGE)]:
+            own = self.column_index(name)
+            self.add_rule_rows(name + "Constr", self.S,
+                               lambda ss, own=own, periods=periods: ([(own[(ss,)], 1)] + [(stage[(tt, ss)], -1) for tt in self.T if tt in periods], -FEAS_RELAX, None))
+
+    def construct_objective(self, risk_neutral):
+        first = self.column_index("FirstStageCosts")
+        second = self.column_index("SecondStageCosts")
+        pos_part = self.column_index("CvarPosPart")
+        aux = self.column_index("CvarAux")[()]
+        n = len(self.S)
+        cvar_coeff = self.risk_info.cvar_coeff
+        cvar_alpha = self.risk_info.cvar_alpha
+
+        # CVaR positive part and lower bound on the auxiliary variable
+        self.add_rule_rows("CvarPosPartConstr", self.S, lambda s: ([(pos_part[(s,)], 1), (second[(s,)], -1), (aux, 1)], -FEAS_RELAX, None))
+        self.add_rule_rows("CvarAuxLBConstr", [None], lambda: ([(aux, 1)], 0.0, None))
+
+        for s in self.S:
+            if risk_neutral:
+                self.add_objective([first[(s,)], second[(s,)]], 1/n)
+            else:
+                self.add_objective([first[(s,)], aux, second[(s,)], pos_part[(s,)]],
+                                   [1/n, 1/n*cvar_coeff, 1/n*(1 - cvar_coeff), 1/n*cvar_coeff/(1 - cvar_alpha)])
+
+    def construct_flow(self):
+        data = self.data
+        nS, nP = len(self.S), len(self.P)
+        n_op = len(self.T_OP)
+        p = np.arange(nP)[None, :, None, None]
+        tl = np.arange(n_op)[None, None, :, None]
+        t = self.t_op[tl]
+        s = np.arange(nS)[None, None, None, :]
+
+        # DEMAND
+        ODP = data.ODP
+        od_pairs = [(q, self.k_code[k]) for q, (o, d, pp) in enumerate(ODP) for k in data.OD_PATHS[(o, d)]]
+        od_q = np.array([q for (q, k) in od_pairs], dtype=np.int64)[:, None, None]
+        od_k = np.array([k for (q, k) in od_pairs], dtype=np.int64)[:, None, None]
+        odp_product = np.array([self.p_code[pp] for (o, d, pp) in ODP], dtype=np.int64)
+        demand = np.array([[data.D_DEMAND[(o, d, pp, tt)] for tt in self.T_OP] for (o, d, pp) in ODP]).reshape(len(ODP), n_op)
+        rows = (od_q*n_op + tl[0])*nS + s[0]
+        cols = self.cols("h_path", od_k, odp_product[od_q], t[0], s[0])
+        self.add_rows("Flow", lambda: data.ODPTS_CONSTR_S, len(ODP)*n_op*nS, [(rows, cols, 1)],
+                      np.repeat((demand - FEAS_RELAX).ravel(), nS), np.inf, mask=np.repeat((demand >= ABSOLUTE_DEVIATION).ravel(), nS))
+
+        # PATHFLOW
+        arc = self.af_arc[:, None, None, None]
+        af = np.arange(len(self.AF))[:, None, None, None]
+        ka = [(self.a_code[a], self.k_code[k]) for a in self.A for k in data.KA_PATHS[a]]
+        ka_a = np.array([a for (a, k) in ka], dtype=np.int64)[:, None, None, None]
+        ka_k = np.array([k for (a, k) in ka], dtype=np.int64)[:, None, None, None]
+        self.add_rows("PathArcRel", lambda: data.APT_CONSTR_S, len(self.A)*nP*n_op*nS,
+                      [(((arc*nP + p)*n_op + tl)*nS + s, self.cols("x_flow", af, p, t, s), 1),
+                       (((ka_a*nP + p)*n_op + tl)*nS + s, self.cols("h_path", ka_k, p, t, s), -1)],
+                      -ABSOLUTE_DEVIATION, ABSOLUTE_DEVIATION)
+
+        if not self.NoBalancingTrips:
+            AV = [(a, v) for a in self.A for v in data.VEHICLE_TYPES_M[a[2]]]
+            av_code = {av: n for n, av in enumerate(AV)}
+            afv = np.arange(len(self.AFV))[:, None, None]
+            afv_av = np.array([av_code[(a, v)] for (a, f, v) in self.AFV], dtype=np.int64)[:, None, None]
+            kav = [(av_code[(a, v)], self.k_code[k], self.v_code[v]) for a in self.A for k in data.KA_PATHS_UNIMODAL[a] for v in data.VEHICLE_TYPES_M[a[2]]]
+            kav = np.array(kav, dtype=np.int64).reshape(-1, 3)
+            tl3 = tl[0]
+            s3 = s[0]
+            self.add_rows("PathArcRelBalance", lambda: data.AVT_CONSTR_S, len(AV)*n_op*nS,
+                          [((afv_av*n_op + tl3)*nS + s3, self.cols("b_flow", afv, self.t_op[tl3], s3), 1),
+                           ((kav[:, 0, None, None]*n_op + tl3)*nS + s3, self.cols("h_path_balancing", kav[:, 1, None, None], kav[:, 2, None, None], self.t_op[tl3], s3), -1)],
+                          -ABSOLUTE_DEVIATION, ABSOLUTE_DEVIATION)
+
+            # FLEET BALANCING
+            NMFV = [(n, m, f, v) for m in data.M_MODES for f in data.FM_FUEL[m] for n in data.NM_NODES[m] for v in data.VEHICLE_TYPES_M[m]]
+            x_terms = []    #(row, af, p, coefficient)
+            b_terms = []    #(row, afv, coefficient)
+            for q, (n, m, f, v) in enumerate(NMFV):
+                for (arcs, sign) in [(data.ANM_ARCS_IN[(n, m)], 1), (data.ANM_ARCS_OUT[(n, m)], -1)]:
+                    for a in arcs:
+                        for pp in data.PV_PRODUCTS[v]:
+                            x_terms.append((q, self.af_code[(a, f)], self.p_code[pp], sign))
+                        b_terms.append((q, self.afv_code[(a, f, v)], sign))
+            x_terms = np.array(x_terms, dtype=np.int64).reshape(-1, 4)
+            b_terms = np.array(b_terms, dtype=np.int64).reshape(-1, 3)
+            self.add_rows("FleetBalance1", lambda: data.NMFVT_CONSTR_S, len(NMFV)*n_op*nS,
+                          [((x_terms[:, 0, None, None]*n_op + tl3)*nS + s3, self.cols("x_flow", x_terms[:, 1, None, None], x_terms[:, 2, None, None], self.t_op[tl3], s3), x_terms[:, 3, None, None]),
+                           ((b_terms[:, 0, None, None]*n_op + tl3)*nS + s3, self.cols("b_flow", b_terms[:, 1, None, None], self.t_op[tl3], s3), b_terms[:, 2, None, None])],
+                          -ABSOLUTE_DEVIATION, ABSOLUTE_DEVIATION)
+
+    def construct_emissions(self):
+        data = self.data
+        nS = len(self.S)
+        n_op = len(self.T_OP)
+        tl = np.arange(n_op)[:, None]
+        s = np.arange(nS)[None, :]
+        rows = tl*nS + s
+        af = np.arange(len(self.AF))[:, None, None, None]
+        p = np.arange(len(self.P))[None, :, None, None]
+        afv = np.arange(len(self.AFV))[:, None, None]
+        self.add_rows("Emissions", lambda: data.TS_CONSTR_S, n_op*nS,
+                      [(rows, self.cols("total_emissions", self.t_op[tl], s), 1),
+                       (rows[None, None], self.cols("x_flow", af, p, self.t_op[tl][None, None], s[None, None]), -self.E_x[:, :, self.t_op]),
+                       (rows[None], self.cols("b_flow", afv, self.t_op[tl][None], s[None]), -self.E_b[:, self.t_op])],
+                      -FEAS_RELAX, -FEAS_RELAX)
+
+        if self.emission_cap_constraint:
+            total = self.column_index("total_emissions")
+            penalty = self.column_index("emissions_penalty")
+            t0 = self.T[0]
+            def emission_constr_rule(t, s):
+                if t > t0:
+                    return ([(total[(t, s)], 1), (total[(t0, s)], -data.EMISSION_CAP_RELATIVE[t]/100), (penalty[(t, s)], -1)], None, FEAS_RELAX)
+            self.add_rule_rows("EmissionCap", data.TS_CONSTR_S, emission_constr_rule)
+
+    def construct_capacity(self):
+        data = self.data
+        x = self.column_index("x_flow")
+        b = self.column_index("b_flow")
+        eps = self.column_index("epsilon_edge")
+        nu = self.column_index("nu_node")
+        y = self.column_index("y_charge")
+        upg = self.column_index("upsilon_upg")
+
+        def CapacitatedFlowRule(i, j, m, r, ii, jj, mm, rr, t, s):
+            e = (i, j, m, r)
+            a = (ii, jj, mm, rr)
+            terms = ([(x[a+(f, p, t, s)], 1) for p in self.P for f in data.FM_FUEL[m]] +
+                     [(b[a+(f, v, t, s)], 1) for f in data.FM_FUEL[m] for v in data.VEHICLE_TYPES_M[m]] +
+                     [(eps[e+(tau, s)], -0.5*data.Q_EDGE_INV[e]) for tau in self.T
+                      if (tau <= (t - data.LEAD_TIME_EDGE_INV[e])) and (tau in data.T_TIME_FIRST_STAGE)])
+            return (terms, None, 0.5*data.Q_EDGE_BASE[e] + FEAS_RELAX)
+        self.add_rule_rows("CapacitatedFlow", data.EAT_INV_CONSTR_S, CapacitatedFlowRule)
+
+        if len(self.T) > 1:
+            ET_INV = set(data.ET_INV)
+            self.add_rule_rows("ExpansionCap", data.E_EDGES_INV_S,
+                               lambda i, j, m, r, s: ([(eps[(i, j, m, r, t, s)], 1) for t in self.T if (i, j, m, r, t) in ET_INV], None, 1))
+
+        #Terminal capacity: the path flows in (i,m) are assembled with numpy, the capacity expansions as rule
+        nS, nP = len(self.S), len(self.P)
+        n_op = len(self.T_OP)
+        NM_CAP = data.NM_CAP
+        terminal_paths = [(q, self.k_code[k]) for q, (i, m) in enumerate(NM_CAP) if i in data.NM_NODES[m]
+                          for k in data.ORIGIN_PATHS[(i, m)] + data.DESTINATION_PATHS[(i, m)] + data.TRANSFER_PATHS[(i, m)]]
+        terminal_paths = np.array(terminal_paths, dtype=np.int64).reshape(-1, 2)
+        q = terminal_paths[:, 0, None, None, None]
+        k = terminal_paths[:, 1, None, None, None]
+        p = np.arange(nP)[None, :, None, None]
+        tl = np.arange(n_op)[None, None, :, None]
+        s = np.arange(nS)[None, None, None, :]
+        terms = [((q*n_op + tl)*nS + s, self.cols("h_path", k, p, self.t_op[tl], s), 1)]
+        nu_terms = []
+        for qq, (i, m) in enumerate(NM_CAP):
+            if (i, m) in data.NM_CAP_INCR:
+                for ll, t in enumerate(self.T_OP):
+                    for tau in self.T:
+                        if tau <= (t - data.LEAD_TIME_NODE_INV[i, m]):
+                            for ss, scen in enumerate(self.S):
+                                nu_terms.append(((qq*n_op + ll)*nS + ss, nu[(i, m, tau, scen)], -data.Q_NODE_INV[i, m]))
+        nu_terms = np.array(nu_terms).reshape(-1, 3)
+        terms.append((nu_terms[:, 0].astype(np.int64), nu_terms[:, 1].astype(np.int64), nu_terms[:, 2]))
+        upper = np.array([data.Q_NODE_BASE[i, m] + FEAS_RELAX for (i, m) in NM_CAP])
+        mask = np.array([i in data.NM_NODES[m] for (i, m) in NM_CAP], dtype=bool)
+        self.add_rows("TerminalCap", lambda: data.NM_CAP_T_CONSTR_S, len(NM_CAP)*n_op*nS, terms,
+                      -np.inf, np.repeat(upper, n_op*nS), mask=np.repeat(mask, n_op*nS))
+
+        if len(self.T) > 1:
+            def TerminalCapExpRule(i, m, s):
+                terms = [(nu[(i, m, t, s)], 1) for t in self.T if (t <= self.T[-1] - data.LEAD_TIME_NODE_INV[i, m])]
+                if len(terms) > 0:
+                    return (terms, None, 1)
+            self.add_rule_rows("TerminalCapExp", data.NM_CAP_INCR_S, TerminalCapExpRule)
+
+        #Charging / Filling
+        def ChargingCapArcRule(i, j, m, r, f, t, s):
+            e = (i, j, m, r)
+            terms = ([(x[a+(f, p, t, s)], 1) for p in self.P for a in data.AE_ARCS[e]] +
+                     [(b[a+(f, v, t, s)], 1) for a in data.AE_ARCS[e] for v in data.VEHICLE_TYPES_M[m]] +
+                     [(y[e+(f, t, s)], -1)])
+            return (terms, None, data.Q_CHARGE_BASE[(e, f)] + FEAS_RELAX)
+        self.add_rule_rows("ChargingCapArc", data.EFT_CHARGE_CONSTR_S, ChargingCapArcRule)
+
+        #Upgrading
+        def InvestmentInfraRule(i, j, m, r, f, t, s):
+            e = (i, j, m, r)
+            terms = ([(x[a+(f, p, t, s)], 1) for p in self.P for a in data.AE_ARCS[e]] +
+                     [(upg[e+(f, tau, s)], -data.BIG_M_UPG[e]) for tau in self.T
+                      if (tau <= (t - data.LEAD_TIME_EDGE_UPG[(e, f)])) and (tau in data.T_TIME_FIRST_STAGE)])
+            return (terms, None, FEAS_RELAX)
+        self.add_rule_rows("InvestmentInfra", data.UT_UPG_CONSTR_S, InvestmentInfraRule)
+
+    def construct_transport_amount(self):
+        data = self.data
+        q = self.column_index("q_transp_amount")
+        q_delta = self.column_index("q_transp_delta")
+        q_aux = self.column_index("q_aux_transp_amount")
+        q_mode = self.column_index("q_mode_total_transp_amount")
+
+        #TransportArbeid
+        nS, nP = len(self.S), len(self.P)
+        n_op = len(self.T_OP)
+        mf_arcs = [(mf, self.af_code[(a, f)], data.AVG_DISTANCE[a]) for mf, (m, f) in enumerate(self.MF) for a in data.AM_ARCS[m]]
+        mf_q = np.array([mf for (mf, af, dist) in mf_arcs], dtype=np.int64)[:, None, None, None]
+        mf_af = np.array([af for (mf, af, dist) in mf_arcs], dtype=np.int64)[:, None, None, None]
+        distance = np.array([dist for (mf, af, dist) in mf_arcs], dtype=float)[:, None, None, None]
+        mf = np.arange(len(self.MF))[:, None, None]
+        p = np.arange(nP)[None, :, None, None]
+        tl = np.arange(n_op)[None, None, :, None]
+        s = np.arange(nS)[None, None, None, :]
+        self.add_rows("TotalTranspAmount", lambda: data.MFT_CONSTR_S, len(self.MF)*n_op*nS,
+                      [((mf*n_op + tl[0])*nS + s[0], self.cols("q_transp_amount", mf, self.t_op[tl[0]], s[0]), 1),
+                       ((mf_q*n_op + tl)*nS + s, self.cols("x_flow", mf_af, p, self.t_op[tl], s), -distance)],
+                      0, 0)
+
+        #Technology maturity limit upper bound (which also comes from bass diffusion)
+        def TechMaturityLimitRule(m, f, t, s):
+            share = round(data.R_TECH_READINESS_MATURITY[(m, f, t, s)]/100, NUM_DIGITS_PRECISION)
+            return ([(q[(m, f, t, s)], 1)] + [(q[(m, ff, t, s)], -share) for ff in data.FM_FUEL[m]], None, FEAS_RELAX)
+        self.add_rule_rows("TechMaturityLimit", data.MFT_MATURITY_CONSTR_S, TechMaturityLimitRule)
+
+        def PhaseOutRule(m, f, t, s):
+            if ((m, f, t) in data.PHASE_OUT.keys()) and t >= self.T[2]:
+                return ([(q[(m, f, t, s)], 1)], None, 0)
+        self.add_rule_rows("PhaseOut", data.MFT_MIN0_S, PhaseOutRule)
+
+        if self.single_time_period is None:
+
+            def InitTranspAmountRule(m, f, t, s):
+                share = round(data.Q_SHARE_INIT_MAX[(m, f, t)]/100, NUM_DIGITS_PRECISION)
+                return ([(q[(m, f, t, s)], 1)] + [(q[(m, ff, t, s)], -share) for ff in data.FM_FUEL[m]], None, 0)
+            self.add_rule_rows("InitTranspAmount", data.MFT_INIT_TRANSP_SHARE_S, InitTranspAmountRule)
+
+            def InitialModeSplit(m, s):
+                if m != 'Rail':
+                    t0 = self.T[0]
+                    split = data.INIT_MODE_SPLIT[m] - 0.01
+                    return ([(q[(m, f, t0, s)], 1) for f in data.FM_FUEL[m]] +
+                            [(q[(mm, f, t0, s)], -split) for mm in data.M_MODES for f in data.FM_FUEL[mm]], 0, None)
+            self.add_rule_rows("InitialModeSplitConstr", data.M_MODES_S, InitialModeSplit)
+
+            self.add_rule_rows("AuxTranspAmount", data.MFT_NEW_S, lambda m, f, t, s: ([(q_aux[(m, f, t, s)], 1), (q[(m, f, t, s)], -1)], 0, 0))
+            self.add_rule_rows("ModeTotalTransportAmount", data.MT_S,
+                               lambda m, t, s: ([(q_mode[(m, t, s)], 1)] + [(q[(m, f, t, s)], -1) for f in data.FM_FUEL[m]], 0, 0))
+            self.add_rule_rows("DecreaseModeTotalTransportAmount", data.MT_MIN0_S,
+                               lambda m, t, s: ([(q_mode[(m, t, s)], 1), (q_mode[(m, data.T_MIN1[t], s)], -RHO_STAR**(t - data.T_MIN1[t]))], 0, None))
+            self.add_rule_rows("IncreaseModeTotalTransportAmount", data.MT_MIN0_S,
+                               lambda m, t, s: ([(q_mode[(m, t, s)], 1), (q_mode[(m, data.T_MIN1[t], s)], -(2 - RHO_STAR)**(t - data.T_MIN1[t]))], None, 0))
+
+            #Fleet Renewal
+            def FleetRenewalRule(m, t, s):
+                factor = (t - data.T_MIN1[t]) / data.LIFETIME[m]
+                return ([(q_delta[(m, f, t, s)], 1) for f in data.FM_FUEL[m]] + [(q_mode[(m, data.T_MIN1[t], s)], -factor)], None, 0)
+            self.add_rule_rows("FleetRenewal", data.MT_MIN0_S, FleetRenewalRule)
+            self.add_rule_rows("FleetRenewalPosPart", data.MFT_MIN0_S,
+                               lambda m, f, t, s: ([(q_delta[(m, f, t, s)], 1), (q[(m, f, data.T_MIN1[t], s)], -1), (q[(m, f, t, s)], 1)], 0, None))
+
+            #Bass diffusion
+            def BassDiffusionRuleFirstPeriod(m, f, t, s):
+                pos_part = max(self.T[0] - data.tech_base_bass_model[(m, f)].t_0, 0)
+                return ([(q[(m, f, t, s)], 1), (q_mode[(m, t, s)], -pos_part*data.tech_base_bass_model[(m, f)].p)], None, 0)
+            self.add_rule_rows("BassDiffusionFirstPeriod", data.MFT_NEW_FIRST_PERIOD_S, BassDiffusionRuleFirstPeriod)
+
+            if len(self.T) > 1:
+                def bass_diffusion(m, f, t, s, bass_model):
+                    diff_has_started = int(t >= data.tech_base_bass_model[(m, f)].t_0)
+                    return ([(q_aux[(m, f, t, s)], 1), (q_aux[(m, f, t-1, s)], -1 - diff_has_started*bass_model.q),
+                             (q_mode[(m, data.T_MOST_RECENT_DECISION_PERIOD[t-1], s)], -diff_has_started*bass_model.p)], None, 0)
+                self.add_rule_rows("BassDiffusionFirstStage", data.MFT_NEW_YEARLY_FIRST_STAGE_MIN0_S,
+                                   lambda m, f, t, s: bass_diffusion(m, f, t, s, data.tech_base_bass_model[(m, f)]))
+                self.add_rule_rows("BassDiffusionSecondStage", data.MFT_NEW_YEARLY_SECOND_STAGE_S,
+                                   lambda m, f, t, s: bass_diffusion(m, f, t, s, data.tech_active_bass_model[(m, f, s)]))
+
+    def construct_nonanticipativity(self):
+        data = self.data
+        nS = len(self.S)
+        s_code = {s: n for n, s in enumerate(self.S)}
+        pairs = [(s, ss) for (s, ss) in data.SS_SCENARIOS_NONANT if s != ss]
+        s1 = np.array([s_code[s] for (s, ss) in pairs], dtype=np.int64)[None, :]
+        s2 = np.array([s_code[ss] for (s, ss) in pairs], dtype=np.int64)[None, :]
+
+        def nonanticipativity(name, variable, base_index, periods):
+            # variable[key,s] == variable[key,ss] for the keys in base_index (variable is indexed by base_index x S) with t in periods
+            first = self.column_blocks[variable][0]
+            keep = [n for n, key in enumerate(base_index) if flatten(key)[-1] in periods]
+            if len(keep) == 0:
+                return
+            base = np.array(keep, dtype=np.int64)[:, None]
+            rows = np.arange(len(keep))[:, None]*len(pairs) + np.arange(len(pairs))[None, :]
+            keys = lambda: [flatten(base_index[n]) + pair for n in keep for pair in pairs]
+            self.add_rows(name, keys, len(keep)*len(pairs), [(rows, first + base*nS + s1, 1), (rows, first + base*nS + s2, -1)], 0, 0)
+
+        T = [(t,) for t in self.T]
+        first_stage = data.T_TIME_FIRST_STAGE
+        nonanticipativity("Nonanticipativity_x_Constr", "x_flow", data.AFPT, first_stage)
+        nonanticipativity("Nonanticipativity_b_Constr", "b_flow", data.AFVT, first_stage)
+        nonanticipativity("Nonanticipativity_h_Constr", "h_path", data.KPT, first_stage)
+        nonanticipativity("Nonanticipativity_h_bal_Constr", "h_path_balancing", data.KVT, first_stage)
+        nonanticipativity("Nonanticipativity_total_emissions_Constr", "total_emissions", T, first_stage)
+        nonanticipativity("Nonanticipativity_stage_Constr", "StageCosts", T, first_stage)
+        nonanticipativity("Nonanticipativity_eps_Constr", "epsilon_edge", data.ET_INV, first_stage)
+        nonanticipativity("Nonanticipativity_upg_Constr", "upsilon_upg", data.UT_UPG, first_stage)
+        nonanticipativity("Nonanticipativity_nu_Constr", "nu_node", data.NM_CAP_INCR_T, first_stage)
+        nonanticipativity("Nonanticipativity_y_Constr", "y_charge", data.EFT_CHARGE, first_stage)
+        nonanticipativity("Nonanticipativity_q_Constr", "q_transp_amount", data.MFT, first_stage)
+        nonanticipativity("Nonanticipativity_qdelta_Constr", "q_transp_delta", data.MFT_MIN0, first_stage)
+        nonanticipativity("Nonanticipativity_qaux_Constr", "q_aux_transp_amount", data.MFT_NEW_YEARLY, data.T_YEARLY_TIME_FIRST_STAGE)
+        nonanticipativity("Nonanticipativity_qmode_Constr", "q_mode_total_transp_amount", data.MT, first_stage)
+        for (name, variable) in [("opex", "TranspOpexCost"), ("co2", "TranspCO2Cost"), ("co2_pen", "CO2_PENALTY"), ("opexb", "TranspOpexCostB"),
+                                 ("co2b", "TranspCO2CostB"), ("transf", "TransfCost"), ("edge", "EdgeCost"), ("node", "NodeCost"),
+                                 ("upgcost", "UpgCost"), ("chargecost", "ChargeCost"), ("fillingcost", "FillingCost")]:
+            nonanticipativity("Nonanticipativity_"+name+"_Constr", variable, T, first_stage)
+
+        first_stage_costs = self.column_index("FirstStageCosts")
+        self.add_rule_rows("Nonanticipativity_firststagecost_Constr", pairs,
+                           lambda s, ss: ([(first_stage_costs[(s,)], 1), (first_stage_costs[(ss,)], -1)], 0, 0))
+
+    #-----------------------------------------------#
+
+    # SOLVE
+
+    def solve_model(self, FeasTol=(10**(-2)), MIP_gap=MIPGAP, relax_integrality=False, tee=True, **options):
+        # solved with HiGHS. options: the other (Gurobi) settings of TranspModel.solve_model, e.g. Method (see Solvers.py)
+        import highspy
+
+        integrality = np.concatenate(self.col_integer)
+        lp = highspy.HighsLp()
+        lp.num_col_ = self.num_cols
+        lp.num_row_ = self.num_rows
+        lp.col_cost_ = self.cost
+        lp.col_lower_ = np.concatenate(self.col_lower)
+        lp.col_upper_ = np.concatenate(self.col_upper)
+        lp.row_lower_ = np.concatenate(self.row_lower)
+        lp.row_upper_ = np.concatenate(self.row_upper)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.num_col_ = self.num_cols
+        lp.a_matrix_.num_row_ = self.num_rows
+        lp.a_matrix_.start_ = self.matrix.indptr
+        lp.a_matrix_.index_ = self.matrix.indices
+        lp.a_matrix_.value_ = self.matrix.data
+        if integrality.any() and not relax_integrality:
+            lp.integrality_ = [highspy.HighsVarType.kInteger if integer else highspy.HighsVarType.kContinuous for integer in integrality]
+
+        solver = highspy.Highs()
+        solver.setOptionValue("output_flag", tee)
+        for (option, value) in solver_options("highs", FeasTol=FeasTol, MIP_gap=MIP_gap, **options).items():
+            solver.setOptionValue(option, value)
+        solver.passModel(lp)
+        start = time.time()
+        solver.run()
+        status = solver.getModelStatus()
+        if status != highspy.HighsModelStatus.kOptimal:
+            raise Exception('Solver Status: ', solver.modelStatusToString(status))
+        print('the solution is feasible and optimal')
+        print('Solution time: ' + str(time.time() - start))
+        self.solution = np.array(solver.getSolution().col_value)
+        self.objective_value = solver.getInfo().objective_function_value
+        return self.objective_value
+
+    def values(self, name):
+        # {flat index: value} of variable name in the solution
+        first, index, shape = self.column_blocks[name]
+        return {flatten(key): self.solution[first + n] for n, key in enumerate(index)}
+
+    def set_row_bounds(self, name, lower=None, upper=None):
+        # change the bounds (right hand sides) of constraint name, e.g. before solving a saved model again
+        block = list(self.row_blocks).index(name)
+        if lower is not None:
+            self.row_lower[block][:] = lower
+        if upper is not None:
+            self.row_upper[block][:] = upper
+
+    #-----------------------------------------------#
+
+    # FILES
+
+    def column_name(self, col):
+        # (variable name, flat index) of a column
+        for name, (first, index, shape) in self.column_blocks.items():
+            if first <= col < first + len(index):
+                return (name, flatten(index[col - first]))
+        raise IndexError(f"column {col} is not in the model")
+
+    def write_mps(self, filename, chunk_size=100000, compresslevel=1):
+        # free MPS file, gzip compressed if filename ends with .gz. The file is written in blocks of rows and columns
+        # directly from the matrix. Columns are named C<column> and rows R<row>; column_blocks and row_blocks map them
+        # to the variables and constraints (see save and read_solution)
+        start = time.time()
+        col_lower = np.concatenate(self.col_lower)
+        col_upper = np.concatenate(self.col_upper)
+        integrality = np.concatenate(self.col_integer)
+        row_lower = np.concatenate(self.row_lower)
+        row_upper = np.concatenate(self.row_upper)
+        equality = row_lower == row_upper
+        row_types = np.where(equality, "E", np.where(np.isinf(row_lower), np.where(np.isinf(row_upper), "N", "L"), "G"))
+        if filename.endswith(".gz"):
+            file = gzip.open(filename, "wt", compresslevel=compresslevel)
+        else:
+            file = open(filename, "w")
+        with file:
+            file.write("NAME STRAM\nOBJSENSE\n    MIN\nROWS\n N OBJ\n")
+            for first in range(0, self.num_rows, chunk_size):
+                last = min(first + chunk_size, self.num_rows)
+                file.write("".join(f" {row_type} R{row}\n" for row, row_type in zip(range(first, last), row_types[first:last].tolist())))
+
+            file.write("COLUMNS\n")
+            #integer columns between markers, in groups of consecutive columns
+            groups = [0] + (np.flatnonzero(np.diff(integrality)) + 1).tolist() + [self.num_cols]
+            for (begin, end) in zip(groups[:-1], groups[1:]):
+                if integrality[begin]:
+                    file.write("    MARKER 'MARKER' 'INTORG'\n")
+                for first in range(begin, end, chunk_size):
+                    last = min(first + chunk_size, end)
+                    block = self.matrix[:, first:last]
+                    counts = np.diff(block.indptr)
+                    objective = np.flatnonzero((self.cost[first:last] != 0) | (counts == 0))   #columns without entries are listed with objective 0
+                    cols = np.concatenate([objective, np.repeat(np.arange(last - first), counts)])
+                    rows = np.concatenate([np.full(len(objective), -1), block.indices])
+                    values = np.concatenate([self.cost[first:last][objective], block.data])
+                    order = np.argsort(cols, kind="stable")
+                    file.write("".join(f"    C{first + col} {'OBJ' if row < 0 else 'R' + str(row)} {value!r}\n"
+                                       for col, row, value in zip(cols[order].tolist(), rows[order].tolist(), values[order].tolist())))
+                if integrality[begin]:
+                    file.write("    MARKER 'MARKER' 'INTEND'\n")
+
+            file.write("RHS\n")
+            rhs = np.where(row_types == "L", row_upper, row_lower)
+            rows = np.flatnonzero((row_types != "N") & (rhs != 0))
+            file.write("".join(f"    RHS R{row} {value!r}\n" for row, value in zip(rows.tolist(), rhs[rows].tolist())))
+
+            ranges = np.flatnonzero((row_types == "G") & ~np.isinf(row_upper))
+            if len(ranges) > 0:
+                file.write("RANGES\n")
+                file.write("".join(f"    RNG R{row} {value!r}\n" for row, value in zip(ranges.tolist(), (row_upper - row_lower)[ranges].tolist())))
+
+            file.write("BOUNDS\n")
+            lines = []
+            for col, (lb, ub, integer) in enumerate(zip(col_lower.tolist(), col_upper.tolist(), integrality.tolist())):
+                if lb == ub:
+                    lines.append(f" FX BND C{col} {lb!r}\n")
+                    continue
+                if lb == -np.inf:
+                    lines.append(f" {'FR' if ub == np.inf else 'MI'} BND C{col}\n")
+                elif lb != 0:
+                    lines.append(f" LO BND C{col} {lb!r}\n")
+                if ub != np.inf:
+                    lines.append(f" UP BND C{col} {ub!r}\n")
+                elif integer and lb != -np.inf:
+                    lines.append(f" PL BND C{col}\n")
+            file.write("".join(lines))
+            file.write("ENDATA\n")
+        print("Time used writing the MPS file:", round(time.time() - start, 2), flush=True)
+
+    def read_solution(self, filename):
+        # solution file with lines "<column name> <value>" (e.g. Gurobi's .sol file for the MPS file of write_mps)
+        solution = np.zeros(self.num_cols)
+        with open(filename) as file:
+            for line in file:
+                fields = line.split()
+                if len(fields) == 2 and fields[0].startswith("C") and fields[0][1:].isdigit():
+                    solution[int(fields[0][1:])] = float(fields[1])
+        self.solution = solution
+        self.objective_value = float(self.cost @ solution)
+        return self.objective_value
+
+    def save(self, filename):
+        # the built model (matrix, bounds, objective and the column map), to be solved again with MatrixModel.load,
+        # e.g. after changing bounds. The row indices are not saved (only the first row and number of rows per constraint)
+        model = {"num_cols": self.num_cols, "num_rows": self.num_rows, "matrix": self.matrix, "cost": self.cost,
+                 "col_lower": self.col_lower, "col_upper": self.col_upper, "col_integer": self.col_integer,
+                 "row_lower": self.row_lower, "row_upper": self.row_upper,
+                 "column_blocks": {name: (first, list(index), shape) for name, (first, index, shape) in self.column_blocks.items()},
+                 "row_blocks": {name: (first, count) for name, (first, count, keys) in self.row_blocks.items()}}
+        with gzip.open(filename, "wb") as file:
+            pickle.dump(model, file)
+
+    @classmethod
+    def load(cls, filename):
+        with gzip.open(filename, "rb") as file:
+            model = pickle.load(file)
+        matrix_model = cls(data=None, risk_info=None)
+        matrix_model.__dict__.update(model)
+        matrix_model.row_blocks = {name: (first, count, None) for name, (first, count) in model["row_blocks"].items()}
+        return matrix_model
+
+    #-----------------------------------------------#
+
+    # VERIFICATION
+
+    def verify(self, transp_model, tolerance=10**(-9), max_print=10):
+        # compare the matrix with a constructed TranspModel (same data and settings): bounds and integrality of the variables,
+        # the rows (coefficients and bounds, a row may be multiplied by -1) and the objective. Returns True if all match.
+        from pyomo.environ import Var, Constraint, Objective, value
+        from pyomo.repn.standard_repn import generate_standard_repn
+
+        model = transp_model.model
+        column_of = {}
+        for name, (first, index, shape) in self.column_blocks.items():
+            for n, key in enumerate(index):
+                column_of[(name, flatten(key))] = first + n
+        row_of = {}
+        for name, (first, count, keys) in self.row_blocks.items():
+            for n, key in enumerate(keys()):
+                row_of[(name, key)] = first + n
+        col_lower = np.concatenate(self.col_lower)
+        col_upper = np.concatenate(self.col_upper)
+        col_integer = np.concatenate(self.col_integer)
+        row_lower = np.concatenate(self.row_lower)
+        row_upper = np.concatenate(self.row_upper)
+        matrix = self.matrix.tocsr()
+        errors = []
+
+        def close(a, b):
+            return (a == b) or abs(a - b) <= tolerance*max(1, abs(a), abs(b))
+
+        def linear_terms(expression):
+            repn = generate_standard_repn(expression, compute_values=True, quadratic=False)
+            terms = {}
+            for (var, coef) in zip(repn.linear_vars, repn.linear_coefs):
+                col = column_of.get((var.parent_component().name, flatten(var.index())))
+                if col is None:
+                    errors.append(f"variable {var.name} is not in the matrix")
+                    continue
+                terms[col] = terms.get(col, 0) + coef
+            return {col: coef for (col, coef) in terms.items() if coef != 0}, repn.constant
+
+        def same_terms(terms1, terms2, sign):
+            return terms1.keys() == terms2.keys() and all(close(sign*coef, terms2[col]) for (col, coef) in terms1.items())
+
+        #variables
+        for var in model.component_data_objects(Var, descend_into=True):
+            col = column_of.get((var.parent_component().name, flatten(var.index())))
+            if col is None:
+                errors.append(f"variable {var.name} is not in the matrix")
+                continue
+            lb = var.value if var.fixed else (-np.inf if var.lb is None else var.lb)
+            ub = var.value if var.fixed else (np.inf if var.ub is None else var.ub)
+            if not (close(lb, col_lower[col]) and close(ub, col_upper[col]) and var.is_integer() == col_integer[col]):
+                errors.append(f"variable {var.name}: bounds ({lb},{ub}) integer {var.is_integer()} in Pyomo, "
+                              f"({col_lower[col]},{col_upper[col]}) integer {col_integer[col]} in the matrix")
+
+        #rows
+        num_rows = 0
+        for con in model.component_data_objects(Constraint, active=True, descend_into=True):
+            num_rows += 1
+            name = con.parent_component().name
+            row = row_of.pop((name, flatten(con.index())), None)
+            if row is None:
+                errors.append(f"constraint {con.name} is not in the matrix")
+                continue
+            terms, constant = linear_terms(con.body)
+            lower = -np.inf if con.lower is None else value(con.lower) - constant
+            upper = np.inf if con.upper is None else value(con.upper) - constant
+            matrix_terms = dict(zip(matrix.indices[matrix.indptr[row]:matrix.indptr[row+1]].tolist(),
+                                    matrix.data[matrix.indptr[row]:matrix.indptr[row+1]].tolist()))
+            if same_terms(terms, matrix_terms, 1):
+                bounds = (lower, upper)
+            elif same_terms(terms, matrix_terms, -1):
+                bounds = (-upper, -lower)
+            else:
+                errors.append(f"constraint {con.name}: coefficients differ")
+                continue
+            if not (close(bounds[0], row_lower[row]) and close(bounds[1], row_upper[row])):
+                errors.append(f"constraint {con.name}: bounds {bounds} in Pyomo, ({row_lower[row]},{row_upper[row]}) in the matrix")
+        for (name, key) in row_of:
+            errors.append(f"constraint {name}[{key}] is only in the matrix")
+
+        #objective
+        objective = next(model.component_data_objects(Objective, active=True))
+        terms, constant = linear_terms(objective.expr)
+        if not same_terms(terms, {col: coef for col, coef in enumerate(self.cost.tolist()) if coef != 0}, 1):
+            errors.append("objective coefficients differ")
+
+        print(f"Verification: {num_rows} Pyomo constraints, {self.num_rows} matrix rows, {len(errors)} differences")
+        for error in errors[:max_print]:
+            print("   ", error)
+        return len(errors) == 0
+
+
+if __name__ == "__main__":
+
+    #verification on a small instance: the first time period and two scenarios
+    import os
+    import sys
+    from Data.ConstructData import TransportSets
+    from Data.interpolate import interpolate
+    from Model import TranspModel, RiskInformation
+
+    base_data = TransportSets(sheet_name_scenarios='fuel_scenarios', co2_fee="base")
+    base_data = interpolate(base_data, [2023, 2028, 2034, 2040, 2050], 2)
+    small_data = base_data.view(time_periods=[2023], scenarios=base_data.S_SCENARIOS[:2])
+    risk_info = RiskInformation(0.3, 0.8)
+
+    start = time.time()
+    transp_model = TranspModel(data=small_data, risk_info=risk_info)
+    transp_model.construct_model()
+    print("Time used constructing the Pyomo model:", round(time.time() - start, 2))
+
+    matrix_model = MatrixModel(data=small_data, risk_info=risk_info)
+    matrix_model.construct_model()
+    matrix_model.verify(transp_model)
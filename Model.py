@@ -14,7 +14,11 @@ from pyomo.util.infeasible import log_infeasible_constraints
 import logging
 
 import logging
+import time
+import numpy as np
 from Data.settings import *
+from path_generation import layered_shortest_paths
+from Solvers import solver_options, solver_interface
 
 
 ############# Class ################
@@ -42,6 +46,12 @@ class TranspModel:
 
         self.NoBalancingTrips = False
 
+        self.formulation = "path"   #"path": flows on the generated paths (h_path), "node_arc": flow conservation per commodity (see construct_node_arc_flow)
+
+        self.solver = SOLVER   #"gurobi" or "highs" (see Solvers.py)
+        self.persistent_solver = None   #solver that holds the model between solves (see solve_model)
+        self.column_generation_converged = None   #result of solve_column_generation (None: not used)
+
     def construct_model(self,risk_neutral=False):
 
         "VARIABLES"
@@ -50,14 +60,18 @@ class TranspModel:
         #self.model.x_flow = Var(self.data.AFPT_S, within=NonNegativeReals,bounds=fb)
         self.model.x_flow = Var(self.data.AFPT_S, within=NonNegativeReals)
         self.model.b_flow = Var(self.data.AFVT_S, within=NonNegativeReals)
-        self.model.h_path = Var(self.data.KPT_S, within=NonNegativeReals)# flow on paths K,p
-        self.model.h_path_balancing = Var(self.data.KVT_S, within=NonNegativeReals,initialize=1)# flow on paths K,p
+        if self.formulation == "node_arc":
+            self.construct_node_arc_variables()
+        else:
+            self.model.h_path = Var(self.data.KPT_S, within=NonNegativeReals)# flow on paths K,p
+            self.model.h_path_balancing = Var(self.data.KVT_S, within=NonNegativeReals,initialize=1)# flow on paths K,p
         if self.NoBalancingTrips:
             for (i,j,m,r,f,v,t,s) in self.data.AFVT_S:
                 a = (i,j,m,r)
                 self.model.b_flow[(a,f,v,t,s)].fix(0)
-            for (k,v,t) in self.data.KVT_S:
-                self.model.h_path_balancing[(k,v,t,s)].fix(0)
+            if self.formulation == "path":
+                for (k,v,t) in self.data.KVT_S:
+                    self.model.h_path_balancing[(k,v,t,s)].fix(0)
         self.model.StageCosts = Var(self.data.T_TIME_PERIODS_S, within = NonNegativeReals)
         
         self.model.epsilon_edge = Var(self.data.ET_INV_S, within = Binary) #within = Binary
@@ -126,6 +140,8 @@ class TranspModel:
 
         self.model.TransfCost = Var(self.data.T_TIME_PERIODS_S, within=NonNegativeReals)
         def TransfCost(model, t,s):
+            if self.formulation == "node_arc":
+                return (self.model.TransfCost[t,s] >= self.node_arc_transfer_cost(t,s) - FEAS_RELAX)
             return (self.model.TransfCost[t,s] >= sum((self.data.C_TRANSFER[(k,p)]+self.data.C_TRANSFER_TIME[(k,p)])*self.model.h_path[k,p,t,s] for p in self.data.P_PRODUCTS  for k in self.data.PATHS_NO_UNIMODAL_ROAD)-FEAS_RELAX )  
         self.model.TransfCostConstr = Constraint(self.data.T_TIME_PERIODS_S, rule=TransfCost)
 
@@ -265,6 +281,9 @@ class TranspModel:
 
         
         # DEMAND
+
+        if self.formulation == "node_arc":
+            self.construct_node_arc_flow()   #instead of the demand and path constraints below
                 
         def FlowRule(model, o, d, p, t,s):
             demand = self.data.D_DEMAND[(o, d, p, t)]
@@ -272,7 +291,8 @@ class TranspModel:
                 return Constraint.Skip
             else:
                 return (sum(self.model.h_path[(k,p,t,s)] for k in self.data.OD_PATHS[(o, d)]) >= demand - FEAS_RELAX)
-        self.model.Flow = Constraint(self.data.ODPTS_CONSTR_S, rule=FlowRule)
+        if self.formulation == "path":
+            self.model.Flow = Constraint(self.data.ODPTS_CONSTR_S, rule=FlowRule)
         # when using uni-modal paths, then this gives an error as there are no paths from World to Hamar/Umeå
 
         # PATHFLOW
@@ -282,7 +302,8 @@ class TranspModel:
             difference = sum(self.model.x_flow[a, f, p, t,s] for f in self.data.FM_FUEL[m]) - sum(
                 self.model.h_path[k, p, t,s] for k in self.data.KA_PATHS[a] )
             return (-ABSOLUTE_DEVIATION,difference,ABSOLUTE_DEVIATION)
-        self.model.PathArcRel = Constraint(self.data.APT_CONSTR_S, rule=PathArcRule)
+        if self.formulation == "path":
+            self.model.PathArcRel = Constraint(self.data.APT_CONSTR_S, rule=PathArcRule)
 
         
         if not self.NoBalancingTrips:
@@ -291,7 +312,8 @@ class TranspModel:
                 difference = sum(self.model.b_flow[a, f, v, t,s] for f in self.data.FM_FUEL[m]) - sum(
                     self.model.h_path_balancing[k, v, t,s] for k in self.data.KA_PATHS_UNIMODAL[a] )
                 return (-ABSOLUTE_DEVIATION,difference,ABSOLUTE_DEVIATION)
-            self.model.PathArcRelBalance = Constraint(self.data.AVT_CONSTR_S, rule=PathArcRuleBalancing)
+            if self.formulation == "path":   #the node-arc formulation only has the fleet balance (on b_flow) below
+                self.model.PathArcRelBalance = Constraint(self.data.AVT_CONSTR_S, rule=PathArcRuleBalancing)
 
             # FLEET BALANCING
             def FleetBalance1(model, n,m,f,v, t,s):
@@ -360,9 +382,13 @@ class TranspModel:
         #Terminal capacity constraint. We keep the old notation here, so we can distinguish between OD and transfer, if they take up different capacity.
         def TerminalCapRule(model, i, m,t,s):
             if i in self.data.NM_NODES[m]:
-                return (sum(self.model.h_path[k, p, t,s] for k in self.data.ORIGIN_PATHS[(i,m)] for p in self.data.P_PRODUCTS) +
-                    sum(self.model.h_path[k, p, t,s] for k in self.data.DESTINATION_PATHS[(i,m)] for p in self.data.P_PRODUCTS) +
-                    sum(self.model.h_path[k,p,t,s] for k in self.data.TRANSFER_PATHS[(i,m)] for p in self.data.P_PRODUCTS) <= 
+                if self.formulation == "node_arc":
+                    terminal_flow = self.node_arc_terminal_flow(i,m,t,s)
+                else:
+                    terminal_flow = (sum(self.model.h_path[k, p, t,s] for k in self.data.ORIGIN_PATHS[(i,m)] for p in self.data.P_PRODUCTS) +
+                        sum(self.model.h_path[k, p, t,s] for k in self.data.DESTINATION_PATHS[(i,m)] for p in self.data.P_PRODUCTS) +
+                        sum(self.model.h_path[k,p,t,s] for k in self.data.TRANSFER_PATHS[(i,m)] for p in self.data.P_PRODUCTS))
+                return (terminal_flow <= 
                     self.data.Q_NODE_BASE[i,m]+self.data.Q_NODE_INV[i,m]*sum(self.model.nu_node[i,m,tau,s] 
                                                                                 for tau in self.data.T_TIME_PERIODS 
                                                                                 if ((tau <= (t-self.data.LEAD_TIME_NODE_INV[i,m])) and
@@ -575,7 +601,10 @@ class TranspModel:
                     return (-ABSOLUTE_DEVIATION_NONANT,diff,ABSOLUTE_DEVIATION_NONANT)
                 else:
                     return Constraint.Skip
-            self.model.Nonanticipativity_h_Constr = Constraint(combinations(self.data.KPT,self.data.SS_SCENARIOS_NONANT),rule = Nonanticipativity_h)
+            if self.formulation == "path":
+                self.model.Nonanticipativity_h_Constr = Constraint(combinations(self.data.KPT,self.data.SS_SCENARIOS_NONANT),rule = Nonanticipativity_h)
+            else:
+                self.construct_node_arc_nonanticipativity(ABSOLUTE_DEVIATION_NONANT)
 
             def Nonanticipativity_h_bal(model,k,v,t,s,ss):
                 if (t in self.data.T_TIME_FIRST_STAGE) and (s is not ss): 
@@ -583,7 +612,8 @@ class TranspModel:
                     return (-ABSOLUTE_DEVIATION_NONANT,diff,ABSOLUTE_DEVIATION_NONANT)
                 else:
                     return Constraint.Skip
-            self.model.Nonanticipativity_h_bal_Constr = Constraint(combinations(self.data.KVT,self.data.SS_SCENARIOS_NONANT),rule = Nonanticipativity_h_bal)
+            if self.formulation == "path":
+                self.model.Nonanticipativity_h_bal_Constr = Constraint(combinations(self.data.KVT,self.data.SS_SCENARIOS_NONANT),rule = Nonanticipativity_h_bal)
 
             def Nonanticipativity_total_emissions(model,t,s,ss):
                 if (t in self.data.T_TIME_FIRST_STAGE) and (s is not ss): 
@@ -798,6 +828,7 @@ class TranspModel:
                 weight = model_instance_init.model.total_emissions[(t,s)].value
                 self.model.total_emissions[(t,s)].setub((1+RELATIVE_DEVIATION)*weight)
                 self.model.total_emissions[(t,s)].setlb((1-RELATIVE_DEVIATION)*weight)
+            self.update_solver_variables([self.model.total_emissions[(self.data.T_TIME_PERIODS[0],s)] for s in self.data.S_SCENARIOS])
                 
             # t = self.data.T_TIME_PERIODS[0]
             # for scen_name in self.data.S_SCENARIOS:
@@ -928,6 +959,8 @@ class TranspModel:
                         self.model.y_charge[(e,f,t,s)].fix(weight)
                     else:
                         self.model.y_charge[(e,f,t,s)].fix(0)
+
+        self.update_solver_variables(self.first_stage_variables())
         
         
     def unfix_variables_first_stage(self):
@@ -967,6 +1000,18 @@ class TranspModel:
 
         for (e,f,t,s) in self.data.EFT_CHARGE_S:
             self.model.y_charge[(e,f,t,s)].fixed = False
+
+        self.update_solver_variables(list(self.model.x_flow.values()) + list(self.model.b_flow.values()) + self.first_stage_variables())
+
+    def first_stage_variables(self):
+        # the variables that are changed in fix_variables_first_stage and unfix_variables_first_stage (except x_flow and b_flow)
+        return (list(self.model.total_emissions.values()) + list(self.model.epsilon_edge.values()) + list(self.model.upsilon_upg.values()) + 
+                list(self.model.nu_node.values()) + list(self.model.y_charge.values()))
+
+    def update_solver_variables(self, variables):
+        # pass changed bounds/fixed values of variables to the persistent solver (nothing to do if the model is not in a solver yet)
+        if self.persistent_solver is not None:
+            self.persistent_solver.update_variables(variables)
                     
     
             
@@ -978,21 +1023,25 @@ class TranspModel:
                     num_focus= 0,  # 0 is automatic, 1 is low precision but fast  https://www.gurobi.com/documentation/9.5/refman/numericfocus.html
                     Crossover=-1, #default: -1, automatic, https://www.gurobi.com/documentation/9.1/refman/crossover.html
                     Method=-1, #root node relaxation, def: -1    https://www.gurobi.com/documentation/9.1/refman/method.html
-                    NodeMethod=-1):  # all other nodes, https://www.gurobi.com/documentation/9.1/refman/nodemethod.html
-
-        opt = pyomo.opt.SolverFactory('gurobi') #gurobi
-        opt.options['FeasibilityTol'] = FeasTol 
-        opt.options['MIPGap']= MIP_gap 
-        opt.options["NumericFocus"] = num_focus
-        opt.options["BarConvTol"] = 1E-8 # default: 1E-8https://www.gurobi.com/documentation/9.1/refman/barconvtol.html
-        opt.options["Crossover"] = Crossover
-        opt.options["Method"] = Method 
-        opt.options["NodeMethod"] = NodeMethod 
-        #opt.options["DualReductions"] = 0 #default 1. At zero, figure out if unbounded or infeasible.
-        results = opt.solve(self.model, warmstart=warmstart, tee=True, 
-                                        symbolic_solver_labels=False, #goes faster, but turn to true with errors!
-                                        keepfiles=False)  
-                                        #https://pyomo.readthedocs.io/en/stable/working_abstractmodels/pyomo_command.html
+                    NodeMethod=-1,  # all other nodes, https://www.gurobi.com/documentation/9.1/refman/nodemethod.html
+                    threads=SOLVER_THREADS,  # 0 is automatic
+                    persistent=PERSISTENT_SOLVER):  # keep the model in the solver for the next solves
+
+        #the options are given with Gurobi's names, and translated for the solver of this model (self.solver, see Solvers.py)
+        options = solver_options(self.solver, FeasTol=FeasTol, MIP_gap=MIP_gap, num_focus=num_focus, Crossover=Crossover, 
+                                 Method=Method, NodeMethod=NodeMethod, threads=threads,
+                                 BarConvTol=1E-8)  # default: 1E-8https://www.gurobi.com/documentation/9.1/refman/barconvtol.html
+        #options["DualReductions"] = 0 #default 1. At zero, figure out if unbounded or infeasible.
+        interface = solver_interface(self.solver, persistent)
+        start = time.time()
+        if persistent:
+            results = self.solve_persistent(options, warmstart=warmstart)
+        else:
+            opt = pyomo.opt.SolverFactory(interface)
+            results = opt.solve(self.model, warmstart=warmstart, tee=True, options=options,
+                                            symbolic_solver_labels=False, #goes faster, but turn to true with errors!
+                                            keepfiles=False)  
+                                            #https://pyomo.readthedocs.io/en/stable/working_abstractmodels/pyomo_command.html
         if True:
             solver_stat = results.solver.status
             termination_cond = results.solver.termination_condition
@@ -1007,9 +1056,287 @@ class TranspModel:
                 #print('Solver Status: '), self.results.solver.status
                 #print('Termination Condition: '), self.results.solver.termination_condition
 
-            print('Solution time: ' + str(results.solver.time))
+            print('Solution time: ' + str(time.time() - start if interface.startswith("appsi") else results.solver.time))
         
         #self.model.EmissionCap.pprint()
         #self.model.total_emissions.display() #print()
 
-        
+    def solve_persistent(self, options, warmstart=False):
+        # solve with a Pyomo APPSI solver that keeps the model in memory: the first solve passes the whole model, the next ones
+        # only the changes. Changed variables are passed explicitly (update_solver_variables, e.g. in fix_variables_first_stage),
+        # new or changed constraints (e.g. add_paths) and the objective are found by the solver interface itself
+        if self.persistent_solver is None:
+            self.persistent_solver = pyomo.opt.SolverFactory(solver_interface(self.solver, persistent=True))
+            self.persistent_solver.update_config.update_vars = False
+            self.persistent_solver.update_config.treat_fixed_vars_as_params = False   #fixing a variable only changes its bounds in the solver
+            self.persistent_solver.update_config.check_for_new_or_removed_params = False
+            self.persistent_solver.update_config.update_params = False
+        return self.persistent_solver.solve(self.model, warmstart=warmstart, tee=True, options=options)
+
+
+    #-----------------------------------------------#
+
+    # NODE-ARC FORMULATION (formulation = "node_arc")
+    # Instead of flows on paths, there is one commodity per destination d and product p (DP_COMMODITIES), with flow conservation
+    # in a node (n,m) per node n and mode m. The flow of the commodities on the arcs adds up to x_flow, so all constraints on
+    # x_flow/b_flow (costs, capacities, emissions, fleet) are the same as in the path formulation. The transfer costs and terminal
+    # capacities are on the mode changes:
+    #   g_first[o,m,d,p,t,s]:       from origin o to mode m (first mile)
+    #   g_transfer[n,m1,m2,d,p,t,s]: transfer from mode m1 to mode m2 in node n
+    #   g_last[m,d,p,t,s]:          from mode m to destination d (last mile)
+    # Unlike the path formulation, the number of transfers is not restricted (NUM_MODE_PATHS), and no paths are needed.
+
+    def construct_node_arc_variables(self):
+        self.model.g_flow = Var(self.data.ADPT_CONSTR_S, within=NonNegativeReals)    #flow of commodity (d,p) on arc a
+        self.model.g_first = Var(self.data.NMDPT_FIRST_CONSTR_S, within=NonNegativeReals)
+        self.model.g_transfer = Var(self.data.NMMDPT_CONSTR_S, within=NonNegativeReals)
+        self.model.g_last = Var(self.data.MDPT_LAST_CONSTR_S, within=NonNegativeReals)
+
+        self.origin_commodities = {n: [] for n in self.data.N_NODES}        #n: commodities (d,p) with demand from origin n
+        for (o,d,p) in self.data.ODP:
+            self.origin_commodities[o].append((d,p))
+        self.product_destinations = {p: [d for (d,pp) in self.data.DP_COMMODITIES if pp == p] for p in self.data.P_PRODUCTS}
+        self.mode_changes_to = {(n,m): [] for n in self.data.N_NODES for m in self.data.M_MODES}      #(n,m): modes m1 with a mode change (n,m1,m)
+        self.mode_changes_from = {(n,m): [] for n in self.data.N_NODES for m in self.data.M_MODES}    #(n,m): modes m2 with a mode change (n,m,m2)
+        for (n,m1,m2) in self.data.NMM_MODE_CHANGES:
+            self.mode_changes_to[(n,m2)].append(m1)
+            self.mode_changes_from[(n,m1)].append(m2)
+
+    def construct_node_arc_flow(self):
+
+        # DEMAND
+        def FlowRule(model, o, d, p, t,s):
+            demand = self.data.D_DEMAND[(o, d, p, t)]
+            if  demand < ABSOLUTE_DEVIATION:
+                return Constraint.Skip
+            else:
+                return (sum(self.model.g_first[(o,m,d,p,t,s)] for m in self.data.M_MODES if o in self.data.NM_NODES[m]) >= demand - FEAS_RELAX)
+        self.model.Flow = Constraint(self.data.ODPTS_CONSTR_S, rule=FlowRule)
+
+        # FLOW CONSERVATION
+        def FlowConservationRule(model, n, m, d, p, t,s):
+            inflow = [self.model.g_flow[a,d,p,t,s] for a in self.data.ANM_ARCS_IN[(n,m)] if a[0] != d]
+            outflow = []
+            if (d,p) in self.origin_commodities[n]:
+                inflow.append(self.model.g_first[n,m,d,p,t,s])
+            if n == d:
+                outflow.append(self.model.g_last[m,d,p,t,s])
+            else:
+                outflow += [self.model.g_flow[a,d,p,t,s] for a in self.data.ANM_ARCS_OUT[(n,m)]]
+                inflow += [self.model.g_transfer[n,m1,m,d,p,t,s] for m1 in self.mode_changes_to[(n,m)]]
+                outflow += [self.model.g_transfer[n,m,m2,d,p,t,s] for m2 in self.mode_changes_from[(n,m)]]
+            if len(inflow) + len(outflow) == 0:
+                return Constraint.Skip
+            return (sum(inflow) - sum(outflow) == 0)
+        self.model.FlowConservation = Constraint(self.data.NMDPT_CONSTR_S, rule=FlowConservationRule)
+
+        # ARC FLOW (as PathArcRel)
+        def CommodityArcRule(model, i, j, m, r, p, t,s):
+            a= (i,j,m,r)
+            difference = sum(self.model.x_flow[a, f, p, t,s] for f in self.data.FM_FUEL[m]) - sum(
+                self.model.g_flow[a, d, p, t,s] for d in self.product_destinations[p] if d != i)
+            return (-ABSOLUTE_DEVIATION,difference,ABSOLUTE_DEVIATION)
+        self.model.CommodityArcRel = Constraint(self.data.APT_CONSTR_S, rule=CommodityArcRule)
+
+    def node_arc_transfer_cost(self, t, s):
+        # transfer costs (cost + time cost) in period t, scenario s (as C_TRANSFER + C_TRANSFER_TIME on the paths)
+        if t not in self.data.T_TIME_PERIODS_OPERATIONAL:
+            return 0
+        return (sum(self.data.C_FIRST_MILE[(m,p)]*self.model.g_first[(o,m,d,p,t,s)]
+                    for (o,d,p) in self.data.ODP for m in self.data.M_MODES if o in self.data.NM_NODES[m]) +
+                sum(self.data.C_LAST_MILE[(m,p)]*self.model.g_last[(m,d,p,t,s)]
+                    for (d,p) in self.data.DP_COMMODITIES for m in self.data.M_MODES if d in self.data.NM_NODES[m]) +
+                sum(self.data.C_MODE_CHANGE[(m1,m2,p)]*self.model.g_transfer[(n,m1,m2,d,p,t,s)]
+                    for (d,p) in self.data.DP_COMMODITIES for (n,m1,m2) in self.data.NMM_MODE_CHANGES if n != d))
+
+    def node_arc_terminal_flow(self, i, m, t, s):
+        # flow through terminal (i,m): from/to the origin/destination and transfers from/to mode m (as ORIGIN_PATHS, DESTINATION_PATHS and TRANSFER_PATHS)
+        return (sum(self.model.g_first[(i,m,d,p,t,s)] for (d,p) in self.origin_commodities[i]) +
+                sum(self.model.g_last[(m,d,p,t,s)] for (d,p) in self.data.DP_COMMODITIES if d == i) +
+                sum(self.model.g_transfer[(i,m1,m,d,p,t,s)] for m1 in self.mode_changes_to[(i,m)] for (d,p) in self.data.DP_COMMODITIES if d != i) +
+                sum(self.model.g_transfer[(i,m,m2,d,p,t,s)] for m2 in self.mode_changes_from[(i,m)] for (d,p) in self.data.DP_COMMODITIES if d != i))
+
+    def construct_node_arc_nonanticipativity(self, absolute_deviation):
+        # the first-stage flows through the terminals are the same in all scenarios (the arc flows are already fixed by x_flow)
+        for name, variable, index_set in [("first", self.model.g_first, self.data.NMDPT_FIRST_CONSTR),
+                                          ("transfer", self.model.g_transfer, self.data.NMMDPT_CONSTR),
+                                          ("last", self.model.g_last, self.data.MDPT_LAST_CONSTR)]:
+            nonant_set = [index + (s,ss) for index in index_set for (s,ss) in self.data.SS_SCENARIOS_NONANT if index[-1] in self.data.T_TIME_FIRST_STAGE]
+            def Nonanticipativity_g(model, *index, variable=variable):
+                (s, ss) = index[-2:]
+                return (-absolute_deviation, variable[index[:-2] + (s,)] - variable[index[:-2] + (ss,)], absolute_deviation)
+            if len(nonant_set) > 0:
+                setattr(self.model, "Nonanticipativity_g_"+name+"_Constr", Constraint(nonant_set, rule=Nonanticipativity_g))
+
+    #-----------------------------------------------#
+
+    # COLUMN GENERATION (paths)
+
+    def solve_column_generation(self, max_iterations=COLUMN_GENERATION_MAX_ITERATIONS, **solve_options):
+        # column generation for the path flows: solve the LP relaxation over the current paths, add the paths with a 
+        # negative reduced cost (see price_paths) and repeat. Then the model is solved (with binaries) over the generated paths.
+        binaries = list(self.model.epsilon_edge.values()) + list(self.model.upsilon_upg.values())
+        for var in binaries:
+            var.domain = UnitInterval
+        self.update_solver_variables(binaries)
+        self.model.dual = Suffix(direction=Suffix.IMPORT)
+        self.column_generation_converged = False   #True if the LP relaxation is proven optimal over all paths (exact pricing finds no new paths)
+        for iteration in range(max_iterations):
+            self.solve_model(**solve_options)
+            new_paths, exact = self.price_paths()
+            print(f"Column generation iteration {iteration+1}: LP objective {value(self.model.objective_function)}, "
+                  f"{len(self.data.K_PATHS)} paths, {len(new_paths)} new paths" + ("" if exact else " (inexact pricing)"), flush=True)
+            if len(new_paths) == 0:
+                self.column_generation_converged = exact
+                if not exact:
+                    print("Column generation: NOT converged, the pricing was inexact and found no new paths (paths with a negative "
+                          "reduced cost may be missing, the LP bound is not proven)")
+                break
+            self.add_paths(new_paths)
+        else:
+            print("Column generation: NOT converged, stopped at the maximum number of iterations")
+        self.model.del_component(self.model.dual)
+        for var in binaries:
+            var.domain = Binary
+        self.update_solver_variables(binaries)
+        self.solve_model(**solve_options)
+
+    def price_paths(self, mode_comb_level=COLUMN_GENERATION_MODE_PATHS, tolerance=COLUMN_GENERATION_TOLERANCE):
+        # new paths with a negative reduced cost, based on the duals of the last (LP) solve
+        # The reduced cost of h_path[k,p,t,s] (which has no objective coefficient) is, with y the duals of the constraints it appears in:
+        #   sum_{a in k} y[PathArcRel] - y[Flow] - (C_TRANSFER+C_TRANSFER_TIME)*y[TransfCostConstr] - sum_{terminals of k} y[TerminalCap]
+        # The paths that minimize it are found with a shortest path search in a layered graph (one layer per leg, see layered_shortest_paths).
+        # In the first stage, h_path is the same in all scenarios (nonanticipativity), so the reduced costs are summed over the scenarios.
+        # Returns the new paths, and whether the search was exact (if not, paths with a negative reduced cost may be missing)
+        data, model, dual = self.data, self.model, self.model.dual
+        nodes, modes = data.N_NODES, data.M_MODES
+        node_nr = {n: nr for nr, n in enumerate(nodes)}
+        mode_nr = {m: nr for nr, m in enumerate(modes)}
+        N, M = len(nodes), len(modes)
+        existing_paths = set(data.K_PATH_DICT.values())
+        arc_routes = {}
+        for (i,j,m,r) in data.A_ARCS:
+            arc_routes.setdefault((i,j,m), []).append(r)
+
+        def dual_value(constraint, index, scenarios):
+            return sum(dual.get(constraint[index + (s,)], 0) for s in scenarios if index + (s,) in constraint)
+
+        new_paths = {}  #path: reduced cost
+        exact = True    #False if the search of one of the layered graphs was inexact (see layered_shortest_paths)
+        for p in data.P_PRODUCTS:
+            first_mile, last_mile, transfer = data.transfer_costs(p)
+            od_pairs = [(o,d) for (o,d,pp) in data.ODP if pp == p]
+            for t in data.T_TIME_PERIODS_OPERATIONAL:
+                if (t in data.T_TIME_FIRST_STAGE) and len(data.S_SCENARIOS) > 1:
+                    scenario_groups = [data.S_SCENARIOS]
+                else:
+                    scenario_groups = [[s] for s in data.S_SCENARIOS]
+                for scenarios in scenario_groups:
+                    transfer_dual = dual_value(model.TransfCostConstr, (t,), scenarios)
+                    terminal_dual = {(i,m): dual_value(model.TerminalCap, (i,m,t), scenarios) for (i,m) in data.NM_CAP}
+                    arc_dual = {a: dual_value(model.PathArcRel, a + (p,t), scenarios) for a in data.A_ARCS}
+                    flow_dual = {(o,d): dual_value(model.Flow, (o,d,p,t), scenarios) for (o,d) in od_pairs 
+                                 if (o,d,p,t,scenarios[0]) in model.Flow}
+
+                    def reduced_cost(path):
+                        legs = [path[n][2] for n in range(len(path)) if n == 0 or path[n][2] != path[n-1][2]]
+                        transfer_cost = sum(first_mile[legs[0]]) + sum(last_mile[legs[-1]]) + sum(sum(transfer[(m1,m2)]) for (m1,m2) in zip(legs[:-1], legs[1:]))
+                        terminals = [(path[0][0], legs[0]), (path[-1][1], legs[-1])] 
+                        terminals += [(path[n][1], path[n+1][2]) for n in range(len(path)-1) if path[n][2] != path[n+1][2]]
+                        terminals += [(path[n][1], path[n][2]) for n in range(len(path)-1) if path[n][2] != path[n+1][2]]
+                        return (sum(arc_dual[a] for a in path) - flow_dual[(path[0][0], path[-1][1])] - transfer_cost*transfer_dual 
+                                - sum(terminal_dual.get(terminal, 0) for terminal in terminals))
+
+                    route = {arc: min(routes, key=lambda r: arc_dual[arc + (r,)]) for arc, routes in arc_routes.items()}
+                    arcs = [(node_nr[i], node_nr[j], mode_nr[m]) for (i,j,m) in route]
+                    arc_costs = [arc_dual[arc + (r,)] for arc, r in route.items()]
+                    terminal_costs = np.zeros((N,M))
+                    for (i,m), y in terminal_dual.items():
+                        terminal_costs[node_nr[i], mode_nr[m]] = -y
+                    first_costs = np.array([[-sum(first_mile[m])*transfer_dual for m in modes]]*N) + terminal_costs
+                    last_costs = np.array([[-sum(last_mile[m])*transfer_dual for m in modes]]*N) + terminal_costs
+                    transfer_costs = np.zeros((N,M,M))
+                    for (m1,m2), cost in transfer.items():
+                        transfer_costs[:, mode_nr[m1], mode_nr[m2]] = -sum(cost)*transfer_dual + terminal_costs[:, mode_nr[m1]] + terminal_costs[:, mode_nr[m2]]
+                    bound = np.full((N,N), -np.inf)
+                    for (o,d), y in flow_dual.items():
+                        bound[node_nr[o], node_nr[d]] = y - tolerance
+
+                    layered_paths, layered_exact = layered_shortest_paths(N, M, arcs, arc_costs, first_costs, last_costs, transfer_costs, 
+                                                                          mode_comb_level, bound)
+                    exact = exact and layered_exact
+                    for (o,d), (cost, layered_path) in layered_paths.items():
+                        path = tuple((nodes[i], nodes[j], modes[m], route[(nodes[i], nodes[j], modes[m])]) for (i,j,m) in layered_path)
+                        if path in existing_paths:
+                            continue
+                        rc = reduced_cost(path)
+                        if rc < -tolerance:
+                            if rc < new_paths.get(path, 0):
+                                new_paths[path] = rc
+                        else:
+                            #the layered graph underestimates the reduced cost of this path (e.g. a transfer before its first arc), 
+                            #so a cheaper path for (o,d) may be missed
+                            exact = False
+        if len(new_paths) > 0:
+            print(f"Pricing: {len(new_paths)} paths with a negative reduced cost (minimum {min(new_paths.values())})")
+        return list(new_paths), exact
+
+    def add_paths(self, paths):
+        # add the paths to the data, and their h_path and h_path_balancing variables to the model (in all the 
+        # constraints they appear in, see construct_model)
+        new_paths = self.data.add_paths(paths)
+        data, model = self.data, self.model
+        ABSOLUTE_DEVIATION_NONANT = 0  #as in construct_model
+        nonanticipativity = len(data.S_SCENARIOS) > 1
+
+        new_terms = {}
+        def add_term(constraint, index, term):
+            if index in constraint:
+                new_terms.setdefault(constraint[index], []).append(term)
+
+        for k in new_paths:
+            path = data.K_PATH_DICT[k]
+            od = (path[0][0], path[-1][1])
+            transfers = [n for n in range(len(path)-1) if path[n][2] != path[n+1][2]]
+            #terminals (i,m) of the path: origin, destination and transfers (see ORIGIN_PATHS, DESTINATION_PATHS, TRANSFER_PATHS)
+            terminals = [(path[0][0], path[0][2]), (path[-1][1], path[-1][2])]
+            for n in transfers:
+                terminals += [(path[n][1], path[n][2]), (path[n][1], path[n+1][2])]
+            for p in data.P_PRODUCTS:
+                transfer_cost = data.C_TRANSFER[(k,p)] + data.C_TRANSFER_TIME[(k,p)]
+                for t in data.T_TIME_PERIODS:
+                    for s in data.S_SCENARIOS:
+                        model.h_path.index_set().add((k,p,t,s))
+                        h = model.h_path[(k,p,t,s)]
+                        add_term(model.Flow, od + (p,t,s), h)
+                        for a in path:
+                            add_term(model.PathArcRel, a + (p,t,s), -h)
+                        if k in data.PATHS_NO_UNIMODAL_ROAD:
+                            add_term(model.TransfCostConstr, (t,s), transfer_cost*h)
+                        for (i,m) in terminals:
+                            add_term(model.TerminalCap, (i,m,t,s), h)
+                    if nonanticipativity and (t in data.T_TIME_FIRST_STAGE):
+                        for (s,ss) in data.SS_SCENARIOS_NONANT:
+                            model.Nonanticipativity_h_Constr.index_set().add((k,p,t,s,ss))
+                            model.Nonanticipativity_h_Constr[(k,p,t,s,ss)] = (-ABSOLUTE_DEVIATION_NONANT, 
+                                model.h_path[(k,p,t,s)] - model.h_path[(k,p,t,ss)], ABSOLUTE_DEVIATION_NONANT)
+            for v in data.V_VEHICLE_TYPES:
+                for t in data.T_TIME_PERIODS:
+                    for s in data.S_SCENARIOS:
+                        model.h_path_balancing.index_set().add((k,v,t,s))
+                        h_balancing = model.h_path_balancing[(k,v,t,s)]
+                        h_balancing.value = 1
+                        if self.NoBalancingTrips:
+                            h_balancing.fix(0)
+                        elif len(transfers) == 0:
+                            for a in path:
+                                add_term(model.PathArcRelBalance, a + (v,t,s), -h_balancing)
+                    if nonanticipativity and (t in data.T_TIME_FIRST_STAGE):
+                        for (s,ss) in data.SS_SCENARIOS_NONANT:
+                            model.Nonanticipativity_h_bal_Constr.index_set().add((k,v,t,s,ss))
+                            model.Nonanticipativity_h_bal_Constr[(k,v,t,s,ss)] = (-ABSOLUTE_DEVIATION_NONANT, 
+                                model.h_path_balancing[(k,v,t,s)] - model.h_path_balancing[(k,v,t,ss)], ABSOLUTE_DEVIATION_NONANT)
+
+        for constraint, terms in new_terms.items():
+            constraint.set_value((constraint.lower, constraint.body + sum(terms), constraint.upper))
+        return new_paths
@@ -1,35 +1,26 @@
-import ast
 import pickle
 import pandas as pd
 import networkx as nx
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
-import chardet
+from Data.path_store import PathStore, run_path_store
 
 
 scenario_tree = "FuelScen"     # Options: 4Scen, 9Scen, AllScen
 
-generated_paths_file = "generated_paths_2_modes.csv"     # Select the current created paths file
+run_identifier = "FuelScen_carbontaxbase_SP"     # Select the model run (its results and paths, see Data/path_store.py)
 
 show_plot = True # Set to True to show the plot
 
 # Load the pickle file
 
 file_path = r"Data//output//SP_" + scenario_tree + ".pickle"
-file_path = "Data/Output/FuelScen_carbontaxbase_SP_results.pickle"
+file_path = "Data/Output/" + run_identifier + "_results.pickle"
 
 with open(file_path, 'rb') as file:
     output_data = pickle.load(file)
     
-generated_paths_file = r"Data//SPATIAL//" + generated_paths_file
-
-
-with open(generated_paths_file, 'rb') as file:
-    raw_data = file.read(10000)  # Read a sample
-    detected = chardet.detect(raw_data)
-    print(detected)
-
-generated_paths = pd.read_csv(generated_paths_file, encoding='ISO-8859-1')
+generated_paths = PathStore(run_path_store(run_identifier)).frame()
 
 
 
@@ -63,9 +54,6 @@ h_path_sum = h_path.groupby(['path']).sum().reset_index()
 #find the number of row with weight close to 0
 print("Number of row where the value of the weight transported are <= 0.0001: ",h_path_sum[h_path_sum['weight'] <=0.0001].shape[0])
 
-#Set the paths column in generated_paths to a list of touples
-generated_paths['paths'] = generated_paths['paths'].apply(ast.literal_eval)
-
 #join h_path_sum and generated_paths on column 'path' in h_path_sum and the index of generated_paths
 h_path_sum = h_path_sum.join(generated_paths, on='path')
 
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Solver backends
+
+The solver options of TranspModel.solve_model are given with Gurobi's names (FeasibilityTol, MIPGap, NumericFocus, Crossover,
+Method, NodeMethod, BarConvTol). solver_options translates them to the options of the selected solver (SOLVER in settings).
+"""
+
+import pyomo.opt
+
+from Data.settings import *
+
+
+#solver: (Pyomo interface, persistent Pyomo interface). HiGHS is solved in memory in both cases (APPSI)
+SOLVER_INTERFACES = {"gurobi": ("gurobi", "appsi_gurobi"),
+                     "highs": ("appsi_highs", "appsi_highs")}
+
+
+def solver_interface(solver, persistent=False):
+    if solver not in SOLVER_INTERFACES:
+        raise ValueError(f"unknown solver {solver}, choose from {list(SOLVER_INTERFACES)}")
+    return SOLVER_INTERFACES[solver][1 if persistent else 0]
+
+def solver_available(solver, persistent=False):
+    return pyomo.opt.SolverFactory(solver_interface(solver, persistent)).available(exception_flag=False)
+
+def solver_options(solver, FeasTol=(10**(-2)), MIP_gap=MIPGAP, num_focus=0, Crossover=-1, Method=-1, NodeMethod=-1,
+                   BarConvTol=1E-8, threads=SOLVER_THREADS):
+    # options of solver for the (Gurobi) settings of solve_model. threads: 0 is automatic
+
+    if solver == "gurobi":
+        options = {"FeasibilityTol": FeasTol,
+                   "MIPGap": MIP_gap,
+                   "NumericFocus": num_focus,
+                   "BarConvTol": BarConvTol,
+                   "Crossover": Crossover,
+                   "Method": Method,
+                   "NodeMethod": NodeMethod}
+        if threads > 0:
+            options["Threads"] = threads
+        return options
+
+    if solver == "highs":
+        # Method: -1 automatic, 0 primal simplex, 1 dual simplex, 2 barrier (interior point), 3/4 concurrent (not in HiGHS: automatic),
+        # 5 deterministic concurrent simplex (HiGHS: dual simplex). The dual simplex runs in parallel (PAMI) unless threads = 1.
+        # HiGHS has no equivalent of NumericFocus and NodeMethod (the nodes of the MIP are solved with the dual simplex).
+        options = {"primal_feasibility_tolerance": FeasTol,
+                   "mip_rel_gap": MIP_gap,
+                   "ipm_optimality_tolerance": BarConvTol,
+                   "threads": threads}
+        parallel = threads != 1
+        if Method in [0, 1, 5]:
+            options["solver"] = "simplex"
+            options["simplex_strategy"] = 4 if Method == 0 else (2 if parallel else 1)   #4: primal, 2: parallel dual (PAMI), 1: dual
+        elif Method == 2:
+            options["solver"] = "ipm"
+        else:
+            options["solver"] = "choose"
+        options["parallel"] = "on" if parallel else "off"
+        if Crossover == 0:
+            options["run_crossover"] = "off"
+        elif Crossover > 0:
+            options["run_crossover"] = "on"
+        return options
+
+    raise ValueError(f"unknown solver {solver}, choose from {list(SOLVER_INTERFACES)}")
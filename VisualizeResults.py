@@ -1,5 +1,5 @@
-import chardet
 from Data.settings import *
+from Data.path_store import PathStore, run_path_store
 
 import matplotlib.pyplot as plt
 from matplotlib.pyplot import cm
@@ -415,14 +415,8 @@ def plot_avg_transportwork(output,base_data, run_identifier):
         INTERVAL_SIZE = 200
         remove_dry_bulk = False
         
-        #Getting the generated paths that are currently used in the model
-        generated_paths_file = "generated_paths_2_modes.csv"     # Select the current created paths file
-        generated_paths_file = r"Data//SPATIAL//" + generated_paths_file
-        with open(generated_paths_file, 'rb') as f:
-            result = chardet.detect(f.read())
-
-        generated_paths = pd.read_csv(generated_paths_file, encoding=result['encoding'])
-        generated_paths['paths'] = generated_paths['paths'].apply(ast.literal_eval)
+        #Getting the generated paths of the model run (stored with its results)
+        generated_paths = PathStore(run_path_store(run_identifier)).frame()
 
         #Getting the average distance for each leg
         avg_distance = base_data.AVG_DISTANCE
@@ -622,7 +616,7 @@ def visualize_results(analyses_type,scenario_tree,
     
     plot_costs(base_data, output,which_costs=opex_variables,ylabel="Annual costs ("+currency+")",filename="opex",run_identifier=run_identifier2 )
     plot_costs(base_data, output,investment_variables,"Investment costs ("+currency+")","investment",run_identifier=run_identifier2)
-    #plot_avg_transportwork(output,base_data,run_identifier)
+    #plot_avg_transportwork(output,base_data,run_identifier2)
 
     #---------------------------------------------------------#
     #       EMISSIONS 
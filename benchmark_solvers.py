@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the solver backends (see Solvers.py): the same STraM instance is constructed and solved with each backend,
+and the wall times of constructing and solving are compared.
+"""
+
+import sys
+import time
+
+import pandas as pd
+from pyomo.environ import value
+
+from Data.ConstructData import TransportSets, get_scen_sheet_name
+from Data.interpolate import interpolate
+from Data.settings import *
+from Model import TranspModel, RiskInformation
+from MatrixModel import MatrixModel
+from Solvers import solver_available
+
+#################################################
+#                   user input                  #
+#################################################
+
+scenario_tree = "FuelScen"
+co2_fee = "base"
+time_periods = [2023, 2028, 2034, 2040, 2050]
+num_first_stage_periods = 2
+
+benchmark_time_periods = [2023]   #time periods of the instance (None: all)
+benchmark_scenarios = None        #scenarios of the instance (None: all scenarios of the scenario tree)
+
+cvar_coeff = 0.3
+cvar_alpha = 0.8
+FeasTol = 10**(-2)
+
+#backend: (solver, model, solver settings with Gurobi's names, see Solvers.py). model: "pyomo" (TranspModel) or "matrix" (MatrixModel)
+backends = {"gurobi":                        ("gurobi", "pyomo", {}),
+            "highs":                         ("highs", "pyomo", {}),
+            "highs (dual simplex)":          ("highs", "pyomo", {"Method": 1, "threads": 1}),
+            "highs (parallel dual simplex)": ("highs", "pyomo", {"Method": 1}),
+            "highs (interior point)":        ("highs", "pyomo", {"Method": 2}),
+            "highs (matrix model)":          ("highs", "matrix", {}),
+            }
+
+#################################################
+#                   main code                   #
+#################################################
+
+def benchmark(data, risk_info, backends):
+    results = []
+    for name, (solver, model, options) in backends.items():
+        if not solver_available(solver):
+            print(f"Skipping {name}: {solver} is not available", flush=True)
+            continue
+        print("-----")
+        print(f"Benchmark: {name}", flush=True)
+
+        start = time.time()
+        if model == "pyomo":
+            model_instance = TranspModel(data=data, risk_info=risk_info)
+            model_instance.solver = solver
+            model_instance.construct_model()
+        else:
+            model_instance = MatrixModel(data=data, risk_info=risk_info)
+            model_instance.construct_model()
+        construction_time = time.time() - start
+
+        start = time.time()
+        if model == "pyomo":
+            model_instance.solve_model(FeasTol=FeasTol, **options)
+            objective = value(model_instance.model.objective_function)
+        else:
+            objective = model_instance.solve_model(FeasTol=FeasTol, **options)
+        solution_time = time.time() - start
+
+        results.append({"backend": name, "construction time": construction_time, "solution time": solution_time,
+                        "total time": construction_time + solution_time, "objective": objective})
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+
+    print("Reading data...", flush=True)
+    base_data = TransportSets(sheet_name_scenarios=get_scen_sheet_name(scenario_tree), co2_fee=co2_fee)
+    base_data = interpolate(base_data, time_periods, num_first_stage_periods)
+    data = base_data.view(time_periods=benchmark_time_periods, scenarios=benchmark_scenarios)
+    risk_info = RiskInformation(cvar_coeff, cvar_alpha)
+    print(f"Instance: {scenario_tree}, time periods {data.T_TIME_PERIODS}, scenarios {data.S_SCENARIOS}", flush=True)
+
+    results = benchmark(data, risk_info, backends)
+
+    print("-----")
+    print(results.to_string(index=False))
+    results.to_csv(r"Data//Output//solver_benchmark_" + scenario_tree + ".csv", index=False)
+    sys.stdout.flush()
@@ -1,8 +1,467 @@
 import pandas as pd
 import numpy as np
 
-from dijkstar import Graph, find_path
-import pickle
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path, NegativeCycleError
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from Data.path_store import save_path_store, path_store_exists, PathStore
+
+
+def all_pairs_shortest_paths(num_nodes, arcs, costs, origins=None):
+    # shortest distances and predecessors between all pairs of nodes (one Dijkstra run per origin)
+    # arcs is a list of (o,d) node numbers, costs the corresponding arc costs (no parallel arcs)
+    # dist[o,d] = np.inf and pred[o,d] = -9999 if d cannot be reached from o
+    # if origins is given, only the rows of these origins are computed
+    rows = [o for (o,d) in arcs]
+    cols = [d for (o,d) in arcs]
+    graph = csr_matrix((np.asarray(costs, dtype=float), (rows, cols)), shape=(num_nodes, num_nodes))
+    dist, pred = shortest_path(graph, method="D", directed=True, return_predecessors=True, indices=origins)
+    return dist, pred
+
+def affected_origins(dist, pred, changed_arcs, arc_costs):
+    # origins whose shortest paths can change when the arcs (u,v) in changed_arcs are added, removed or change cost:
+    # - the current shortest path tree of the origin uses (u,v), or
+    # - the new arc (u,v) is at least as good as the current route from the origin to v
+    # arc_costs are the new arc costs (removed arcs are not in there)
+    affected = np.zeros(dist.shape[0], dtype=bool)
+    for (u,v) in changed_arcs:
+        affected |= pred[:, v] == u
+        if (u,v) in arc_costs:
+            affected |= dist[:, u] + arc_costs[(u,v)] <= dist[:, v]
+    return np.flatnonzero(affected)
+
+def path_from_predecessors(pred, o, d, row=None):
+    # node numbers on the shortest path from o to d (empty if there is none)
+    # row: the row of origin o in pred (if only some origins were computed)
+    row = o if row is None else row
+    if o == d or pred[row,d] < 0:
+        return []
+    path = [d]
+    while path[-1] != o:
+        path.append(pred[row,path[-1]])
+    return path[::-1]
+
+def min_plus(first, second, offset, feasible=None):
+    # min-plus product: best[o,d] = min_n first[o,n] + second[n,d] + offset, over the feasible (o,n,d)
+    # mid_point[o,d] is the first n (in node order) that attains the minimum
+    cost = first[:, :, None] + second[None, :, :] + offset     #(o,n,d)
+    if feasible is not None:
+        cost[~feasible] = np.inf
+    mid_point = np.argmin(cost, axis=1)
+    best = np.take_along_axis(cost, mid_point[:, None, :], axis=1)[:, 0, :]
+    return best, mid_point
+
+def unimodal_shortest_paths(network, mode_cost, previous=None, changed_arcs=None):
+    # all-pairs shortest paths per mode (using minimum distance as edge cost): {m: (dist, pred)}, node numbers as index
+    # incremental update: previous is the result for the same mode costs on the network before the change, 
+    # changed_arcs[m] the (o,d) node numbers of the arcs of mode m that were added, removed or changed length.
+    # Only the origins that can be affected by the changes are recomputed (and only the multimodal paths that use
+    # the changed rows, see gen_paths).
+    nodes, node_nr, modes = network["nodes"], network["node_nr"], network["modes"]
+    distance, adj_map = network["distance"], network["adj_map"]
+    uni = {}
+    for m in modes:
+        arcs = [(node_nr[o],node_nr[d]) for o in nodes for d in sorted(adj_map[(o,m)], key=node_nr.get)]
+        arc_costs = [distance[(nodes[o],nodes[d],m)]*mode_cost[m] for (o,d) in arcs]
+        if previous is None:
+            uni[m] = all_pairs_shortest_paths(len(nodes), arcs, arc_costs)
+        elif not changed_arcs.get(m):
+            uni[m] = previous[m]
+        else:
+            dist, pred = previous[m][0].copy(), previous[m][1].copy()
+            origins = affected_origins(dist, pred, changed_arcs[m], dict(zip(arcs, arc_costs)))
+            if len(origins) > 0:
+                dist[origins], pred[origins] = all_pairs_shortest_paths(len(nodes), arcs, arc_costs, origins)
+            uni[m] = (dist, pred)
+    return uni
+
+def mode_combinations(modes, mode_comb_level):
+    # the sequences of modes of the generated paths, the single modes first (mode combination nr m is mode m)
+    combinations = [(m,) for m in modes]
+    if mode_comb_level >= 2:
+        combinations += [(m1, m2) for m1 in modes for m2 in modes if m1 != m2]
+    if mode_comb_level >= 3:
+        combinations += [(m1, m2, m3) for m1 in modes for m2 in modes for m3 in modes if m1 != m2 and m2 != m3]
+    return combinations
+
+def double_route_copy(path, edges_with_double_route):
+    # copy of the path with route 2 on the last leg that has a second route (hamar-trondheim railway), None if there is none
+    # (the copy gets the same path length, only minor difference in reality)
+    which_leg = None
+    for l, (i,j,m,r) in enumerate(path):
+        if ((i,j,m,2) in edges_with_double_route) or ((j,i,m,2) in edges_with_double_route):
+            which_leg = l
+    if which_leg is None:
+        return None
+    new_path = list(path)
+    new_path[which_leg] = path[which_leg][:3] + (2,)
+    return tuple(new_path)
+
+def gen_paths(network,                  #static network data (see path_generation)
+              mode_cost,                #this depends on the scenario/fuel/etc
+              transfer_cost,            #is a dictionary (m1,m2):cost
+              mode_comb_level,
+              uni=None,                 #unimodal shortest paths (see unimodal_shortest_paths), computed if None
+              previous=None):           #(uni, mc_dist, mc_path) of the same costs on the network before the change
+    # shortest path for every OD pair and mode combination (see mode_combinations), combined from the unimodal shortest paths
+    # returns mc_dist[mc,o,d] (max_dist if there is no path), mc_path[mc,o,d] (index in generated_paths, -1 if there is no path)
+    # and the generated paths (tuples, with the route 2 copies)
+    # Incremental update: the mc_path of previous are indices in network["previous_paths"]. Only the entries that can change 
+    # are recomputed: the unimodal entries in the rows (origins) with other shortest paths, and the multimodal (o,d) for which 
+    # row o of the first part or column d of the second part changed (the min-plus product only depends on these).
+    nodes, modes = network["nodes"], network["modes"]
+    edges_with_double_route = network["edges_with_double_route"]
+    N = len(nodes)
+    max_dist = 999999.0
+    combinations = mode_combinations(modes, mode_comb_level)
+    mc_nr = {combination: nr for nr, combination in enumerate(combinations)}
+    off_diagonal = ~np.eye(N, dtype=bool)   #don't make loops
+
+    if uni is None:
+        uni = unimodal_shortest_paths(network, mode_cost)
+    if previous is None:
+        mc_dist = np.full((len(combinations), N, N), max_dist)
+        num_legs = np.zeros((len(combinations), N, N), dtype=np.int64)
+    else:
+        previous_uni, previous_dist, previous_path = previous
+        previous_paths = network["previous_paths"]
+        previous_nr = previous_path.tolist()
+        mc_dist = previous_dist.copy()
+        num_legs = network["previous_num_legs"][previous_path]
+    changed = np.zeros((len(combinations), N, N), dtype=bool)   #other path or distance than in previous (without previous: all paths)
+    new_paths = {}      #(mc,o,d): path, for the recomputed entries
+
+    def path(mc, o, d):
+        if (mc,o,d) in new_paths:
+            return new_paths[(mc,o,d)]
+        if previous is None or previous_nr[mc][o][d] < 0:
+            return ()
+        return previous_paths[previous_nr[mc][o][d]]
+
+    def set_paths(mc, entries):
+        # set the recomputed entries [(o, d, path, dist)] of mode combination mc
+        if len(entries) == 0:
+            return
+        origins, destinations, paths, dists = zip(*entries)
+        if previous is None:
+            changed[mc, origins, destinations] = True
+        else:
+            changed[mc, origins, destinations] = (np.array(dists) != previous_dist[mc, origins, destinations]) | \
+                np.array([new_path != path(mc, o, d) for (o, d, new_path, dist) in entries])
+        new_paths.update(((mc, o, d), new_path) for (o, d, new_path, dist) in entries)
+        mc_dist[mc, origins, destinations] = dists
+        num_legs[mc, origins, destinations] = [len(new_path) for new_path in paths]
+
+    #uni-modal paths
+    for m in modes:
+        dist, pred = uni[m]
+        if previous is None:
+            origins = range(N)
+        else:
+            origins = np.flatnonzero(np.any((dist != previous_uni[m][0]) | (pred != previous_uni[m][1]), axis=1)).tolist()
+        entries = []
+        for o in origins:
+            dist_row = dist[o].tolist()
+            for d in range(N):
+                if o != d: #don't make loops
+                    new_path = ()
+                    if dist_row[d] < max_dist:   #remove "fake" paths (that don't exist)
+                        node_path = path_from_predecessors(pred, o, d)
+                        #HARDCODED: route number 1 (we add number 2 later, only for hamar-trondheim railway)
+                        new_path = tuple((nodes[i], nodes[j], m, 1) for (i,j) in zip(node_path[:-1], node_path[1:]))
+                    entries.append((o, d, new_path, dist_row[d] if dist_row[d] < np.inf else max_dist))
+        set_paths(mc_nr[(m,)], entries)
+
+    #multimodal paths: best mid-point n for every (o,d), with the first mode (mc1) and the other modes (mc2, done before) 
+    #two-mode paths only use unimodal paths with at least two legs 
+    for mc, combination in enumerate(combinations):
+        if len(combination) == 1:
+            continue
+        mc1, mc2 = mc_nr[combination[:1]], mc_nr[combination[1:]]
+        cost = transfer_cost[combination[:2]]
+        feasible = None
+        if len(combination) == 2:
+            feasible = (num_legs[mc1] > 1)[:, :, None] & (num_legs[mc2] > 1)[None, :, :]
+        if previous is None:
+            rows, cols = list(range(N)), []
+        else:
+            rows, cols = np.flatnonzero(changed[mc1].any(axis=1)).tolist(), np.flatnonzero(changed[mc2].any(axis=0)).tolist()
+        best = {}   #(o,d): (best distance, mid-point)
+        if len(rows) > 0:
+            best_dist, best_mid_point = min_plus(mc_dist[mc1][rows], mc_dist[mc2], cost, None if feasible is None else feasible[rows])
+            for o, dist_row, mid_point_row in zip(rows, best_dist.tolist(), best_mid_point.tolist()):
+                best.update(((o,d), value) for d, value in enumerate(zip(dist_row, mid_point_row)))
+        if len(cols) > 0:
+            best_dist, best_mid_point = min_plus(mc_dist[mc1], mc_dist[mc2][:, cols], cost, None if feasible is None else feasible[:, :, cols])
+            for o, dist_row, mid_point_row in zip(range(N), best_dist.tolist(), best_mid_point.tolist()):
+                best.update(((o,d), value) for d, value in zip(cols, zip(dist_row, mid_point_row)))
+        first_dist, second_dist = mc_dist[mc1].tolist(), mc_dist[mc2].tolist()
+        entries = []
+        for (o,d), (dist, n) in best.items():
+            if o != d and dist < max_dist:
+                #combine the best first and second part of the path
+                entries.append((o, d, path(mc1, o, n) + path(mc2, n, d), first_dist[o][n] + second_dist[n][d] + cost))
+            elif o != d:
+                entries.append((o, d, (), max_dist))
+        set_paths(mc, entries)
+
+    #make list of generated paths, with a copy for the hamar-trondheim railway if it is used:
+    #first the previous paths that are still used (and their copies, see network["previous_copies"]), then the new paths
+    generated_paths = []
+    mc_path = np.full((len(combinations), N, N), -1, dtype=np.int32)
+    if previous is not None:
+        reused = previous_path.copy()
+        for (mc,o,d) in new_paths:
+            reused[mc,o,d] = -1
+        previous_nrs = np.unique(reused[reused >= 0])
+        mc_path[reused >= 0] = np.searchsorted(previous_nrs, reused[reused >= 0])
+        generated_paths = [previous_paths[k] for k in previous_nrs.tolist()]
+        generated_paths += [copy for copy in (network["previous_copies"][k] for k in previous_nrs.tolist()) if copy is not None]
+    for (mc,o,d), shortest_path in new_paths.items():
+        if len(shortest_path) > 0:
+            mc_path[mc,o,d] = len(generated_paths)
+            generated_paths.append(shortest_path)
+            copy = double_route_copy(shortest_path, edges_with_double_route)
+            if copy is not None:
+                generated_paths.append(copy)
+
+    return mc_dist, mc_path, generated_paths
+
+
+#path generation in worker processes: the static network data is sent to every worker once (see path_generation)
+_worker_network = None
+
+def init_worker(network):
+    global _worker_network
+    _worker_network = network
+
+def generate_configuration_paths(configuration, network=None):
+    # generated paths (as tuples) for one (mode_cost, transfer_cost, mode_comb_level, previous, changed_arcs) configuration,
+    # and the state to store with the paths: the unimodal shortest paths (dist and pred, stacked over the modes) and 
+    # mc_dist and mc_path of gen_paths (mc_path: index in the generated paths)
+    mode_cost, transfer_cost, mode_comb_level, previous, changed_arcs = configuration
+    network = network if network is not None else _worker_network
+    uni = unimodal_shortest_paths(network, mode_cost, None if previous is None else previous[0], changed_arcs)
+    mc_dist, mc_path, generated_paths = gen_paths(network, mode_cost, transfer_cost, mode_comb_level, uni, previous)
+    state = (np.stack([uni[m][0] for m in network["modes"]]), np.stack([uni[m][1] for m in network["modes"]]), mc_dist, mc_path)
+    return generated_paths, state
+
+def generate_paths(configurations, network, workers):
+    # run the path generation for all configurations (in parallel if workers > 1)
+    # returns all generated paths (sorted) and the state per configuration, with mc_path as index in the sorted paths
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(network,)) as executor:
+            chunksize = max(1, len(configurations) // (4*workers))
+            results = list(executor.map(generate_configuration_paths, configurations, chunksize=chunksize))
+    else:
+        results = [generate_configuration_paths(configuration, network) for configuration in configurations]
+    all_gen_paths = set()
+    for generated_paths, state in results:
+        all_gen_paths.update(generated_paths)
+    #deterministic order (independent of the number of workers and of earlier artifacts): the artifact of a key is always the same
+    all_gen_paths = sorted(all_gen_paths)
+    path_nr = {path: nr for nr, path in enumerate(all_gen_paths)}
+    states = []
+    for generated_paths, (dist, pred, mc_dist, mc_path) in results:
+        sorted_nr = np.array([path_nr[path] for path in generated_paths] + [-1], dtype=np.int32)   #-1: no path
+        states.append((dist, pred, mc_dist, sorted_nr[mc_path]))
+    return all_gen_paths, states
+
+def hop_bounded_shortest_paths(num_vertices, rows, cols, costs, sources, max_hops):
+    # shortest walks with at most max_hops arcs from each source (Bellman-Ford by number of arcs, also with negative cycles)
+    # dist[h][o_index,v]: shortest walk from sources[o_index] to v with exactly h arcs, pred[h][o_index,v]: its last but one vertex
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    dist = [np.full((len(sources), num_vertices), np.inf)]
+    dist[0][np.arange(len(sources)), sources] = 0
+    pred = [np.full((len(sources), num_vertices), -9999)]
+    for h in range(max_hops):
+        candidate = dist[-1][:, rows] + costs      #(source, arc)
+        new_dist = np.full((len(sources), num_vertices), np.inf)
+        np.minimum.at(new_dist, (np.arange(len(sources))[:, None], cols[None, :]), candidate)
+        new_pred = np.full((len(sources), num_vertices), -9999)
+        o_index, arc = np.nonzero((candidate == new_dist[:, cols]) & (candidate < np.inf))
+        new_pred[o_index, cols[arc]] = rows[arc]
+        dist.append(new_dist)
+        pred.append(new_pred)
+    return dist, pred
+
+def elementary_shortest_path(graph, num_nodes, start, target, lower_bound, bound, max_labels):
+    # cheapest walk from vertex start to vertex target (of a layered graph, see layered_shortest_paths) that does not visit 
+    # a network node (vertex % num_nodes) twice, with cost < bound. Branch and bound (depth first) on the partial walks.
+    # lower_bound[h,v]: lower bound on the cost from v to target with at most h arcs (len(lower_bound)-1 arcs in total)
+    # returns (cost, walk) or None, and whether the search was complete (at most max_labels partial walks)
+    max_hops = len(lower_bound) - 1
+    best_cost, best_walk = bound, None
+    stack = [(0.0, [start], {start % num_nodes})]
+    num_labels = 0
+    while len(stack) > 0:
+        cost, walk, visited = stack.pop()
+        v = walk[-1]
+        if v == target:
+            if cost < best_cost:
+                best_cost, best_walk = cost, walk
+            continue
+        num_labels += 1
+        if num_labels > max_labels:
+            return (None if best_walk is None else (best_cost, best_walk)), False
+        remaining = max_hops - len(walk)      #number of arcs after the next one
+        for nr in range(graph.indptr[v], graph.indptr[v+1]):
+            w, c = graph.indices[nr], graph.data[nr]
+            n = w % num_nodes
+            if (n != v % num_nodes and n in visited) or remaining < 0 or cost + c + lower_bound[remaining, w] >= best_cost:
+                continue
+            stack.append((cost + c, walk + [w], visited | {n}))
+    return (None if best_walk is None else (best_cost, best_walk)), True
+
+def layered_shortest_paths(num_nodes, num_modes, arcs, arc_costs, first_costs, last_costs, transfer_costs, mode_comb_level, bound,
+                           max_labels=10**5):
+    # shortest elementary paths (no node twice) with at most mode_comb_level legs (consecutive legs with a different mode), 
+    # in a layered graph with one copy of the network per leg. Used to price new paths (costs can be negative, see TranspModel.price_paths)
+    # arcs: list of (o,d,m) node and mode numbers (no parallel arcs), arc_costs: the corresponding costs
+    # first_costs[o,m]/last_costs[d,m]: cost of starting in o/ending in d with mode m
+    # transfer_costs[i,m1,m2]: cost of a transfer from mode m1 to mode m2 in node i
+    # returns {(o,d): (cost, [(i,j,m), ...])} for the paths with cost < bound[o,d] (o != d), and whether this is exact.
+    # If the shortest walk visits a node twice, the shortest elementary path is searched with elementary_shortest_path; 
+    # the result is not exact if that search stops at max_labels partial walks.
+    N, M, L = num_nodes, num_modes, mode_comb_level
+    layer_node = lambda n, m, l: (l*M + m)*N + n
+    source, sink = L*M*N, L*M*N + N
+    rows, cols, costs = [], [], []
+    def add(o, d, cost):
+        rows.append(o)
+        cols.append(d)
+        costs.append(cost)
+    for l in range(L):
+        for (o,d,m), cost in zip(arcs, arc_costs):
+            add(layer_node(o,m,l), layer_node(d,m,l), cost)
+        for n in range(N):
+            for m in range(M):
+                if l == 0:
+                    add(source + n, layer_node(n,m,l), first_costs[n,m])
+                add(layer_node(n,m,l), sink + n, last_costs[n,m])
+                if l < L-1:
+                    for m2 in range(M):
+                        if m2 != m:
+                            add(layer_node(n,m,l), layer_node(n,m2,l+1), transfer_costs[n,m,m2])
+    costs = np.asarray(costs, dtype=float)
+    origins = [o for o in range(N) if np.any(bound[o] > -np.inf)]
+    if len(origins) == 0:
+        return {}, True
+    graph = csr_matrix((costs, (rows, cols)), shape=(sink + N, sink + N))
+    walks = {}     #(o,d): (cost, layered walk: source, layer nodes ..., sink)
+    try:
+        dist, pred = shortest_path(graph, method="J", directed=True, return_predecessors=True, indices=[source + o for o in origins])
+        for o_index, o in enumerate(origins):
+            for d in range(N):
+                if d != o and dist[o_index, sink + d] < bound[o,d]:
+                    walks[(o,d)] = (dist[o_index, sink + d].item(), path_from_predecessors(pred, source + o, sink + d, o_index))
+    except NegativeCycleError:
+        #shortest walks with at most as many arcs as an elementary path (N-1 network arcs, L-1 transfers, first and last arc)
+        print("Pricing: negative cycle in the layered graph, hop-bounded search")
+        hop_dist, hop_pred = hop_bounded_shortest_paths(sink + N, rows, cols, costs, [source + o for o in origins], N + L)
+        hop_dist = np.array(hop_dist)      #(hops, origin, vertex)
+        for o_index, o in enumerate(origins):
+            for d in range(N):
+                hops = int(np.argmin(hop_dist[:, o_index, sink + d]))
+                if d != o and hop_dist[hops, o_index, sink + d] < bound[o,d]:
+                    walk = [sink + d]
+                    for h in range(hops, 0, -1):
+                        walk.append(hop_pred[h][o_index, walk[-1]])
+                    walks[(o,d)] = (hop_dist[hops, o_index, sink + d].item(), walk[::-1])
+    def network_path(layered_path):
+        legs = [(v % N, v // N) for v in layered_path[1:-1]]             #(node, mode and layer)
+        return [(i, j, lm % M) for (i, lm), (j, lm2) in zip(legs[:-1], legs[1:]) if lm == lm2]
+
+    paths = {}
+    not_elementary = []
+    for (o,d), (cost, layered_path) in walks.items():
+        path = network_path(layered_path)
+        nodes = [o] + [j for (i, j, m) in path]
+        if len(path) > 0 and len(set(nodes)) == len(nodes):
+            paths[(o,d)] = (cost, path)
+        else:
+            not_elementary.append((o,d))
+    
+    exact = True
+    if len(not_elementary) > 0:
+        #lower bounds on the cost to the sinks (walks with at most h arcs, backwards from the sink)
+        max_hops = N + L
+        destinations = sorted({d for (o,d) in not_elementary})
+        back_dist, back_pred = hop_bounded_shortest_paths(sink + N, cols, rows, costs, [sink + d for d in destinations], max_hops)
+        lower_bound = np.minimum.accumulate(np.array(back_dist), axis=0)      #(hops, destination, vertex)
+        for (o,d) in not_elementary:
+            result, complete = elementary_shortest_path(graph, N, source + o, sink + d, lower_bound[:, destinations.index(d), :], 
+                                                        bound[o,d], max_labels)
+            exact = exact and complete
+            if result is not None:
+                paths[(o,d)] = (result[0], network_path(result[1]))
+    return paths, exact
+
+def cost_configuration(mode_cost, transfer_cost, digits=12):
+    # canonical (memo) key of the costs in gen_paths: the shortest paths only depend on the ratios between the
+    # mode costs and the transfer costs, so all costs are scaled by the largest mode cost
+    scale = max(mode_cost.values())
+    if scale <= 0:
+        scale = 1.0
+    return (tuple(round(c/scale, digits) for m, c in sorted(mode_cost.items())),
+            tuple(round(c/scale, digits) for mm, c in sorted(transfer_cost.items())))
+
+def arc_distances(edges, distances):
+    # distance of the (route 1) arcs in both directions, {(i,j,m): distance}
+    distance = {}
+    for (i,j,m,r) in edges:
+        distance[(i,j,m)] = distances[(i,j,m,1)]
+        distance[(j,i,m)] = distances[(i,j,m,1)]
+    return distance
+
+def load_previous_paths(cache_dir, cost_key, edges, distances):
+    # the most recent path artifact in cache_dir that was generated with the same inputs, except for the edges 
+    # and distances (same cost_key), together with the arcs that changed since then (None if there is none)
+    candidates = []
+    for name in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+        file_name = os.path.join(cache_dir, name[:-len(".json")])
+        if name.endswith(".json") and os.path.exists(file_name + ".npz") and path_store_exists(file_name):
+            if "mc_path" not in np.load(file_name + ".npz").files:    #stored without the multimodal state
+                continue
+            with open(file_name + ".json") as f:
+                metadata = json.load(f)
+            if metadata.get("cost_key") == cost_key:
+                candidates.append((metadata["created"], file_name, metadata))
+    if len(candidates) == 0:
+        return None
+    created, file_name, metadata = max(candidates)
+    old_distance = arc_distances([tuple(e[:4]) for e in metadata["edges"]], {tuple(e[:4]): e[4] for e in metadata["edges"]})
+    new_distance = arc_distances(edges, distances)
+    changed_arcs = {}
+    for (i,j,m) in set(old_distance) | set(new_distance):
+        if old_distance.get((i,j,m)) != new_distance.get((i,j,m)):
+            changed_arcs.setdefault(m, set()).add((i,j))
+    store = PathStore(file_name)
+    state = np.load(file_name + ".npz")
+    print(f"Path generation: updating the paths in {file_name} ({sum(len(arcs) for arcs in changed_arcs.values())} changed arcs)")
+    return {"paths": store.paths(), "ids": store.ids.tolist(), "keys": list(state["keys"]), "dist": state["dist"], "pred": state["pred"], 
+            "mc_dist": state["mc_dist"], "mc_path": state["mc_path"], "changed_arcs": changed_arcs, "key": metadata["key"]}
+
+def canonical(value):
+    # deterministic representation of the path generation inputs (dicts and sets in sorted order)
+    if isinstance(value, dict):
+        return sorted((canonical(k), canonical(v)) for k, v in value.items())
+    if isinstance(value, (set, frozenset)):
+        return sorted(canonical(v) for v in value)
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical(v) for v in value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def path_generation_key(**inputs):
+    # content hash of all inputs of path_generation (used to name the path artifact)
+    return hashlib.sha1(repr(canonical(inputs)).encode('utf-8')).hexdigest()[:16]
 
 def path_generation(products,
                     p_to_pc, 
@@ -16,7 +475,12 @@ def path_generation(products,
                     emission_fee,           #CO2_fee[y]    
                     prod_transfer_costs,    #TRANSFER_COST_PER_MODE_PAIR[(m1,m2,pc)]
                     mode_to_fuels,           #FM_FUEL
-                    mode_comb_level         #NUM_MODE_PATHS
+                    mode_comb_level,        #NUM_MODE_PATHS
+                    workers=1,              #PATH_GENERATION_WORKERS (number of processes, 1: no parallelization)
+                    file_name=None,         #file name of the path artifact (without extension)
+                    metadata=None,          #stored as <file_name>.json next to the artifact
+                    previous=None,          #incremental update of earlier generated paths (see load_previous_paths)
+                    check=False             #PATH_INCREMENTAL_CHECK (compare an incremental update with a full recompute)
                     ):
 
     #node_dict = {zone: centroid for zone, centroid in zip(df_zones['zone_nr'], df_zones['centroid_name'])}   #REMOVE, do everything with names
@@ -31,10 +495,10 @@ def path_generation(products,
     #distance_mapping
     max_dist = 999999.0
     distance = {(i,j,m):max_dist for i in nodes for j in nodes for m in modes}
-    for (i,j,m,r) in edges: #this now excludes the double routes
-        distance[(i,j,m)] = distances[(i,j,m,1)]
-        distance[(j,i,m)] = distances[(i,j,m,1)]
+    distance.update(arc_distances(edges, distances))
     
+    node_nr = {n:nr for nr, n in enumerate(nodes)}
+
     #make adjacency list 
     adj_map = {(i,m):set() for i in nodes for m in modes}
     for (i,j,m,r) in edges:
@@ -42,189 +506,27 @@ def path_generation(products,
         adj_map[(j,m)].add(i)
 
     #edges with double routes
-    edges_with_double_route = [(i,j,m,r) for (i,j,m,r) in edges if (r==2) ]
+    edges_with_double_route = {(i,j,m,r) for (i,j,m,r) in edges if (r==2) }
     edges = [(i,j,m,r) for (i,j,m,r) in edges if (r==1) ]
     #df_dist = df_dist[~(df_dist['Route'] ==2)] #delete "additional routes"
     #df_dist = df_dist.reset_index(drop=True)
 
+    #static data for gen_paths (the same for all cost configurations)
+    network = {"nodes": list(nodes), "node_nr": node_nr, "modes": list(modes), "distance": distance, 
+               "adj_map": adj_map, "edges_with_double_route": edges_with_double_route}
 
 
     ####################################
     # COMPUTE SHORTEST PATHS
     ####################################
 
-    def gen_paths(mode_cost,                #this depends on the scenario/fuel/etc
-                  transfer_cost,            #is a dictionary (m1,m2):cost
-                  mode_comb_level,
-                  adj_map,
-                  edges,
-                  edges_with_double_route):
-        sh_path_uni = {(i,j,m):[] for i in nodes for j in nodes for m in modes}  #unimodal shortest paths
-        max_dist = 999999.0
-        sh_dist_uni = {(i,j,m):max_dist for i in nodes for j in nodes for m in modes} #unimodal shortest distances
-
-        for m in modes:
-            #initialize graph 
-            G = Graph()
-            #fill graph with nodes and edges (using minimum distance as edge cost)
-            for o in nodes:
-                for d in adj_map[(o,m)]:
-                    #compute cost (= shortest distance for mode m)
-                    cost = distance[(o,d,m)]*mode_cost[m] 
-                    G.add_edge(o, d, cost)
-            #create shortest paths toward destination d BRUTE FORCE (some unneccesary calculations)
-            for o in nodes:
-                for d in nodes:
-                    if o != d:
-                        try:
-                            result = find_path(G, o, d)
-                            sh_path_uni[(o,d,m)] = result.nodes
-                            sh_dist_uni[(o,d,m)] = result.total_cost
-                            if sh_dist_uni[(o,d,m)] >= max_dist:
-                                sh_path_uni[(o,d,m)] = [] #remove "fake" paths (that don't exist) 
-                        except:
-                            pass
-
-        mode_combinations = []
-        #single-mode combinations 
-        for m in modes:
-            mode_combinations.append([m])
-        #two-mode combinations 
-        if mode_comb_level >= 2:
-            for m1 in modes:
-                for m2 in modes:
-                    if m1 != m2:
-                        mode_combinations.append([m1, m2])
-        #three-mode combinations 
-        if mode_comb_level >= 3:
-            for m1 in modes:
-                for m2 in modes:
-                    for m3 in modes:
-                        if m1 != m2 and m2 != m3:
-                            mode_combinations.append([m1, m2, m3])
-
-        mode_combi = []
-        mode_combi_dict = {}
-        mode_combi_dict_inverse = {}
-        num_mode_combinations = len(mode_combinations)
-        for i in range(num_mode_combinations):
-            mode_combi.append(i)
-            mode_combi_dict[i] = mode_combinations[i]
-            mode_combi_dict_inverse[tuple(mode_combinations[i])] = i
-        
-
-        #DEFINE ALL SHORTEST PATHS (both uni and multimodal)
-        
-        sh_path = {(i,j,mc):[] for i in nodes for j in nodes for mc in mode_combi}  #multimodal shortest paths
-        sh_dist = {(i,j,mc):max_dist for i in nodes for j in nodes for mc in mode_combi} #multimodal shortest distances
-
-        for mc_index in mode_combi:
-            mc = mode_combi_dict[mc_index]
-            #uni-modal paths 
-            if len(mc) == 1:
-                m = mc[0]
-                for o in nodes:
-                    for d in nodes:
-                        if o != d: #don't make loops
-                            path_list = []
-                            if len(sh_path_uni[(o,d,m)]) > 1: #not an empty path (not unreachable)
-                                for l in range(len(sh_path_uni[(o,d,m)]) - 1): #loop over leg l in the path 
-                                    cur_o = sh_path_uni[(o,d,m)][l]
-                                    cur_d = sh_path_uni[(o,d,m)][l + 1]
-                                    path_list.append((cur_o, cur_d, m, 1)) #HARDCODED: route number 1 (we add number 2 later, only for hamar-trondheim railway)
-                            sh_path[(o,d,mc_index)] = path_list
-                            sh_dist[(o,d,mc_index)] = sh_dist_uni[(o,d,m)]
-                        else:
-                            sh_path[(o,d,mc_index)] = []
-                            sh_dist[(o,d,mc_index)] = max_dist
-            #two-mode paths
-            elif len(mc) == 2:
-                m1 = mc[0]
-                m1_index = mode_combi_dict_inverse[tuple([m1])]
-                m2 = mc[1]
-                m2_index = mode_combi_dict_inverse[tuple([m2])]
-                for o in nodes:
-                    for d in nodes:
-                        if o != d:
-                            best_dist = max_dist
-                            best_mid_point = 0
-                            #find best mid-point 
-                            for n in nodes:
-                                cur_dist = max_dist + 1
-                                if len(sh_path[(o,n,m1_index)]) > 1:
-                                    if len(sh_path[(n,d,m2_index)]) > 1:
-                                        cur_dist = sh_dist[(o,n,m1_index)] + sh_dist[(n,d,m2_index)] + transfer_cost[(m1,m2)]
-                                        if cur_dist < best_dist:
-                                            best_mid_point = n
-                                            best_dist = cur_dist
-                            if best_mid_point != 0: #found a best midpoint 
-                                sh_path[(o,d,mc_index)] = sh_path[(o,best_mid_point,m1_index)] + sh_path[(best_mid_point,d,m2_index)]
-                                sh_dist[(o,d,mc_index)] = sh_dist[(o,best_mid_point,m1_index)] + sh_dist[(best_mid_point,d,m2_index)] + transfer_cost[(m1,m2)]
-                            
-                                
-            #three-mode paths (note that all two-mode paths are already done)
-            elif len(mc) == 3:
-                m1 = mc[0]
-                m1_index = mode_combi_dict_inverse[tuple([m1])]
-                m2 = mc[1]
-                m2_index = mode_combi_dict_inverse[tuple([m2])]
-                m3 = mc[2]
-                m3_index = mode_combi_dict_inverse[tuple([m3])]
-                mc1 = [m1]       #mode-combination 1: first leg (so equal to m1)
-                mc1_index = mode_combi_dict_inverse[tuple([m1])]
-                mc2 = [m2,m3]
-                mc2_index = mode_combi_dict_inverse[(m2,m3)]
-                for o in nodes:
-                    for d in nodes:
-                        if o != d: #don't make loops
-                            best_dist = max_dist
-                            best_mid_point = 0
-                            #find best mid-point 
-                            for n in nodes:
-                                cur_dist = sh_dist[(o,n,mc1_index)] + sh_dist[(n,d,mc2_index)] + transfer_cost[(m1,m2)]
-                                if cur_dist < best_dist:
-                                    best_mid_point = n
-                                    best_dist = cur_dist
-                            if best_mid_point != 0:
-                                sh_path[(o,d,mc_index)] = sh_path[(o,best_mid_point,mc1_index)] + sh_path[(best_mid_point,d,mc2_index)]
-                                sh_dist[(o,d,mc_index)] = sh_dist[(o,best_mid_point,mc1_index)] + sh_dist[(best_mid_point,d,mc2_index)] + transfer_cost[(m1,m2)]
-
-        #make list of generated paths   
-        generated_paths = []
-        generated_path_lengths = []
-        for o in nodes:
-            for d in nodes:
-                for mc_index in mode_combi:
-                    if len(sh_path[(o,d,mc_index)]) > 0:
-                        #add path to list 
-                        shortest_path = sh_path[(o,d,mc_index)]
-                        generated_paths.append(shortest_path)
-                        generated_path_lengths.append(sh_dist[(o,d,mc_index)])
-
-                        #add copy of hamar-trondheim railway if exists 
-                        route_no_2 = False #boolean checking if there exists an alternative route
-                        which_leg = 0 #keeping track of the leg where it occurs
-                        for l in range(len(sh_path[(o,d,mc_index)])):
-                            i = sh_path[(o,d,mc_index)][l][0]
-                            j = sh_path[(o,d,mc_index)][l][1]
-                            m = sh_path[(o,d,mc_index)][l][2]
-                            if ((i,j,m,2) in edges_with_double_route) or ((j,i,m,2) in edges_with_double_route):
-                                route_no_2 = True
-                                which_leg = l
-                        if route_no_2:
-                            #make copy with the other route (use same path length (only minor difference in reality))
-                            new_path = sh_path[(o,d,mc_index)].copy()
-                            new_path[which_leg] = (new_path[which_leg][0], new_path[which_leg][1],
-                                                    new_path[which_leg][2], 2)
-                            #add path to list
-                            generated_paths.append(new_path)
-                            generated_path_lengths.append(sh_dist[(o,d,mc_index)])
-
-        return sh_path, sh_dist, generated_paths, generated_path_lengths
 
 
     #Generate all paths (loop over all years, products, fuels)
-    all_gen_paths = set()
+    configurations = []
+    configuration_keys = []
+    solved_configurations = set()   #canonical cost configurations (see cost_configuration) 
+    num_skipped = 0
     #years=[years[0]]  #to reduce the computational burden. The results should be somewhat similar
     #products =[products[0]]
 
@@ -243,38 +545,74 @@ def path_generation(products,
                             m= modes[m_index]
                             mode_cost[m] = costs[(m,f,p,y)]
                         
-                        #run the path generation for the current costs 
-                        (sh_path, sh_dist, generated_paths, generated_path_lengths) = gen_paths(mode_cost,
-                                                                                            transf_costs,
-                                                                                            mode_comb_level, 
-                                                                                            adj_map, edges, edges_with_double_route)
-                        for path in generated_paths:
-                            all_gen_paths.add(tuple(path))
+                        #skip the costs if they are equivalent to costs that were already considered
+                        configuration = cost_configuration(mode_cost, transf_costs)
+                        if configuration in solved_configurations:
+                            num_skipped += 1
+                            continue
+                        solved_configurations.add(configuration)
+                        configuration_keys.append(repr(configuration))
+                        configurations.append((mode_cost, transf_costs, mode_comb_level, None, None))
 
-    all_gen_paths = list(all_gen_paths)
+    print(f"Path generation: solving {len(configurations)} cost configurations, skipped {num_skipped} equivalent ones")
 
-    
-    file_name = "Data/SPATIAL/generated_paths_"+str(mode_comb_level)+"_modes.pkl"
-    with open(file_name, "wb") as f:
-        pickle.dump(all_gen_paths, f)
+    #incremental: start from the shortest paths of the previous network, only recompute the ones that can be affected by 
+    #the changed arcs (see unimodal_shortest_paths and gen_paths)
+    full_configurations = configurations
+    if previous is not None:
+        changed_arcs = {m: {(node_nr[i],node_nr[j]) for (i,j) in arcs} for m, arcs in previous["changed_arcs"].items()}
+        previous_nr = {key: nr for nr, key in enumerate(previous["keys"])}
+        network["previous_paths"] = previous["paths"]
+        network["previous_num_legs"] = np.array([len(path) for path in previous["paths"]] + [0])   #[-1]: no path
+        network["previous_copies"] = [double_route_copy(path, edges_with_double_route) for path in previous["paths"]]
+        configurations = list(configurations)
+        num_incremental = 0
+        for c, key in enumerate(configuration_keys):
+            if key in previous_nr:
+                k = previous_nr[key]
+                previous_uni = {m: (previous["dist"][k, m_nr], previous["pred"][k, m_nr]) for m_nr, m in enumerate(modes)}
+                configurations[c] = configurations[c][:3] + ((previous_uni, previous["mc_dist"][k], previous["mc_path"][k]), changed_arcs)
+                num_incremental += 1
+        print(f"Path generation: incremental update of {num_incremental} configurations, "
+              f"{sum(len(arcs) for arcs in changed_arcs.values())} changed arcs")
+
+    all_gen_paths, states = generate_paths(configurations, network, workers)
+
+    ids = None     #path ids (the position in the artifact if None, see Data/path_store.py)
+    if previous is not None:
+        num_kept = len(set(all_gen_paths).intersection(previous["paths"]))
+        print(f"Path generation: kept {num_kept} paths, removed {len(previous['paths'])-num_kept}, added {len(all_gen_paths)-num_kept}")
+        #the kept paths keep their id, the new paths get new ids
+        previous_id = dict(zip(previous["paths"], previous["ids"]))
+        next_id = max(previous["ids"], default=-1) + 1
+        ids = []
+        for path in all_gen_paths:
+            if path not in previous_id:
+                previous_id[path] = next_id
+                next_id += 1
+            ids.append(previous_id[path])
+        if check:
+            full_paths, full_states = generate_paths(full_configurations, {name: value for name, value in network.items() 
+                                                                           if not name.startswith("previous_")}, workers)
+            if full_paths != all_gen_paths or any(not np.array_equal(a, b) for state, full_state in zip(states, full_states) 
+                                                  for a, b in zip(state[2:], full_state[2:])):
+                raise Exception("incremental path generation differs from a full recompute")
+            print("Path generation: the incremental update is identical to a full recompute")
+
+    if file_name is None:
+        file_name = "Data/SPATIAL/generated_paths_"+str(mode_comb_level)+"_modes"
+    os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+    save_path_store(file_name, all_gen_paths, nodes, modes, distances, ids)   #see Data/path_store.py
+
+    #shortest paths per configuration (for incremental updates, see load_previous_paths)
+    np.savez(file_name + ".npz", keys=np.array(configuration_keys), 
+             dist=np.array([state[0] for state in states]), pred=np.array([state[1] for state in states]),
+             mc_dist=np.array([state[2] for state in states]), mc_path=np.array([state[3] for state in states]))
+
+    if metadata is not None:
+        with open(file_name + ".json", "w") as f:
+            json.dump(dict(metadata, num_paths=len(all_gen_paths), created=time.strftime("%Y-%m-%d %H:%M:%S")), f, indent=4)
             
-    # WRITE TO CSV FILE    UPDATE # this currently gives a utf-8 encoding error when reading
-    file_name = "Data/SPATIAL/generated_paths_"+str(mode_comb_level)+"_modes.csv"   #the problem is that we have Norwegian characters! 
-    with open(file_name, "w") as f:
-        f.write(",paths\n")
-        num_paths = len(all_gen_paths)
-        for p in range(num_paths):
-            f.write(str(p) + ",\"[")
-            num_legs = len(all_gen_paths[p])
-            for l in range(num_legs):
-                leg = all_gen_paths[p][l]
-                i = leg[0]
-                j = leg[1]
-                m = leg[2]
-                r = leg[3]
-                f.write("('{}', '{}', '{}', {})".format(i,j,m,r))
-                if l < num_legs - 1:
-                    f.write(", ")
-            f.write("]\"\n")
+    return all_gen_paths
     
 